@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming duplicate pipeline for Duplicate Photo Finder (asyncio).
+
+scan_files, find_duplicates and move_duplicates run one after another;
+this pipeline runs the same work as concurrent stages instead:
+
+    walk -> size buckets -> head/tail sample -> full digest -> quality -> backup
+
+The walk runs in a thread and hands files to the event loop, where one
+router task owns all state. Sampling, hashing, probing and copying run
+in a thread pool, `workers` jobs per stage. Stages are connected by
+bounded queues: a slow stage holds back the ones before it (the walk
+waits for a free slot, and lists at most QUEUE_SIZE directories ahead), so the work in flight stays within a fixed
+budget however large the tree is. What has to stay in memory is the
+index a streaming search cannot do without: the record store, the first
+file of each size and signature, and the digest groups.
+
+A file is only sampled once a second file of its size shows up, and
+only hashed once a second file shares its signature. Whenever every
+member of a digest group has a quality, the usual ranking (protected
+first, then quality) is applied to the group so far; new duplicates are
+backed up right away and yielded to the consumer. A later member can
+change the keeper - the previous keeper is then backed up as well, and
+a backed-up file the ranking now keeps (better than a protected file
+that arrived later) has its copy removed and is reported as 'withdrawn'.
+Originals stay in place until the run is over: --backup move is
+rejected, since a provisional ranking may move a file that ends up kept. Each group
+is ranked again after its last member, so by the end the backups are
+exactly the identical-content moves find_duplicates would plan.
+
+Same-name and similar groups need the whole tree and stay with
+find_duplicates. Other names (hardlinks) of an inode already seen are
+neither read nor moved.
+"""
+
+import asyncio
+import bisect
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from file_walker import walk_files
+from instrumentation import timed_call
+
+QUEUE_SIZE = 256  # Jobs waiting per stage, and files walked ahead of the router
+STAGES = ('sample', 'hash', 'probe', 'copy')
+WALK_POLL = 0.1  # Seconds between checks for a stopped pipeline while the walk waits
+_PROMOTED = -1  # A size/signature seen more than once - later files go straight on
+_DONE = object()
+
+
+class StreamingPipeline:
+    """Find (and back up) identical files while the tree is being walked.
+
+    jobs maps each of STAGES to its worker function, called with
+    (path, size, sample), (path, algorithm), (path,) and
+    (path, destination, method); DuplicateFinder.stream_duplicates
+    passes the module-level workers. Iterate run() for the results.
+    """
+
+    def __init__(self, finder, jobs, queue_size=QUEUE_SIZE, backup=True):
+        if backup and finder.backup_method == 'move':
+            # Rankings are provisional until a group's last member is walked
+            raise ValueError("Streaming backups cannot move originals (use copy, reflink or hardlink)")
+        self.finder = finder
+        self.jobs = jobs
+        self.queue_size = max(1, queue_size)
+        self.backup = backup  # False: only decide, yield 'duplicate' results
+        self.groups = defaultdict(list)  # digest -> indices of identical files, in walk order
+        self.keepers = {}  # digest -> index of the file kept so far
+        self.moves = {}  # index -> result of a file currently ranked as a duplicate
+        self._first_of_size = {}  # size -> first index, or _PROMOTED
+        self._first_of_signature = {}  # (size, signature) -> first index, or _PROMOTED
+        self._digests = {}  # index -> digest
+        self._inodes = set()  # Multi-link inodes already walked
+        self._copying = {}  # index -> result whose backup is still running
+        self._pending = 0  # Jobs handed to a stage and not back yet
+        self._walking = True
+
+    async def run(self):
+        """Yield results as they are decided.
+
+        Each result is a dict with an 'event' key: 'backed_up' (or
+        'duplicate' without backups) with original, duplicate, size,
+        reason and digest, plus backup_path and method; 'withdrawn' with
+        the duplicate whose earlier result no longer holds.
+        """
+        loop = asyncio.get_running_loop()
+        self._inbox = asyncio.Queue()  # Unbounded, but never holds more than the jobs in flight
+        self._walk_slots = asyncio.Semaphore(self.queue_size)
+        self._output = asyncio.Queue(self.queue_size)
+        self._queues = {stage: asyncio.Queue(self.queue_size) for stage in STAGES}
+        self._stopped = threading.Event()
+
+        workers = self.finder.workers
+        pool = ThreadPoolExecutor(max_workers=workers * len(STAGES))
+        tasks = [loop.create_task(self._router())]
+        tasks += [loop.create_task(self._worker(loop, pool, stage))
+                  for stage in STAGES for _ in range(workers)]
+        walker = loop.run_in_executor(None, self._walk, loop)
+        try:
+            while True:
+                result = await self._output.get()
+                if result is _DONE:
+                    break
+                if isinstance(result, Exception):
+                    raise result
+                yield result
+            await walker
+        finally:
+            self._stopped.set()  # Also releases a walk waiting for a slot
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            pool.shutdown()
+
+    def _walk(self, loop):
+        """Walk in a thread; each file waits for a free slot (backpressure)"""
+        finder = self.finder
+        error = None
+        try:
+            walker = walk_files(finder.SCAN_ROOT, finder.SUPPORTED_EXTENSIONS,
+                                exclude=finder.exclude, prune=[finder.REVIEW_FOLDER],
+                                workers=finder.workers, max_pending=self.queue_size,
+                                onerror=lambda path, e: loop.call_soon_threadsafe(finder._walk_error, path, e))
+            for filepath, file, st in walker:
+                future = asyncio.run_coroutine_threadsafe(self._walked(filepath, file, st), loop)
+                while True:
+                    try:
+                        future.result(WALK_POLL)
+                        break
+                    except FutureTimeout:
+                        if self._stopped.is_set():
+                            future.cancel()
+                            return
+        except Exception as e:
+            error = e
+        if not self._stopped.is_set():
+            loop.call_soon_threadsafe(self._inbox.put_nowait, ('walked', None, error))
+
+    async def _walked(self, filepath, file, st):
+        await self._walk_slots.acquire()
+        self._inbox.put_nowait(('file', (filepath, file), st))
+
+    async def _worker(self, loop, pool, stage):
+        """Run one stage's jobs in the thread pool and report back to the router"""
+        queue, func = self._queues[stage], self.jobs[stage]
+        while True:
+            index, args = await queue.get()
+            seconds, result = await loop.run_in_executor(pool, timed_call, func, *args)
+            self.finder.events.record_file(stage, args[0], seconds)
+            self._inbox.put_nowait((stage, index, result))
+
+    async def _submit(self, stage, index, args):
+        self._pending += 1
+        await self._queues[stage].put((index, args))  # Waits while the stage is full
+
+    async def _router(self):
+        """Owns all pipeline state: routes each finished job to its next stage"""
+        try:
+            while self._walking or self._pending:
+                kind, key, result = await self._inbox.get()
+                if kind in STAGES:
+                    self._pending -= 1
+                await getattr(self, '_on_' + kind)(key, result)
+            self._finish()
+        except Exception as e:
+            await self._output.put(e)
+            return
+        await self._output.put(_DONE)
+
+    async def _on_walked(self, key, error):
+        self._walking = False
+        if error:
+            raise error
+
+    async def _on_file(self, key, st):
+        self._walk_slots.release()
+        filepath, file = key
+        finder, records = self.finder, self.finder.records
+        finder.stats['total_scanned'] += 1
+        finder.events.count('walk', files=1)
+        if finder.stats['total_scanned'] % 10 == 0:
+            finder.events.emit('scan_progress', scanned=finder.stats['total_scanned'], current=file[:40])
+
+        index = records.add(filepath, st, finder.is_in_protected_folder(filepath))
+        inode = records.inode(index) if index in records.links else None
+        if inode is not None:
+            if inode in self._inodes:
+                finder.stats['hardlink_reads_avoided'] += 1
+                return
+            self._inodes.add(inode)
+        await self._candidate(self._first_of_size, st.st_size, index, self._sample)
+
+    async def _candidate(self, firsts, key, index, next_stage):
+        """Pass index on to the next stage once a second file shares its key"""
+        first = firsts.get(key)
+        if first is None:
+            firsts[key] = index
+            return
+        if first != _PROMOTED:
+            firsts[key] = _PROMOTED
+            await next_stage(first)
+        await next_stage(index)
+
+    async def _sample(self, index):
+        finder, records = self.finder, self.finder.records
+        if not finder.partial_hash:
+            await self._hash(index)
+            return
+        filepath, st = records.path(index), records.stat(index)
+        signature = finder._cached(filepath, st, 'partial', partial_size=finder.PARTIAL_HASH_SIZE)
+        if signature:
+            await self._signed(index, signature)
+        else:
+            await self._submit('sample', index, (filepath, st.st_size, finder.PARTIAL_HASH_SIZE))
+
+    async def _on_sample(self, index, result):
+        finder, records = self.finder, self.finder.records
+        signature, error = result
+        filepath, st = records.path(index), records.stat(index)
+        nbytes = min(st.st_size, finder.PARTIAL_HASH_SIZE * 2)
+        finder.stats['partial_hashed'] += 1
+        finder.stats['partial_bytes_read'] += nbytes
+        finder.events.count('sample', files=1, nbytes=nbytes)
+        if error:
+            finder.events.emit('read_error', path=filepath, error=str(error))
+            return
+        if finder.cache:
+            finder.cache.update(filepath, st, partial=signature, partial_size=finder.PARTIAL_HASH_SIZE)
+        await self._signed(index, signature)
+
+    async def _signed(self, index, signature):
+        key = (self.finder.records.sizes[index], signature)
+        await self._candidate(self._first_of_signature, key, index, self._hash)
+
+    async def _hash(self, index):
+        finder, records = self.finder, self.finder.records
+        filepath, st = records.path(index), records.stat(index)
+        digest = finder._cached(filepath, st, 'digest', algorithm=finder.hash_algorithm)
+        if digest:
+            await self._hashed(index, digest)
+        else:
+            await self._submit('hash', index, (filepath, finder.hash_algorithm))
+
+    async def _on_hash(self, index, result):
+        finder, records = self.finder, self.finder.records
+        digest, error = result
+        filepath, st = records.path(index), records.stat(index)
+        finder.stats['files_hashed'] += 1
+        finder.stats['bytes_hashed'] += st.st_size
+        finder.events.count('hash', files=1, nbytes=st.st_size)
+        if error:
+            finder.events.emit('read_error', path=filepath, error=str(error))
+            return
+        if finder.cache:
+            finder.cache.update(filepath, st, digest=digest, algorithm=finder.hash_algorithm)
+        await self._hashed(index, digest)
+
+    async def _hashed(self, index, digest):
+        self._digests[index] = digest
+        group = self.groups[digest]
+        # Walk order, not hashing order: ties in the ranking go to the same file as in find_duplicates
+        bisect.insort(group, index)
+        if len(group) == 2:
+            for member in list(group):
+                await self._probe(member)
+        elif len(group) > 2:
+            await self._probe(index)
+
+    async def _probe(self, index):
+        finder, records = self.finder, self.finder.records
+        if records.quality(index) is not None:
+            await self._decide(self._digests[index])
+            return
+        filepath, st = records.path(index), records.stat(index)
+        quality = finder._cached(filepath, st, 'quality')
+        if quality is not None:
+            records.set_quality(index, quality)
+            await self._decide(self._digests[index])
+        else:
+            await self._submit('probe', index, (filepath,))
+
+    async def _on_probe(self, index, dimensions):
+        finder, records = self.finder, self.finder.records
+        filepath, st = records.path(index), records.stat(index)
+        quality = finder._quality_score(dimensions, st.st_size)
+        finder.stats['quality_probed'] += 1
+        finder.events.count('quality', files=1)
+        if finder.cache:
+            width, height = dimensions or (None, None)
+            finder.cache.update(filepath, st, width=width, height=height, quality=quality)
+        records.set_quality(index, quality)
+        await self._decide(self._digests[index])
+
+    async def _decide(self, digest):
+        """Rank a digest group so far; back up new duplicates, withdraw kept ones"""
+        records = self.finder.records
+        members = [records[index] for index in self.groups[digest]]
+        if any(record['quality'] is None for record in members):
+            return  # Wait for the remaining probes
+        best, moves, _ = self.finder._rank(members)
+        self.keepers[digest] = best.index
+        wanted = {record.index for record in moves}
+        for record in moves:
+            if record.index not in self.moves:
+                await self._move(record, digest)
+        for index in self.groups[digest]:
+            if index in self.moves and index not in wanted:
+                await self._withdraw(index)
+
+    async def _move(self, record, digest):
+        finder, index = self.finder, record.index
+        if index in self._copying:  # Withdrawn and wanted again before its backup finished
+            item = self.moves[index] = self._copying[index]
+            item['withdrawn'] = False
+            return
+        item = self.moves[index] = {
+            'event': 'duplicate',
+            'original': finder.records.path(self.keepers[digest]),
+            'duplicate': record['path'],
+            # Other names are never moved here, so a multi-link file frees nothing
+            'size': record['size'] if record['links'] == 1 else 0,
+            'reason': 'identical content (hash)',
+            'digest': digest,
+        }
+        if not self.backup:
+            await self._output.put(dict(item))
+            return
+
+        try:
+            relative_path = os.path.relpath(item['duplicate'], finder.SCAN_ROOT)
+        except ValueError as e:  # Other drive than SCAN_ROOT
+            finder.events.emit('copy_error', path=item['duplicate'], error=str(e))
+            return
+        item['backup_path'] = os.path.join(finder.REVIEW_FOLDER, relative_path)
+        self._copying[index] = item
+        await self._submit('copy', index, (item['duplicate'], item['backup_path'], finder.backup_method))
+
+    async def _on_copy(self, index, result):
+        finder = self.finder
+        method, error = result
+        item = self._copying.pop(index)
+        if error:
+            finder.events.emit('copy_error', path=item['duplicate'], error=str(error))
+            return
+        item['method'] = method
+        if item.get('withdrawn'):
+            self._restore(item)
+            return
+
+        finder.stats['files_moved'] += 1
+        finder.stats['space_saved'] += item['size']
+        methods = finder.stats['backup_methods']
+        methods[method] = methods.get(method, 0) + 1
+        finder.events.count('copy', files=1, nbytes=item['size'])
+        item['event'] = 'backed_up'
+        await self._output.put(dict(item))
+
+    async def _withdraw(self, index):
+        """A file ranked as a duplicate is kept after all"""
+        item = self.moves.pop(index)
+        if index in self._copying:
+            item['withdrawn'] = True  # Undone when its backup finishes
+            return
+        if self.backup:
+            if not item.get('method'):
+                return  # Never backed up (copy error), never announced
+            self._restore(item)
+            stats = self.finder.stats
+            stats['files_moved'] -= 1
+            stats['space_saved'] -= item['size']
+            stats['backup_methods'][item['method']] -= 1
+        await self._output.put({'event': 'withdrawn', 'duplicate': item['duplicate'], 'digest': item['digest']})
+
+    def _restore(self, item):
+        """Undo a backup: remove the copy (originals are never moved here)"""
+        try:
+            os.remove(item['backup_path'])
+        except OSError as e:
+            self.finder.events.emit('copy_error', path=item['backup_path'], error=str(e))
+
+    def _finish(self):
+        """Final statistics, once every group has been ranked with all its members"""
+        finder, records = self.finder, self.finder.records
+        stats = finder.stats
+        stats['bytes_skipped'] += sum(records.sizes[index] for index in self._first_of_size.values()
+                                      if index != _PROMOTED)
+        stats['partial_unique'] += sum(1 for index in self._first_of_signature.values()
+                                       if index != _PROMOTED)
+        for digest, group in self.groups.items():
+            if len(group) < 2:
+                continue
+            best, moves, kept = finder._rank([records[index] for index in group])
+            stats['duplicates_found'] += len(moves) + len(kept)
+            for dup in kept:
+                finder.events.emit('better_than_protected', method='hash',
+                                   protected=best['path'], protected_quality=best['quality'],
+                                   better=dup['path'], better_quality=dup['quality'])
+        stats['quality_probes_avoided'] = sum(1 for index in range(len(records))
+                                              if records.quality(index) is None)
+        stats['record_store_bytes'] = records.memory_usage()
+        if finder.cache:
+            finder.cache.flush()
+            stats['cache_hits'] = finder.cache.hits
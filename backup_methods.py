@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backup strategies for moving duplicates into the review folder.
+
+    reflink     FICLONE copy-on-write clone (Btrfs, XFS, ...): an independent
+                copy that shares blocks until one side is written
+    hardlink    second name for the same file (same filesystem only)
+    copy_range  kernel-side copy with os.copy_file_range (sendfile fallback)
+    copy        shutil.copy2
+    move        rename the duplicate into the review folder (a true move)
+    auto        per file, the fastest of these that leaves the duplicate in
+                place: reflink, then hardlink on the same filesystem;
+                copy_range, then copy across filesystems
+
+Every method writes to a temporary name next to the destination and
+renames it into place, so a failed attempt never leaves a partial backup.
+"""
+
+import errno
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+METHODS = ('auto', 'reflink', 'hardlink', 'copy_range', 'copy', 'move')
+FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h
+COPY_CHUNK = 64 * 1024 * 1024  # Bytes per copy_file_range call
+
+# Errors that mean "this filesystem cannot do it" rather than "this file failed";
+# others (EPERM from protected_hardlinks, EMLINK at the link limit) only skip
+# the method for the file at hand
+UNSUPPORTED = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS}
+
+_unsupported = set()  # (method, source device, destination device) known not to work
+
+
+def _reflink(source, dest):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks need Linux")
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(source, dest)
+
+
+def _hardlink(source, dest):
+    os.link(source, dest)
+
+
+def _copy_range(source, dest):
+    if not hasattr(os, 'copy_file_range'):
+        shutil.copyfile(source, dest)  # Uses sendfile where the platform has it
+    else:
+        with open(source, 'rb') as src, open(dest, 'wb') as dst:
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), min(remaining, COPY_CHUNK))
+                if copied == 0:
+                    # Source shrank, or the filesystem gave up - never keep a short copy
+                    raise OSError(errno.EIO, f"copy_file_range stopped {remaining} bytes short", source)
+                remaining -= copied
+    shutil.copystat(source, dest)
+
+
+def _copy(source, dest):
+    shutil.copy2(source, dest)
+
+
+def _move(source, dest):
+    shutil.move(source, dest)
+
+
+COPIERS = {
+    'reflink': _reflink,
+    'hardlink': _hardlink,
+    'copy_range': _copy_range,
+    'copy': _copy,
+    'move': _move,
+}
+
+
+def candidate_methods(method, same_device):
+    """Methods to try, in order, for one file"""
+    if method != 'auto':
+        return [method]
+    if same_device:
+        return ['reflink', 'hardlink', 'copy']
+    return ['copy_range', 'copy']
+
+
+def backup_file(source, dest, method='auto'):
+    """Back up one duplicate; return (method used, error)"""
+    try:
+        folder = os.path.dirname(dest)
+        os.makedirs(folder, exist_ok=True)
+        st = os.stat(source)
+        src_dev, dst_dev = st.st_dev, os.stat(folder).st_dev
+    except OSError as e:
+        return None, e
+
+    tmp_path = dest + '.part'
+    error = None
+    for name in candidate_methods(method, src_dev == dst_dev):
+        if (name, src_dev, dst_dev) in _unsupported:
+            continue
+        try:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            COPIERS[name](source, tmp_path)
+            copied = os.stat(tmp_path).st_size
+            if name != 'move' and copied != st.st_size:
+                raise OSError(errno.EIO, f"backup has {copied} of {st.st_size} bytes", tmp_path)
+            os.replace(tmp_path, dest)
+            return name, None
+        except OSError as e:
+            error = e
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            # Remember what this pair of filesystems cannot do; plain copies stay available
+            if method == 'auto' and name != 'copy' and e.errno in UNSUPPORTED:
+                _unsupported.add((name, src_dev, dst_dev))
+    return None, error
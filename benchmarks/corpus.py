@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Synthetic photo/video corpus generator for benchmarks.
+
+Builds a reproducible folder tree of JPEG, PNG and MP4 files with real
+headers (SOF, IHDR, tkhd) of varying resolution followed by random payload,
+plus a controlled share of byte-identical copies, same-size files with
+different content and same-name files with different content.
+"""
+
+import os
+import random
+import struct
+import zlib
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (3024, 4032), (4000, 3000), (6000, 4000)]
+KINDS = {'.jpg': 0.6, '.png': 0.2, '.mp4': 0.2}
+
+
+def jpeg_header(width, height):
+    """SOI, APP0 (JFIF) and a baseline SOF0 frame header"""
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 17, 8, height, width, 3)
+    sof0 += b'\x01\x22\x00\x02\x11\x01\x03\x11\x01'
+    return b'\xff\xd8' + app0 + sof0
+
+
+def png_header(width, height):
+    """PNG signature and IHDR chunk with a valid CRC"""
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    chunk = b'IHDR' + ihdr
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', len(ihdr)) + chunk + struct.pack('>I', zlib.crc32(chunk))
+
+
+def mp4_header(width, height):
+    """ftyp box and a moov/trak/tkhd describing one video track"""
+    def box(box_type, payload):
+        return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+    tkhd = box(b'tkhd', b'\x00\x00\x00\x00' + b'\x00' * 72 + struct.pack('>II', width << 16, height << 16))
+    return box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41') + box(b'moov', box(b'trak', tkhd))
+
+
+HEADERS = {'.jpg': jpeg_header, '.png': png_header, '.mp4': mp4_header}
+
+
+def random_size(rng, ext, median):
+    """Log-normal file size, videos roughly 20x larger than photos"""
+    scale = 20 if ext == '.mp4' else 1
+    return max(256, int(rng.lognormvariate(0, 0.6) * median * scale))
+
+
+def generate_corpus(root, files=1000, seed=0, median_size=256 * 1024, folders=50,
+                    duplicate_ratio=0.2, same_size_ratio=0.05, name_collision_ratio=0.05):
+    """Write a corpus under root and return a manifest dict.
+
+    files                -- total number of files written
+    median_size          -- median photo size in bytes (videos are larger)
+    duplicate_ratio      -- share of files that are byte-identical copies
+    same_size_ratio      -- share of files with an existing size but different bytes
+    name_collision_ratio -- share of files reusing an existing name with new content
+    """
+    rng = random.Random(seed)
+    kinds = list(KINDS)
+    weights = [KINDS[kind] for kind in kinds]
+    written = []  # (path, name, size)
+    manifest = {'root': root, 'seed': seed, 'files': 0, 'bytes': 0,
+                'duplicates': 0, 'same_size': 0, 'name_collisions': 0}
+
+    def write(name, content):
+        folder = os.path.join(root, f"folder_{rng.randrange(folders):03d}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            base, ext = os.path.splitext(name)
+            path = os.path.join(folder, f"{base}_{len(written)}{ext}")
+        with open(path, 'wb') as f:
+            f.write(content)
+        written.append((path, os.path.basename(path), len(content)))
+        manifest['files'] += 1
+        manifest['bytes'] += len(content)
+
+    def new_content(ext, size):
+        width, height = rng.choice(RESOLUTIONS)
+        header = HEADERS[ext](width, height)
+        payload = max(0, size - len(header))
+        return header + rng.getrandbits(payload * 8).to_bytes(payload, 'little')
+
+    for i in range(files):
+        roll = rng.random()
+        if written and roll < duplicate_ratio:
+            path, name, _ = rng.choice(written)
+            with open(path, 'rb') as f:
+                content = f.read()
+            write(name if rng.random() < 0.5 else f"copy_{i}{os.path.splitext(name)[1]}", content)
+            manifest['duplicates'] += 1
+        elif written and roll < duplicate_ratio + same_size_ratio:
+            _, name, size = rng.choice(written)
+            ext = os.path.splitext(name)[1]
+            write(f"IMG_{i:06d}{ext}", new_content(ext, size))
+            manifest['same_size'] += 1
+        elif written and roll < duplicate_ratio + same_size_ratio + name_collision_ratio:
+            _, name, _ = rng.choice(written)
+            ext = os.path.splitext(name)[1]
+            write(name, new_content(ext, random_size(rng, ext, median_size)))
+            manifest['name_collisions'] += 1
+        else:
+            ext = rng.choices(kinds, weights)[0]
+            write(f"IMG_{i:06d}{ext}", new_content(ext, random_size(rng, ext, median_size)))
+
+    return manifest
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for Duplicate Photo Finder.
+
+Generates (or reuses) a synthetic corpus, times each stage separately and
+prints a JSON report with files/s, MB/s and peak RSS, so runs can be
+compared across commits:
+
+    python benchmarks/run_benchmark.py --files 5000 --output bench.json
+
+Note: the OS page cache is not dropped between stages, so read stages
+measure warm-cache throughput unless the corpus is larger than RAM.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to import duplicate_finder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from duplicate_finder import DuplicateFinder, SUPPORTED_EXTENSIONS
+from file_walker import walk_files
+from corpus import generate_corpus
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def git_revision():
+    """Current commit of the working tree, if available"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(name, files, nbytes, func):
+    """Run func quietly and return (result, stage report)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func()
+    seconds = time.perf_counter() - start
+    return result, {
+        'stage': name,
+        'seconds': seconds,
+        'files': files,
+        'bytes': nbytes,
+        'peak_rss': peak_rss_bytes(),
+    }
+
+
+def add_rates(stage):
+    """Add files/s and MB/s to a stage report"""
+    seconds = stage['seconds']
+    stage['files_per_s'] = round(stage['files'] / seconds, 1) if seconds else None
+    stage['mb_per_s'] = round(stage['bytes'] / 1024 / 1024 / seconds, 2) if seconds else None
+    if 'bytes_read' in stage:
+        stage['read_mb_per_s'] = round(stage['bytes_read'] / 1024 / 1024 / seconds, 2) if seconds else None
+    stage['seconds'] = round(seconds, 4)
+    return stage
+
+
+def run(args, corpus_dir):
+    """Time every stage over corpus_dir and return the report"""
+    if not os.path.isdir(corpus_dir) or not os.listdir(corpus_dir):
+        manifest, generate = timed('generate', args.files, 0, lambda: generate_corpus(
+            corpus_dir, files=args.files, seed=args.seed, median_size=args.median_size,
+            duplicate_ratio=args.duplicate_ratio))
+        generate['bytes'] = manifest['bytes']
+        stages = [generate]
+    else:
+        manifest, stages = {'root': corpus_dir, 'reused': True}, []
+
+    entries, walk = timed('walk', 0, 0, lambda: list(walk_files(corpus_dir, SUPPORTED_EXTENSIONS)))
+    total_bytes = sum(entry.stat.st_size for entry in entries)
+    walk['files'] = len(entries)
+    stages.append(walk)
+
+    review = tempfile.mkdtemp(prefix='dpf-review-')
+    try:
+        finder = DuplicateFinder(workers=args.workers, executor=args.executor,
+                                 hash_algorithm=args.hash)
+        finder.SCAN_ROOT = corpus_dir
+        finder.REVIEW_FOLDER = review
+
+        _, scan = timed('scan', len(entries), total_bytes, finder.scan_files)
+        scan['bytes_read'] = finder.stats['partial_bytes_read'] + finder.stats['bytes_hashed']
+        stages.append(scan)
+
+        moves, find = timed('find_duplicates', len(entries), 0, finder.find_duplicates)
+        find['quality_probed'] = finder.stats['quality_probed']
+        stages.append(find)
+
+        if not args.skip_copy:
+            copy_bytes = sum(item['size'] for item in moves)
+            _, copy = timed('move_duplicates', len(moves), copy_bytes,
+                            lambda: finder.move_duplicates(moves))
+            stages.append(copy)
+    finally:
+        shutil.rmtree(review, ignore_errors=True)
+
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'keep')},
+        'corpus': manifest,
+        'stages': [add_rates(stage) for stage in stages],
+        'stats': finder.stats,
+        'pipeline': finder.events.summary(),
+        'peak_rss': peak_rss_bytes(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Duplicate Photo Finder stages.")
+    parser.add_argument('--files', type=int, default=2000, help="number of files to generate")
+    parser.add_argument('--seed', type=int, default=0, help="corpus random seed")
+    parser.add_argument('--median-size', type=int, default=256 * 1024, help="median photo size in bytes")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.2, help="share of byte-identical copies")
+    parser.add_argument('--corpus', help="corpus folder (generated if missing or empty, kept afterwards)")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--executor', default='thread', choices=['thread', 'process'])
+    parser.add_argument('--hash', default='md5', help="digest engine")
+    parser.add_argument('--skip-copy', action='store_true', help="do not time move_duplicates")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    corpus_dir = args.corpus or tempfile.mkdtemp(prefix='dpf-corpus-')
+    try:
+        report = run(args, corpus_dir)
+    finally:
+        if not args.corpus:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Byte-by-byte comparison of same-size files for Duplicate Photo Finder.
+
+All members of a candidate group are read in lockstep, one large block
+at a time. After each block the group is split by block content; members
+left alone are dropped (and never read again), and the comparison stops
+as soon as no two members agree. Files that reach the end together are
+identical - no digest, so no collision to trust.
+
+Memory is bounded by the block size times the group size; large groups
+read smaller blocks. Groups with more members than MAX_OPEN reopen each
+file per block instead of keeping it open.
+"""
+
+from collections import defaultdict
+
+BLOCK_SIZE = 1024 * 1024  # Bytes read per member and step
+MIN_BLOCK_SIZE = 64 * 1024
+COMPARE_MEMORY = 64 * 1024 * 1024  # Max bytes of blocks held at once
+MAX_OPEN = 256  # Larger groups reopen files for every block
+
+
+class _Reader:
+    """Sequential reads of one group member"""
+
+    __slots__ = ('path', 'offset', 'keep_open', 'handle')
+
+    def __init__(self, path, keep_open):
+        self.path = path
+        self.offset = 0
+        self.keep_open = keep_open
+        self.handle = None
+
+    def read(self, size):
+        if self.handle is None:
+            self.handle = open(self.path, 'rb', buffering=0)
+            self.handle.seek(self.offset)
+        data = self.handle.read(size)
+        # Short reads from raw files are possible - fill the block up
+        while data and len(data) < size:
+            more = self.handle.read(size - len(data))
+            if not more:
+                break
+            data += more
+        self.offset += len(data)
+        if not self.keep_open:
+            self.close()
+        return data
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def compare_files(paths, block_size=BLOCK_SIZE, memory=COMPARE_MEMORY):
+    """Split files into groups of identical content.
+
+    Returns (groups, errors, bytes_read): groups are lists of positions in
+    paths (two or more identical files each, in input order), errors maps
+    the position of an unreadable file to its exception.
+    """
+    keep_open = len(paths) <= MAX_OPEN
+    readers = [_Reader(path, keep_open) for path in paths]
+    groups, errors = [], {}
+    bytes_read = 0
+    pending = [list(range(len(paths)))] if len(paths) > 1 else []
+    try:
+        while pending:
+            members = pending.pop()
+            block = max(MIN_BLOCK_SIZE, min(block_size, memory // len(members)))
+            while members:
+                by_block = defaultdict(list)
+                for position in members:
+                    try:
+                        data = readers[position].read(block)
+                    except OSError as e:
+                        errors[position] = e
+                        readers[position].close()
+                        continue
+                    bytes_read += len(data)
+                    by_block[data].append(position)
+
+                members = None
+                split = []
+                for data, group in by_block.items():
+                    if len(group) < 2:
+                        readers[group[0]].close()  # Unique from here on - stop reading it
+                    elif not data:
+                        groups.append(group)  # Reached the end together
+                        for position in group:
+                            readers[position].close()
+                    else:
+                        split.append(group)
+                if len(split) == 1:
+                    members = split[0]  # Still one group - keep the block size
+                else:
+                    pending.extend(split)
+    finally:
+        for reader in readers:
+            reader.close()
+    groups.sort()
+    return groups, errors, bytes_read
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scan checkpoints for Duplicate Photo Finder.
+
+A checkpoint is the whole in-memory scan state - the walk frontier, the
+record store and the hash results gathered so far - pickled, compressed
+with zlib and written atomically (temporary file, fsync, rename), so an
+interrupted scan can resume without walking or hashing the same files
+again. Writes are spaced so that they never take more than a fixed share
+of the scan time.
+"""
+
+import os
+import pickle
+import time
+import zlib
+
+CHECKPOINT_FILENAME = "duplicate_finder_checkpoint.bin"
+CHECKPOINT_VERSION = 3
+CHECKPOINT_INTERVAL = 300  # Seconds between checkpoints
+MAX_OVERHEAD = 0.05  # Never spend more than this share of the scan writing checkpoints
+
+
+def save_checkpoint(path, state):
+    """Atomically write a state dict; return the number of bytes written"""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    data = zlib.compress(pickle.dumps(dict(state, version=CHECKPOINT_VERSION),
+                                      protocol=pickle.HIGHEST_PROTOCOL), 1)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def load_checkpoint(path):
+    """Return the saved state dict, or None if missing, unreadable or from another version"""
+    try:
+        with open(path, 'rb') as f:
+            state = pickle.loads(zlib.decompress(f.read()))
+    except (OSError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get('version') != CHECKPOINT_VERSION:
+        return None
+    return state
+
+
+class Checkpointer:
+    """Decides when to write checkpoints and keeps their cost bounded"""
+
+    def __init__(self, path, interval=CHECKPOINT_INTERVAL, max_overhead=MAX_OVERHEAD):
+        self.path = path
+        self.interval = interval  # 0 disables periodic checkpoints
+        self.max_overhead = max_overhead
+        self.writes = 0
+        self.seconds = 0.0  # Time spent writing checkpoints
+        self.bytes = 0  # Size of the last checkpoint
+        self._next = time.monotonic() + interval
+
+    def due(self):
+        return bool(self.interval) and time.monotonic() >= self._next
+
+    def save(self, state):
+        """Write a checkpoint now; return (seconds, bytes)"""
+        start = time.monotonic()
+        self.bytes = save_checkpoint(self.path, state)
+        seconds = time.monotonic() - start
+        self.writes += 1
+        self.seconds += seconds
+        # A slow write pushes the next one further out: seconds / gap <= max_overhead
+        self._next = time.monotonic() + max(self.interval, seconds / self.max_overhead)
+        return seconds, self.bytes
+
+    def load(self):
+        return load_checkpoint(self.path)
+
+    def clear(self):
+        """Remove the checkpoint once the scan it belongs to has finished"""
+        for path in (self.path, self.path + '.tmp'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
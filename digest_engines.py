@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Digest engines for Duplicate Photo Finder.
+
+Every engine is a zero-argument factory returning an object with
+update() and hexdigest(). md5, sha256 and blake2b come from hashlib;
+xxhash and BLAKE3 engines are registered when those packages are installed.
+
+Files are read into a reusable buffer. Hashing large files through mmap
+is opt-in (use_mmap=True): a file truncated or replaced while mapped -
+on a network share, or still being written - kills the process with
+SIGBUS instead of raising an error.
+"""
+
+import hashlib
+import mmap
+import os
+import threading
+
+READ_BUFFER_SIZE = 1024 * 1024  # Reusable readinto() buffer per thread
+MMAP_THRESHOLD = 64 * 1024 * 1024  # With use_mmap, files at least this big are hashed through mmap
+MMAP_SLICE = 16 * 1024 * 1024  # Bytes passed to update() per call when using mmap
+
+ENGINES = {
+    'md5': hashlib.md5,
+    'sha256': hashlib.sha256,
+    'blake2b': hashlib.blake2b,
+}
+
+try:
+    import xxhash
+    ENGINES['xxh64'] = xxhash.xxh64
+    ENGINES['xxh3_128'] = xxhash.xxh3_128
+except ImportError:
+    pass
+
+try:
+    import blake3
+    ENGINES['blake3'] = blake3.blake3
+except ImportError:
+    pass
+
+_local = threading.local()
+
+
+def available_engines():
+    """Return names of the engines usable in this environment"""
+    return sorted(ENGINES)
+
+
+def get_engine(name):
+    """Return the digest factory for an engine name"""
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown or unavailable digest engine: {name} "
+            f"(available: {', '.join(available_engines())})"
+        ) from None
+
+
+def _read_buffer():
+    """Return this thread's reusable read buffer"""
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        buffer = _local.buffer = bytearray(READ_BUFFER_SIZE)
+    return buffer
+
+
+def digest_file(filepath, algorithm='md5', use_mmap=False):
+    """Return hex digest of a whole file using the named engine.
+    
+    use_mmap -- map files of MMAP_THRESHOLD bytes and more instead of
+                reading them; only for local files nothing else writes to
+    """
+    hasher = get_engine(algorithm)()
+    with open(filepath, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if use_mmap and size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, size, MMAP_SLICE):
+                        hasher.update(view[offset:offset + MMAP_SLICE])
+                finally:
+                    view.release()
+        else:
+            buffer = _read_buffer()
+            view = memoryview(buffer)
+            while True:
+                count = f.readinto(buffer)
+                if not count:
+                    break
+                hasher.update(view[:count])
+    return hasher.hexdigest()
@@ -6,277 +6,1536 @@ Preserves the best quality, protects folder D:\Zdjęcia (W)
 """
 
 import os
+import asyncio
 import hashlib
-import shutil
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter, defaultdict
+from itertools import count, repeat
 from PIL import Image
 import json
 from datetime import datetime
+import argparse
+import socket
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from scan_cache import ScanCache, CACHE_FILENAME, stat_key
+from scan_index import ScanIndex, INDEX_FILENAME
+from checkpoint import Checkpointer, CHECKPOINT_FILENAME, CHECKPOINT_INTERVAL
+from shard_index import PlanWriter, merge_groups, open_shards, write_shard
+from spill_groups import SpillingGroups
+from byte_compare import compare_files
+from backup_methods import METHODS as BACKUP_METHODS, backup_file
+from duplicate_report import DELETE_BATCH, REPORT_FILENAME, ReportWriter, batches, pending_deletions, render_text
+from async_pipeline import QUEUE_SIZE as STREAM_QUEUE_SIZE, StreamingPipeline
+from io_scheduler import IOScheduler, Throttle
+from digest_engines import available_engines, digest_file, get_engine
+from media_probe import probe_dimensions
+from file_walker import walk_files
+from record_store import FileRecordStore
+from instrumentation import Instrumentation, ConsoleSink, JsonLinesSink, timed_call
+from perceptual_hash import (ALGORITHMS as PERCEPTUAL_ALGORITHMS, IMAGE_ALGORITHMS, MultiIndexHash, hamming,
+                             perceptual_hash)
+from thumbnail_store import (PIXEL_TOLERANCE, THUMBNAIL_FILENAME, PixelIndex, ThumbnailStore,
+                             decode_thumbnail, pixel_distance, same_aspect)
+from video_fingerprint import (DECODERS, DURATION_TOLERANCE, FRAME_SAMPLES, available_decoder,
+                               parse_fingerprint, video_distance, video_fingerprint)
 
 # Configuration
 PROTECTED_FOLDER = r"D:\Zdjęcia (W)"
 REVIEW_FOLDER = r"D:\do sprawdzenia Claude"
 SCAN_ROOT = r"D:\\"
 SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.heic', '.mp4'}
+PARTIAL_HASH_SIZE = 16 * 1024  # Bytes sampled from head and tail for the quick signature
+EXECUTORS = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+PERCEPTUAL_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.heic'}  # Files compared by perceptual hash
+VIDEO_EXTENSIONS = {'.mp4'}  # Files compared by sampled-frame fingerprint
+SIMILAR_DISTANCE = 6  # Max differing bits (of 64) for two images to count as similar
+PLAN_FILENAME = "duplicate_finder_plan.jsonl"  # Moves planned by --merge
+COMPARE_MODES = ('hash', 'bytes')  # Confirm candidates by full digest, or byte by byte
+QUALITY_BATCH = 100000  # Grouped files probed per batch while resolving quality
+
+# Worker functions - module level so they can run in a process pool.
+# They return (result, error) and leave reporting to the caller.
+
+def hash_file(filepath, algorithm='md5', use_mmap=False):
+    """Return (hex digest, error) of whole file"""
+    try:
+        return digest_file(filepath, algorithm, use_mmap), None
+    except Exception as e:
+        return None, e
+
+def partial_hash_file(filepath, size, sample, located=None):
+    """Return (signature, error) built from file size, head and tail.
+    
+    located, if given, is called with the open file's descriptor (the I/O
+    scheduler reads the file's disk offset from it).
+    """
+    hash_md5 = hashlib.md5(str(size).encode())
+    try:
+        with open(filepath, "rb") as f:
+            if located:
+                located(f.fileno())
+            hash_md5.update(f.read(sample))
+            if size > sample * 2:
+                f.seek(size - sample)
+                hash_md5.update(f.read(sample))
+            elif size > sample:
+                hash_md5.update(f.read())
+        return hash_md5.hexdigest(), None
+    except Exception as e:
+        return None, e
+
+def image_dimensions(filepath):
+    """Return (width, height) of photo/video, or None if unknown"""
+    # Cheap path - parse the headers (JPEG, PNG, HEIC, MP4)
+    dimensions = probe_dimensions(filepath)
+    if dimensions or filepath.lower().endswith('.mp4'):
+        return dimensions
+    
+    # Fall back to Pillow for anything the header parser did not understand
+    try:
+        with Image.open(filepath) as img:
+            return img.size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # If can't open as image, use size only
+        return None
+
+def connected_groups(items, pairs):
+    """Join items linked by (a, b) pairs; return {smallest member: sorted members}, singletons included"""
+    parent = {item: item for item in items}
+    
+    def find(item):
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+    
+    for a, b in pairs:
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    
+    groups = defaultdict(list)
+    for item in sorted(parent):
+        groups[find(item)].append(item)
+    return groups
+
 
 class DuplicateFinder:
-    def __init__(self):
-        self.file_hashes = defaultdict(list)
-        self.file_names = defaultdict(list)  # NEW: duplicates by filename
+    # Configuration (can be overridden per instance)
+    PROTECTED_FOLDER = PROTECTED_FOLDER
+    REVIEW_FOLDER = REVIEW_FOLDER
+    SCAN_ROOT = SCAN_ROOT
+    SUPPORTED_EXTENSIONS = SUPPORTED_EXTENSIONS
+    PARTIAL_HASH_SIZE = PARTIAL_HASH_SIZE
+    PERCEPTUAL_EXTENSIONS = PERCEPTUAL_EXTENSIONS
+    VIDEO_EXTENSIONS = VIDEO_EXTENSIONS
+    QUALITY_BATCH = QUALITY_BATCH
+
+    def __init__(self, size_prefilter=True, partial_hash=True, cache_path=None,
+                 workers=1, executor='thread', hash_algorithm='md5', exclude=(), events=None,
+                 similar=False, similar_distance=SIMILAR_DISTANCE, perceptual_algorithm='dhash',
+                 video_decoder=None, index_path=None, checkpoint_path=None,
+                 checkpoint_interval=CHECKPOINT_INTERVAL, resume=False, memory_limit=None,
+                 spill_dir=None, compare='hash', verify_delete=False, backup_method='auto',
+                 io_schedule=False, rotational_workers=1, read_limit=None, iops_limit=None,
+                 pixel_match=False, pixel_tolerance=PIXEL_TOLERANCE, hash_mmap=False):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor: {executor} (expected one of {', '.join(EXECUTORS)})")
+        if perceptual_algorithm not in PERCEPTUAL_ALGORITHMS:
+            raise ValueError(f"Unknown perceptual hash: {perceptual_algorithm} "
+                             f"(expected one of {', '.join(PERCEPTUAL_ALGORITHMS)})")
+        if video_decoder is not None and video_decoder not in DECODERS:
+            raise ValueError(f"Unknown video decoder: {video_decoder} "
+                             f"(expected one of {', '.join(DECODERS)})")
+        if compare not in COMPARE_MODES:
+            raise ValueError(f"Unknown compare mode: {compare} (expected one of {', '.join(COMPARE_MODES)})")
+        if backup_method not in BACKUP_METHODS:
+            raise ValueError(f"Unknown backup method: {backup_method} "
+                             f"(expected one of {', '.join(BACKUP_METHODS)})")
+        get_engine(hash_algorithm)  # Fail early on unknown/uninstalled engines
+        self.hash_algorithm = hash_algorithm  # Digest engine for full-file hashes
+        self.hash_mmap = hash_mmap  # Map large files instead of reading them (local, quiescent files only)
+        self.size_prefilter = size_prefilter  # Only hash files that share a size
+        self.partial_hash = partial_hash  # Head/tail signature before the full hash
+        self.compare = compare  # 'bytes': lockstep comparison instead of full digests
+        self.verify_delete = verify_delete  # Compare original, duplicate and backup before deleting
+        self.backup_method = backup_method  # How duplicates reach the review folder (backup_methods.py)
+        self.workers = max(1, workers)  # Parallel hashing/probing
+        self.executor = executor  # 'thread' (hashlib releases the GIL) or 'process'
+        # Sampling/hashing reads per device, spinning disks in physical order, optionally throttled
+        throttle = Throttle(read_limit, iops_limit) if read_limit or iops_limit else None
+        self.scheduler = (IOScheduler(self.workers, rotational_workers, throttle, per_device=io_schedule)
+                          if io_schedule or throttle else None)
+        self.exclude = tuple(exclude)  # Glob patterns of files/folders to skip
+        self.similar = similar  # Also group resized/recompressed images by perceptual hash
+        self.similar_distance = similar_distance
+        self.perceptual_algorithm = perceptual_algorithm
+        self.video_decoder = video_decoder  # None = first available (PyAV, OpenCV, ffmpeg)
+        self.pixel_match = pixel_match  # Also group images showing the same picture in other formats
+        self.pixel_tolerance = pixel_tolerance
+        # Progress/timing events; the console output is one sink among others
+        self.events = events if events is not None else Instrumentation([ConsoleSink()])
+        self._pool = None  # Worker pool shared by the stages of one scan
+        self._prefetched = {}  # index -> future of a head/tail signature started during the walk
+        self.cache = ScanCache(cache_path) if cache_path else None  # Persistent results
+        self.index = ScanIndex(index_path) if index_path else None  # Previous scan, for incremental rescans
+        # Periodic snapshots of an unfinished scan; resume=True continues from the last one
+        self.checkpointer = Checkpointer(checkpoint_path, checkpoint_interval) if checkpoint_path else None
+        self.resume = resume
+        self._progress = {'partial': {}, 'digest': {}}  # index -> result, kept for checkpoints
+        self._listings = None  # Directory listings of the current scan (for the index)
+        # Duplicate groups; past memory_limit they spill to run files in spill_dir.
+        # Only these tables are bounded: the record store (~120 bytes a file),
+        # the size counts and the digests of the files being hashed stay in memory.
+        self.memory_limit = memory_limit
+        group_limit = memory_limit // 2 if memory_limit else None  # Shared by both tables
+        self.file_hashes = SpillingGroups(group_limit, spill_dir)
+        self.file_names = SpillingGroups(group_limit, spill_dir)  # NEW: duplicates by filename
+        self.file_similar = defaultdict(list)  # Near-duplicate images, keyed by first member
+        self.file_pixels = defaultdict(list)  # Same picture, other encoding, keyed by first member
+        self.hardlink_aliases = {}  # Path -> kept path it is another name (hardlink) of
+        self._moved_links = {}  # (dev, ino) -> names moved so far, for multi-link files
+        self.perceptual_hashes = {}  # index -> perceptual hash (int)
+        self.video_fingerprints = {}  # index -> parsed video fingerprint
+        self.thumbnails = None  # ThumbnailStore, opened by the first stage that needs thumbnails
+        self.thumbnail_slots = {}  # index -> slot of its decoded thumbnail
+        self.records = FileRecordStore()  # Scanned files; groups hold indices into it
         self.stats = {
             'total_scanned': 0,
             'duplicates_found': 0,
             'duplicates_by_name': 0,  # NEW
+            'duplicates_similar': 0,  # Near-duplicates by perceptual hash
+            'duplicates_same_pixels': 0,  # Same picture in another format/encoding (pixel_match)
             'files_moved': 0,
-            'space_saved': 0
+            'space_saved': 0,
+            'bytes_skipped': 0,  # Unique sizes never read
+            'partial_hashed': 0,
+            'partial_bytes_read': 0,
+            'partial_unique': 0,  # Ruled out by the head/tail signature
+            'files_hashed': 0,
+            'bytes_hashed': 0,
+            'cache_hits': 0,
+            'quality_probed': 0,
+            'quality_probes_avoided': 0,  # Files never in a group, never opened
+            'perceptual_hashed': 0,
+            'videos_fingerprinted': 0,
+            'thumbnails_decoded': 0,  # Reduced-size decodes into the thumbnail store
+            'thumbnails_reused': 0,  # Thumbnails already in the store from an earlier run
+            'record_store_bytes': 0,
+            'index_reused': 0,  # Unchanged files whose previous hash result was kept
+            'index_changed': 0,  # New or modified files
+            'index_deleted': 0,
+            'checkpoints': 0,
+            'groups_spilled_bytes': 0,  # Group tables written to run files (memory_limit)
+            'files_compared': 0,  # Candidates confirmed byte by byte (compare='bytes')
+            'bytes_compared': 0,
+            'delete_verified': 0,  # Deletions confirmed byte by byte (verify_delete)
+            'delete_unconfirmed': 0,  # Deletions skipped because contents no longer matched
+            'hardlink_reads_avoided': 0,  # Other names of an inode that was read once
+            'hardlink_aliases': 0,  # Other names of kept files - not duplicates, nothing to free
+            'backup_methods': {},  # Backup method -> files backed up with it
+            'backup_mb_per_s': 0,
+            'io_devices': 0,  # Devices read by the I/O scheduler
+            'io_rotational': 0,  # ...of which spinning disks
+            'io_physical_order': 0,  # Files read in FIEMAP extent order
+            'throttle_wait': 0  # Seconds reads were held back by read_limit/iops_limit
         }
         
     def calculate_hash(self, filepath):
-        """Calculate MD5 hash of file"""
-        hash_md5 = hashlib.md5()
-        try:
-            with open(filepath, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
-        except Exception as e:
-            print(f"⚠️ Read error: {filepath} - {e}")
-            return None
+        """Calculate digest of file with the configured engine"""
+        digest, error = hash_file(filepath, self.hash_algorithm)
+        if error:
+            self.events.emit('read_error', path=filepath, error=str(error))
+        return digest
+    
+    def calculate_partial_hash(self, filepath, size):
+        """Calculate quick signature from file size, head and tail"""
+        signature, error = partial_hash_file(filepath, size, self.PARTIAL_HASH_SIZE)
+        if error:
+            self.events.emit('read_error', path=filepath, error=str(error))
+        return signature
+    
+    def get_image_dimensions(self, filepath):
+        """Return (width, height) of photo/video, or None if unknown"""
+        return image_dimensions(filepath)
+    
+    def _quality_score(self, dimensions, file_size):
+        """Combine resolution and file size into a quality score"""
+        if not dimensions:
+            return file_size
+        width, height = dimensions
+        resolution = width * height
+        # Quality = resolution * (file_size / 1000) 
+        # Give more weight to resolution
+        return resolution * 10 + file_size
     
     def get_image_quality(self, filepath):
         """Return image quality (resolution * file_size)"""
         try:
             file_size = os.path.getsize(filepath)
-            
-            # For MP4 videos - use only file size
-            if filepath.lower().endswith('.mp4'):
-                return file_size
-            
-            # For photos - combination of resolution and size
-            try:
-                with Image.open(filepath) as img:
-                    width, height = img.size
-                    resolution = width * height
-                    # Quality = resolution * (file_size / 1000) 
-                    # Give more weight to resolution
-                    quality_score = resolution * 10 + file_size
-                    return quality_score
-            except:
-                # If can't open as image, use size only
-                return file_size
-                
+            return self._quality_score(self.get_image_dimensions(filepath), file_size)
         except Exception as e:
-            print(f"⚠️ Cannot determine quality: {filepath} - {e}")
+            self.events.emit('quality_error', path=filepath, error=str(e))
             return 0
     
     def is_in_protected_folder(self, filepath):
         """Check if file is in protected folder"""
         try:
-            return Path(filepath).is_relative_to(PROTECTED_FOLDER)
+            return Path(filepath).is_relative_to(self.PROTECTED_FOLDER)
         except:
             return False
     
     def scan_files(self):
         """Scan all files"""
-        print(f"🔍 Scanning {SCAN_ROOT}...")
-        print(f"🛡️ Protected folder: {PROTECTED_FOLDER}")
-        print(f"📁 Looking for: {', '.join(SUPPORTED_EXTENSIONS)}\n")
-        
-        for root, dirs, files in os.walk(SCAN_ROOT):
-            for file in files:
-                filepath = os.path.join(root, file)
-                ext = Path(file).suffix.lower()
-                
-                if ext in SUPPORTED_EXTENSIONS:
-                    self.stats['total_scanned'] += 1
-                    
-                    # Show progress every 10 files
-                    if self.stats['total_scanned'] % 10 == 0:
-                        print(f"   📸 Scanned: {self.stats['total_scanned']} photos/videos... (Current: {file[:40]})", end='\r')
-                    
-                    file_hash = self.calculate_hash(filepath)
-                    
-                    if file_hash:
-                        quality = self.get_image_quality(filepath)
-                        is_protected = self.is_in_protected_folder(filepath)
-                        
-                        file_info = {
-                            'path': filepath,
-                            'quality': quality,
-                            'size': os.path.getsize(filepath),
-                            'protected': is_protected
-                        }
-                        
-                        # Add to hashes (identical content)
-                        self.file_hashes[file_hash].append(file_info)
-                        
-                        # NEW: Add to filenames (same name)
-                        filename_lower = file.lower()
-                        self.file_names[filename_lower].append(file_info)
-        
-        print(f"\n✅ Scanned: {self.stats['total_scanned']} files")
+        events = self.events
+        events.emit('scan_start', root=self.SCAN_ROOT, protected=self.PROTECTED_FOLDER,
+                    extensions=', '.join(self.SUPPORTED_EXTENSIONS), algorithm=self.hash_algorithm)
+        
+        if self.cache:
+            with events.stage('cache_load'):
+                entries = self.cache.load()
+            events.emit('cache_loaded', entries=entries, path=self.cache.path)
+        
+        known_listings, self._listings = {}, None
+        if self.index:
+            with events.stage('index_load'):
+                self.index.load(self._scan_settings())
+            events.emit('index_loaded', files=len(self.index.files), path=self.index.path,
+                        valid=self.index.valid)
+            known_listings, self._listings = self.index.listings, {}
+        incremental = bool(self.index and self.index.valid)
+        
+        first = len(self.records)
+        frontier, walked = self._resume_checkpoint() if self.resume and self.checkpointer else (None, False)
+        
+        # Pass 1: walk and stat everything into the record store and size
+        # buckets. With a worker pool, sampling starts as soon as a size has
+        # been seen twice (not in incremental mode, where most sizes are unchanged).
+        records = self.records
+        size_buckets = defaultdict(int)
+        for index in range(first, len(records)):
+            size_buckets[records.sizes[index]] += 1
+        first_of_size = {}
+        prefetch = (self.workers > 1 and self.size_prefilter and self.partial_hash
+                    and not incremental and len(records) == first and not self.scheduler)
+        if self.workers > 1:
+            self._pool = EXECUTORS[self.executor](max_workers=self.workers)
+        
+        try:
+            if not walked:
+                walker = walk_files(self.SCAN_ROOT, self.SUPPORTED_EXTENSIONS,
+                                    exclude=self.exclude, prune=[self.REVIEW_FOLDER],
+                                    workers=self.workers, onerror=self._walk_error,
+                                    known_listings=known_listings, listings=self._listings,
+                                    frontier=frontier, ondirectory=self._walk_checkpoint)
+                with events.stage('walk'):
+                    self._walk(walker, size_buckets, first_of_size, prefetch)
+            
+            events.emit('scan_done', scanned=self.stats['total_scanned'])
+            
+            # Pass 2: staged hashing - size, then head/tail signature, then full digest.
+            # Incremental: only sizes that gained, lost or changed a file are redone.
+            indices = range(first, len(records))
+            reused, deleted = {}, []
+            if incremental:
+                indices, reused, deleted = self._diff_index(indices)
+            hashes = self._hash_candidates(indices, size_buckets)
+            hashes.update(reused)
+        finally:
+            if self._pool:
+                self._pool.shutdown()
+                self._pool = None
+            self._prefetched.clear()
+        
+        # Files ruled out by a read error are left out of every group;
+        # quality is evaluated lazily by find_duplicates, only for grouped files
+        with events.stage('groups'):
+            self._index_records(range(first, len(records)), hashes, size_buckets)
+        spilled = self.file_hashes.bytes_spilled + self.file_names.bytes_spilled
+        if spilled:
+            self.stats['groups_spilled_bytes'] = spilled
+            events.emit('groups_spilled', bytes=spilled, mb=spilled / 1024 / 1024,
+                        spills=self.file_hashes.spills + self.file_names.spills)
+        
+        if self.index:
+            with events.stage('index_save'):
+                changed = {records.path(i): (tuple(records.stat(i)), hashes.get(i, True))
+                           for i in indices}
+                self.index.save(self._scan_settings(), self._listings, changed, deleted)
+            events.emit('index_saved', reused=self.stats['index_reused'],
+                        changed=self.stats['index_changed'], deleted=self.stats['index_deleted'])
+        
+        self.stats['record_store_bytes'] = records.memory_usage()
+        events.emit('record_store', bytes=records.memory_usage(),
+                    mb=records.memory_usage() / 1024 / 1024,
+                    mb_per_million=records.bytes_per_million() / 1024 / 1024)
+        
+        if self.cache:
+            self.cache.flush()
+            self.stats['cache_hits'] = self.cache.hits
+            events.emit('cache_stats', hits=self.cache.hits, misses=self.cache.misses)
+        
+        # The scan is complete - nothing left to resume
+        if self.checkpointer:
+            self.checkpointer.clear()
+        self._progress = {'partial': {}, 'digest': {}}
+    
+    def _checkpoint(self, frontier=()):
+        """Write a checkpoint if one is due (walk frontier empty = walk finished)"""
+        if not self.checkpointer or not self.checkpointer.due():
+            return
+        state = {
+            'settings': self._scan_settings(),
+            'walked': not frontier,
+            'frontier': list(frontier),
+            'records': self.records,
+            'listings': self._listings,
+            'progress': self._progress,
+            'stats': self.stats,
+        }
+        with self.events.stage('checkpoint'):
+            seconds, nbytes = self.checkpointer.save(state)
+        self.stats['checkpoints'] += 1
+        self.events.emit('checkpoint_saved', path=self.checkpointer.path, files=len(self.records),
+                         seconds=seconds, bytes=nbytes, mb=nbytes / 1024 / 1024)
+    
+    def _walk_checkpoint(self, frontier):
+        """Walk callback: all files of a directory are in the store - a consistent point"""
+        self._checkpoint(frontier)
+    
+    def _resume_checkpoint(self):
+        """Restore the last checkpoint; return (walk frontier, whether the walk had finished)"""
+        state = self.checkpointer.load()
+        if state is None or state['settings'] != self._scan_settings():
+            self.events.emit('checkpoint_missing', path=self.checkpointer.path)
+            return None, False
+        self.records = state['records']
+        self._progress = state['progress']
+        self.stats.update(state['stats'])
+        if self._listings is not None and state['listings']:
+            self._listings.update(state['listings'])
+        self.events.emit('checkpoint_resumed', path=self.checkpointer.path, files=len(self.records),
+                         pending=len(state['frontier']), hashed=len(self._progress['digest']))
+        return state['frontier'], state['walked']
+    
+    def verify_against_full_scan(self):
+        """Rescan from scratch (no index, no cache) and compare the duplicate groups.
+        
+        Returns a list of (kind, 'missing' | 'extra', [paths]) differences;
+        an empty list proves the incremental scan found the same groups.
+        """
+        reference = DuplicateFinder(size_prefilter=self.size_prefilter, partial_hash=self.partial_hash,
+                                    workers=self.workers, executor=self.executor,
+                                    hash_algorithm=self.hash_algorithm, exclude=self.exclude,
+                                    events=Instrumentation())
+        for name in ('SCAN_ROOT', 'PROTECTED_FOLDER', 'REVIEW_FOLDER',
+                     'SUPPORTED_EXTENSIONS', 'PARTIAL_HASH_SIZE'):
+            setattr(reference, name, getattr(self, name))
+        self.events.emit('verify_start')
+        with self.events.stage('verify'):
+            reference.scan_files()
+        
+        differences = []
+        for kind, mine, theirs in (('content', self.file_hashes, reference.file_hashes),
+                                   ('name', self.file_names, reference.file_names)):
+            mine, theirs = self._path_groups(mine), reference._path_groups(theirs)
+            differences += [(kind, 'missing', sorted(group)) for group in theirs - mine]
+            differences += [(kind, 'extra', sorted(group)) for group in mine - theirs]
+        for kind, problem, paths in differences:
+            self.events.emit('verify_difference', kind=kind, problem=problem, paths=paths)
+        self.events.emit('verify_done', differences=len(differences))
+        return differences
+    
+    def _path_groups(self, groups):
+        """Groups with more than one file, as sets of paths"""
+        return {frozenset(self._record(entry)['path'] for entry in files)
+                for files in groups.values() if len(files) > 1}
+    
+    def _scan_settings(self):
+        """Settings a scan index or checkpoint is only valid for"""
+        settings = {
+            'root': os.path.abspath(self.SCAN_ROOT),
+            'review': os.path.abspath(self.REVIEW_FOLDER),
+            'extensions': sorted(self.SUPPORTED_EXTENSIONS),
+            'exclude': list(self.exclude),
+            'hash_algorithm': self.hash_algorithm,
+            'size_prefilter': self.size_prefilter,
+            'partial_hash': self.partial_hash and self.PARTIAL_HASH_SIZE,
+        }
+        if self.compare != 'hash':  # Group keys are not digests - never mix them
+            settings['compare'] = self.compare
+        return settings
+    
+    def _diff_index(self, indices):
+        """Compare scanned files with the previous scan's index.
+        
+        Returns (indices to re-hash, {index: previous hash result}, deleted
+        paths). A file is re-hashed when it is new or modified, when it had
+        a read error, or when its size bucket gained or lost a file.
+        """
+        records = self.records
+        previous = self.index.files
+        seen = set()
+        touched_sizes = set()
+        unchanged = []
+        for index in indices:
+            filepath = records.path(index)
+            seen.add(filepath)
+            entry = previous.get(filepath)
+            if entry and entry[0] == stat_key(records.stat(index)) and entry[1] is not None:
+                unchanged.append(index)
+            else:
+                touched_sizes.add(records.sizes[index])
+                if entry:
+                    touched_sizes.add(entry[0][2])  # Old size loses a member too
+                self.stats['index_changed'] += 1
+        
+        deleted = [path for path in previous if path not in seen]
+        for path in deleted:
+            touched_sizes.add(previous[path][0][2])
+        self.stats['index_deleted'] = len(deleted)
+        
+        reused = {}
+        for index in unchanged:
+            if records.sizes[index] not in touched_sizes:
+                reused[index] = previous[records.path(index)][1]
+        todo = [index for index in indices if index not in reused]
+        self.stats['index_reused'] = len(reused)
+        return todo, reused, deleted
+    
+    def _walk(self, walker, size_buckets, first_of_size, prefetch):
+        """Pass 1: add walked files to the record store and size buckets"""
+        records = self.records
+        for filepath, file, st in walker:
+            self.stats['total_scanned'] += 1
+            self.events.count('walk', files=1)
+            
+            # Show progress every 10 files
+            if self.stats['total_scanned'] % 10 == 0:
+                self.events.emit('scan_progress', scanned=self.stats['total_scanned'], current=file[:40])
+            
+            index = records.add(filepath, st, self.is_in_protected_folder(filepath))
+            size_buckets[st.st_size] += 1
+            
+            if prefetch:
+                if size_buckets[st.st_size] == 1:
+                    first_of_size[st.st_size] = index
+                else:
+                    if size_buckets[st.st_size] == 2:
+                        self._prefetch_partial(first_of_size.pop(st.st_size))
+                    self._prefetch_partial(index)
+    
+    def _index_records(self, indices, hashes, size_buckets):
+        """Add scanned records to the hash and name groups"""
+        records = self.records
+        for index in indices:
+            # No hash: unique size or signature - cannot have an identical twin
+            file_hash = hashes.get(index, True)
+            if not file_hash:
+                continue
+            
+            size = records.sizes[index]
+            if self.size_prefilter and size_buckets[size] == 1:
+                self.stats['bytes_skipped'] += size
+            
+            # Add to hashes (identical content)
+            if file_hash is not True:
+                self.file_hashes.add(file_hash, index)
+            
+            # NEW: Add to filenames (same name)
+            filename_lower = records.names[index].lower()
+            self.file_names.add(filename_lower, index)
+    
+    def _record(self, entry):
+        """Return the record for a group entry (store index or file_info dict)"""
+        return self.records[entry] if isinstance(entry, int) else entry
+    
+    def _cached(self, filepath, st, field, **expected):
+        """Return a cached result for an unchanged file, or None"""
+        if not self.cache:
+            return None
+        return self.cache.get(filepath, st, field, **expected)
+    
+    def _walk_error(self, path, error):
+        """Report an unreadable file or folder found during the walk"""
+        self.events.emit('walk_error', path=path, error=str(error))
+    
+    def _prefetch_partial(self, index):
+        """Start sampling a file in the worker pool while the walk continues"""
+        filepath, st = self.records.path(index), self.records.stat(index)
+        entry = self.cache.lookup(filepath, st) if self.cache else None
+        if entry and entry['partial'] and entry['partial_size'] == self.PARTIAL_HASH_SIZE:
+            return  # Will be served from the cache
+        self._prefetched[index] = self._pool.submit(
+            timed_call, partial_hash_file, filepath, st.st_size, self.PARTIAL_HASH_SIZE)
+    
+    def _run_jobs(self, func, columns, label, stage, reads=None, locate=False):
+        """Run func over job columns, serially or in the worker pool.
+        
+        Results are yielded in job order, so merging them does not depend
+        on scheduling. Progress is counted as results are consumed; the
+        first column holds the file paths, timed per file for the stage.
+        With an I/O scheduler, jobs given reads - (path, stat, bytes read)
+        per job - run per device instead (see io_scheduler.py); locate
+        jobs also report the disk offsets later reads are ordered by.
+        """
+        total = len(columns[0])
+        pool = None
+        if self.scheduler and reads is not None:
+            results = self._scheduled(func, columns, reads, locate)
+        elif self.workers > 1 and total > 1:
+            pool = self._pool or EXECUTORS[self.executor](max_workers=self.workers)
+            chunksize = max(1, min(256, total // (self.workers * 4))) if self.executor == 'process' else 1
+            results = pool.map(timed_call, repeat(func), *columns, chunksize=chunksize)
+        else:
+            results = map(timed_call, repeat(func), *columns)
+        
+        try:
+            for done, (seconds, result) in enumerate(results, 1):
+                self.events.record_file(stage, columns[0][done - 1], seconds)
+                if done % 10 == 0:
+                    self.events.emit('progress', label=label, done=done, total=total)
+                yield result
+        finally:
+            if pool and pool is not self._pool:
+                pool.shutdown()
+    
+    def _scheduled(self, func, columns, reads, locate=False):
+        """Run read jobs through the I/O scheduler, in job order"""
+        scheduler = self.scheduler
+        try:
+            yield from scheduler.map(timed_call, list(zip(repeat(func), *columns)), reads, locate)
+        finally:
+            self.stats['io_devices'] = len(scheduler.devices)
+            self.stats['io_rotational'] = len(scheduler.rotational)
+            self.stats['io_physical_order'] = scheduler.physical_order
+            if scheduler.throttle:
+                self.stats['throttle_wait'] = scheduler.throttle.waited
+    
+    def _partial_hashes(self, indices):
+        """Return {index: head/tail signature or None} for store indices"""
+        records = self.records
+        signatures = {}
+        todo = []
+        done = self._progress['partial']
+        for index in indices:
+            if index in done:  # Sampled before the checkpoint we resumed from
+                signatures[index] = done[index]
+                continue
+            filepath, st = records.path(index), records.stat(index)
+            signature = self._cached(filepath, st, 'partial', partial_size=self.PARTIAL_HASH_SIZE)
+            if signature:
+                signatures[index] = signature
+            else:
+                todo.append((index, filepath, st))
+        
+        # Files whose sampling already started during the walk are not resubmitted
+        sample = self.PARTIAL_HASH_SIZE
+        rest = [job for job in todo if job[0] not in self._prefetched]
+        columns = ([f for _, f, _ in rest], [st.st_size for _, _, st in rest], [sample] * len(rest))
+        reads = [(f, st, min(st.st_size, sample * 2)) for _, f, st in rest]
+        computed = iter(self._run_jobs(partial_hash_file, columns, "🔑 Sampled", 'sample', reads,
+                                       locate=True) if rest else [])
+        for index, filepath, st in todo:
+            future = self._prefetched.pop(index, None)
+            if future:
+                seconds, (signature, error) = future.result()
+                self.events.record_file('sample', filepath, seconds)
+            else:
+                signature, error = next(computed)
+            nbytes = min(st.st_size, sample * 2)
+            self.stats['partial_hashed'] += 1
+            self.stats['partial_bytes_read'] += nbytes
+            self.events.count('sample', files=1, nbytes=nbytes)
+            if error:
+                self.events.emit('read_error', path=filepath, error=str(error))
+            elif self.cache:
+                self.cache.update(filepath, st, partial=signature, partial_size=sample)
+            signatures[index] = signature
+            if self.checkpointer and not error:
+                done[index] = signature
+                self._checkpoint()
+        return signatures
+    
+    def _full_hashes(self, indices):
+        """Return {index: digest or None} for store indices"""
+        records = self.records
+        digests = {}
+        todo = []
+        done = self._progress['digest']
+        for index in indices:
+            if index in done:  # Hashed before the checkpoint we resumed from
+                digests[index] = done[index]
+                continue
+            filepath, st = records.path(index), records.stat(index)
+            digest = self._cached(filepath, st, 'digest', algorithm=self.hash_algorithm)
+            if digest:
+                digests[index] = digest
+            else:
+                todo.append((index, filepath, st))
+        
+        columns = ([f for _, f, _ in todo], [self.hash_algorithm] * len(todo))
+        if self.hash_mmap:
+            columns += ([True] * len(todo),)
+        reads = [(f, st, st.st_size) for _, f, st in todo]
+        results = self._run_jobs(hash_file, columns, "🔑 Hashed", 'hash', reads) if todo else []
+        for (index, filepath, st), (digest, error) in zip(todo, results):
+            self.stats['files_hashed'] += 1
+            self.stats['bytes_hashed'] += st.st_size
+            self.events.count('hash', files=1, nbytes=st.st_size)
+            if error:
+                self.events.emit('read_error', path=filepath, error=str(error))
+            elif self.cache:
+                self.cache.update(filepath, st, digest=digest, algorithm=self.hash_algorithm)
+            digests[index] = digest
+            if self.checkpointer and not error:
+                done[index] = digest
+                self._checkpoint()
+        return digests
+    
+    def _compared(self, groups):
+        """Return {index: group key or None} from a lockstep comparison of each group"""
+        records = self.records
+        keys = {}
+        paths = [[records.path(index) for index in group] for group in groups]
+        results = self._run_jobs(compare_files, (paths,), "🔬 Compared groups", 'compare')
+        for group, group_paths, (identical, errors, bytes_read) in zip(groups, paths, results):
+            self.stats['files_compared'] += len(group)
+            self.stats['bytes_compared'] += bytes_read
+            self.events.count('compare', files=len(group), nbytes=bytes_read)
+            for position, error in errors.items():
+                self.events.emit('read_error', path=group_paths[position], error=str(error))
+                keys[group[position]] = None
+            for members in identical:
+                # No digest to name the group by - its first path is unique
+                first = members[0]
+                key = f"bytes:{records.sizes[group[first]]}:{group_paths[first]}"
+                for position in members:
+                    keys[group[position]] = key
+        return keys
+    
+    def _qualities(self, items):
+        """Return {path: quality score} for (path, stat) items"""
+        qualities = {}
+        todo = []
+        for filepath, st in items:
+            quality = self._cached(filepath, st, 'quality')
+            if quality is not None:
+                qualities[filepath] = quality
+            else:
+                todo.append((filepath, st))
+        
+        results = self._run_jobs(image_dimensions, ([f for f, _ in todo],), "🖼️ Probed", 'quality') if todo else []
+        for (filepath, st), dimensions in zip(todo, results):
+            quality = self._quality_score(dimensions, st.st_size)
+            self.stats['quality_probed'] += 1
+            self.events.count('quality', files=1)
+            if self.cache:
+                width, height = dimensions or (None, None)
+                self.cache.update(filepath, st, width=width, height=height, quality=quality)
+            qualities[filepath] = quality
+        return qualities
+    
+    def _resolve_qualities(self):
+        """Evaluate (once) the quality of every file that is in a group"""
+        pending = {}
+        for groups in (self.file_hashes, self.file_names, self.file_similar, self.file_pixels):
+            for files in groups.values():
+                if len(files) > 1:
+                    for entry in files:
+                        record = self._record(entry)
+                        if record['quality'] is None:
+                            pending.setdefault(record['path'], []).append((entry, record))
+                    # Spilled groups come back one partition at a time - so does this
+                    if len(pending) >= self.QUALITY_BATCH:
+                        self._resolve_pending(pending)
+                        pending = {}
+        self._resolve_pending(pending)
+        if self.cache:
+            self.cache.flush()
+            self.stats['cache_hits'] = self.cache.hits
+        
+        # Files that were never needed in any group (each file has one name group)
+        self.stats['quality_probes_avoided'] = sum(
+            1 for files in self.file_names.values() for entry in files
+            if self._record(entry)['quality'] is None)
+    
+    def _resolve_pending(self, pending):
+        """Evaluate the quality of {path: [(entry, record)]} and store it in the records"""
+        items = []
+        first_name, alias_of = {}, {}  # One probe per inode
+        for filepath, entries in pending.items():
+            entry = entries[0][0]
+            if isinstance(entry, int):
+                inode = self.records.inode(entry) if entry in self.records.links else None
+                if inode is not None:
+                    if inode in first_name:
+                        alias_of[filepath] = first_name[inode]
+                        continue
+                    first_name[inode] = filepath
+                st = self.records.stat(entry)
+            else:
+                try:
+                    st = os.stat(filepath)
+                except OSError as e:
+                    self.events.emit('quality_error', path=filepath, error=str(e))
+                    for _, record in entries:
+                        record['quality'] = 0
+                    continue
+            items.append((filepath, st))
+        
+        if not items:
+            return
+        self.events.emit('quality_start', count=len(items))
+        with self.events.stage('quality'):
+            qualities = self._qualities(items)
+        for filepath, first in alias_of.items():
+            if first in qualities:
+                qualities[filepath] = qualities[first]
+        for filepath, quality in qualities.items():
+            for _, record in pending[filepath]:
+                record['quality'] = quality
+    
+    def _perceptual_hashes(self, indices):
+        """Return {index: perceptual hash (int)} for store indices that could be decoded"""
+        records = self.records
+        algorithm = self.perceptual_algorithm
+        hashes = {}
+        if self.pixel_match:
+            # From the stored thumbnails - no image is decoded again
+            hash_image = IMAGE_ALGORITHMS[algorithm]
+            for index, slot in self._thumbnail_slots(indices).items():
+                self.stats['perceptual_hashed'] += 1
+                hashes[index] = hash_image(self.thumbnails.image(slot))
+            return hashes
+        todo = []
+        for index in indices:
+            filepath, st = records.path(index), records.stat(index)
+            value = self._cached(filepath, st, 'phash', phash_algorithm=algorithm)
+            if value:
+                hashes[index] = int(value, 16)
+            else:
+                todo.append((index, filepath, st))
+        
+        columns = ([f for _, f, _ in todo], [algorithm] * len(todo))
+        results = self._run_jobs(perceptual_hash, columns, "🧬 Fingerprinted", 'phash') if todo else []
+        for (index, filepath, st), (value, error) in zip(todo, results):
+            self.stats['perceptual_hashed'] += 1
+            self.events.count('phash', files=1, nbytes=st.st_size)
+            if error:
+                self.events.emit('phash_error', path=filepath, error=str(error))
+                continue
+            if self.cache:
+                self.cache.update(filepath, st, phash=value, phash_algorithm=algorithm)
+            hashes[index] = int(value, 16)
+        return hashes
+    
+    def _video_fingerprints(self, indices, decoder):
+        """Return {index: parsed video fingerprint} for store indices that could be decoded"""
+        records = self.records
+        fingerprints = {}
+        todo = []
+        for index in indices:
+            filepath, st = records.path(index), records.stat(index)
+            value = self._cached(filepath, st, 'video_fingerprint', video_samples=FRAME_SAMPLES)
+            if value:
+                fingerprints[index] = parse_fingerprint(value)
+            else:
+                todo.append((index, filepath, st))
+        
+        columns = ([f for _, f, _ in todo], [decoder] * len(todo))
+        results = self._run_jobs(video_fingerprint, columns, "🎞️ Sampled frames", 'video') if todo else []
+        for (index, filepath, st), (value, error) in zip(todo, results):
+            self.stats['videos_fingerprinted'] += 1
+            self.events.count('video', files=1)
+            if error:
+                self.events.emit('phash_error', path=filepath, error=str(error))
+                continue
+            if self.cache:
+                self.cache.update(filepath, st, video_fingerprint=value, video_samples=FRAME_SAMPLES)
+            fingerprints[index] = parse_fingerprint(value)
+        return fingerprints
+    
+    def _group_similar(self):
+        """Group images (and videos) whose perceptual hashes are within similar_distance"""
+        records = self.records
+        images, videos = [], []
+        for index in range(len(records)):
+            ext = os.path.splitext(records.names[index])[1].lower()
+            if ext in self.PERCEPTUAL_EXTENSIONS:
+                images.append(index)
+            elif ext in self.VIDEO_EXTENSIONS:
+                videos.append(index)
+        
+        if self.pixel_match:
+            # Hashed from the thumbnails pixel matching needs anyway
+            with self.events.stage('thumbnail'):
+                self._thumbnail_slots(images)
+        self.events.emit('similar_start', count=len(images), algorithm=self.perceptual_algorithm)
+        with self.events.stage('phash'):
+            self.perceptual_hashes = self._perceptual_hashes(images)
+        
+        if videos:
+            decoder = self.video_decoder or available_decoder()
+            if decoder:
+                self.events.emit('video_start', count=len(videos), decoder=decoder)
+                with self.events.stage('video'):
+                    self.video_fingerprints = self._video_fingerprints(videos, decoder)
+            else:
+                self.events.emit('video_decoder_missing', count=len(videos))
+        if self.cache:
+            self.cache.flush()
+        
+        def neighbours():
+            # Images: index every hash, then join each image with its neighbours
+            lookup = MultiIndexHash(self.similar_distance)
+            for index, value in self.perceptual_hashes.items():
+                lookup.add(value, index)
+            for index, value in self.perceptual_hashes.items():
+                for _, other in lookup.search(value):
+                    yield index, other
+            
+            # Videos: only clips of (nearly) the same duration are compared
+            by_duration = sorted(self.video_fingerprints, key=lambda i: self.video_fingerprints[i][0])
+            for position, index in enumerate(by_duration):
+                duration = self.video_fingerprints[index][0]
+                for other in by_duration[position + 1:]:
+                    if self.video_fingerprints[other][0] - duration > DURATION_TOLERANCE:
+                        break
+                    distance = video_distance(self.video_fingerprints[index], self.video_fingerprints[other])
+                    if distance is not None and distance <= self.similar_distance:
+                        yield index, other
+        
+        fingerprinted = list(self.perceptual_hashes) + list(self.video_fingerprints)
+        with self.events.stage('similar_search'):
+            self.file_similar.clear()
+            self.file_similar.update(connected_groups(fingerprinted, neighbours()))
+        groups = sum(1 for files in self.file_similar.values() if len(files) > 1)
+        self.events.emit('similar_done', hashed=len(fingerprinted), groups=groups)
+    
+    def _image_indices(self):
+        """Store indices of the files compared by their pixels"""
+        records = self.records
+        return [index for index in range(len(records))
+                if os.path.splitext(records.names[index])[1].lower() in self.PERCEPTUAL_EXTENSIONS]
+    
+    def _thumbnail_slots(self, indices):
+        """Decode the thumbnails store indices lack (each at most once); return {index: slot}"""
+        if self.thumbnails is None:
+            # Next to the cache, so slot numbers outlive the run; else for this run only
+            self.thumbnails = ThumbnailStore(
+                os.path.join(os.path.dirname(self.cache.path), THUMBNAIL_FILENAME) if self.cache else None)
+        records, store, slots = self.records, self.thumbnails, self.thumbnail_slots
+        todo = []
+        for index in indices:
+            if index in slots:
+                continue
+            filepath, st = records.path(index), records.stat(index)
+            slot = self._cached(filepath, st, 'thumbnail_slot', thumbnail_store=store.id)
+            if slot is not None and slot < len(store):
+                slots[index] = slot
+                self.stats['thumbnails_reused'] += 1
+            else:
+                todo.append((index, filepath, st))
+        
+        if todo:
+            self.events.emit('thumbnail_start', count=len(todo), reused=self.stats['thumbnails_reused'])
+        columns = ([f for _, f, _ in todo],)
+        results = self._run_jobs(decode_thumbnail, columns, "🖼️ Decoded", 'thumbnail') if todo else []
+        for (index, filepath, st), (data, error) in zip(todo, results):
+            self.stats['thumbnails_decoded'] += 1
+            self.events.count('thumbnail', files=1, nbytes=st.st_size)
+            if error:
+                slots[index] = None  # Not tried again this run
+                self.events.emit('thumbnail_error', path=filepath, error=str(error))
+                continue
+            slots[index] = store.add(data)
+            if self.cache:
+                self.cache.update(filepath, st, thumbnail_store=store.id, thumbnail_slot=slots[index])
+        return {index: slots[index] for index in indices if slots.get(index) is not None}
+    
+    def _group_pixels(self):
+        """Group images whose thumbnails show the same picture (any format or encoding)"""
+        with self.events.stage('thumbnail'):
+            slots = self._thumbnail_slots(self._image_indices())
+        if self.cache:
+            self.cache.flush()
+        
+        store, tolerance = self.thumbnails, self.pixel_tolerance
+        
+        def neighbours():
+            # Each thumbnail is compared with the earlier ones sharing a block-mean cell
+            lookup = PixelIndex(tolerance, store.size)
+            for index, slot in slots.items():
+                dimensions, pixels = store.get(slot)
+                means = lookup.block_means(pixels)
+                for other in lookup.candidates(means):
+                    other_dimensions, other_pixels = store.get(slots[other])
+                    if (same_aspect(dimensions, other_dimensions)
+                            and pixel_distance(pixels, other_pixels) <= tolerance):
+                        yield other, index
+                lookup.add(means, index)
+        
+        with self.events.stage('pixel_search'):
+            self.file_pixels.clear()
+            self.file_pixels.update(connected_groups(slots, neighbours()))
+        groups = sum(1 for files in self.file_pixels.values() if len(files) > 1)
+        self.events.emit('pixel_done', thumbnails=len(slots), groups=groups)
+    
+    def _hash_candidates(self, indices, size_buckets):
+        """Run the staged hash pipeline, return {index: digest or None}"""
+        sizes = self.records.sizes
+        hashes = {}
+        
+        # Stage 1: size - only files sharing a size can be identical
+        candidates = [index for index in indices
+                      if not self.size_prefilter or size_buckets[sizes[index]] > 1]
+        
+        # Names of one inode (hardlinks) are one file: read it once, share the result
+        candidates, aliases = self._split_aliases(candidates)
+        if aliases and self.size_prefilter:
+            # A size shared only by the names of one inode is unique after all
+            counts = Counter(sizes[index] for index in candidates)
+            candidates = [index for index in candidates if counts[sizes[index]] > 1]
+        
+        if candidates:
+            hashes = self._confirm_candidates(candidates)
+        for alias, index in aliases.items():
+            if index in hashes:
+                hashes[alias] = hashes[index]
+        return hashes
+    
+    def _split_aliases(self, indices):
+        """Return (one index per inode, {alias index: index of the inode's first name})"""
+        records = self.records
+        if not records.links:
+            return list(indices), {}
+        first, unique, aliases = {}, [], {}
+        for index in indices:
+            inode = records.inode(index) if index in records.links else None
+            if inode is not None:
+                if inode in first:
+                    aliases[index] = first[inode]
+                    continue
+                first[inode] = index
+            unique.append(index)
+        self.stats['hardlink_reads_avoided'] += len(aliases)
+        return unique, aliases
+    
+    def _confirm_candidates(self, candidates):
+        """Stages 2 and 3 for files sharing a size, return {index: digest or None}"""
+        sizes = self.records.sizes
+        hashes = {}
+        groups = None  # Candidate groups, for the byte comparison
+        
+        # Stage 2: head/tail signature - most same-size files differ early
+        if self.partial_hash:
+            self.events.emit('sample_start', count=len(candidates))
+            with self.events.stage('sample'):
+                signatures = self._partial_hashes(candidates)
+            partial_groups = defaultdict(list)
+            for index in candidates:
+                signature = signatures[index]
+                if signature is None:
+                    hashes[index] = None
+                else:
+                    partial_groups[(sizes[index], signature)].append(index)
+            
+            candidates, groups = [], []
+            for group in partial_groups.values():
+                if len(group) > 1:
+                    candidates.extend(group)
+                    groups.append(group)
+                else:
+                    self.stats['partial_unique'] += 1
+            self.events.emit('sample_done', sampled=self.stats['partial_hashed'],
+                             ruled_out=self.stats['partial_unique'])
+        
+        # Stage 3: full digest (or byte comparison) for groups that still collide
+        if candidates and self.compare == 'bytes':
+            if groups is None:
+                by_size = defaultdict(list)
+                for index in candidates:
+                    by_size[sizes[index]].append(index)
+                groups = [group for group in by_size.values() if len(group) > 1]
+            self.events.emit('compare_start', count=sum(map(len, groups)), groups=len(groups))
+            with self.events.stage('compare'):
+                hashes.update(self._compared(groups))
+            self.events.emit('compare_done', compared=self.stats['files_compared'],
+                             mb=self.stats['bytes_compared'] / 1024 / 1024)
+        elif candidates:
+            self.events.emit('hash_start', count=len(candidates))
+            with self.events.stage('hash'):
+                hashes.update(self._full_hashes(candidates))
+            self.events.emit('hash_done', hashed=self.stats['files_hashed'])
+        
+        return hashes
     
     def find_duplicates(self):
         """Find duplicates and determine which files to move"""
         files_to_move = []
         processed_paths = set()  # Avoid duplicating files
+        self.hardlink_aliases, self._moved_links = {}, {}
+        self._group_ids = count(1)  # Report group numbers, in planning order
+        
+        if self.similar:
+            self._group_similar()
+        if self.pixel_match:
+            self._group_pixels()
+        
+        # Quality only matters inside groups - evaluate it there, once per file
+        self._resolve_qualities()
         
-        print(f"\n🔎 Looking for duplicates by content (hash)...")
+        self.events.emit('search_start', method='content (hash)')
         
         # 1. DUPLICATES BY HASH (identical content)
-        for file_hash, files in self.file_hashes.items():
-            if len(files) > 1:
-                self.stats['duplicates_found'] += len(files) - 1
-                
-                # Sort: protected first, then by quality
-                files_sorted = sorted(files, 
-                                    key=lambda x: (x['protected'], x['quality']), 
-                                    reverse=True)
-                
-                best_file = files_sorted[0]
-                duplicates = files_sorted[1:]
-                
-                # Check if any duplicate has better quality than protected
-                for dup in duplicates:
-                    if best_file['protected'] and dup['quality'] > best_file['quality']:
-                        # Duplicate has better quality than protected - keep it
-                        print(f"\n⭐ Found better version than protected:")
-                        print(f"   Protected: {best_file['path']} (quality: {best_file['quality']})")
-                        print(f"   Better: {dup['path']} (quality: {dup['quality']})")
-                        continue
-                    
-                    # Otherwise - move duplicate
-                    if dup['path'] not in processed_paths:
-                        files_to_move.append({
-                            'original': best_file['path'],
-                            'duplicate': dup['path'],
-                            'size': dup['size'],
-                            'reason': 'identical content (hash)'
-                        })
-                        processed_paths.add(dup['path'])
-        
-        print(f"✅ Found {self.stats['duplicates_found']} duplicates by content")
-        
-        # 2. DUPLICATES BY NAME (same name, different content)
-        print(f"\n🔎 Looking for duplicates by filename...")
-        
-        for filename, files in self.file_names.items():
-            if len(files) > 1:
-                # Check if these aren't already duplicates by hash (skip them)
-                unique_hashes = set()
-                for f in files:
-                    # Calculate simple identifier based on path and size
-                    unique_hashes.add((f['path'], f['size']))
+        with self.events.stage('group_hash'):
+            for file_hash, files in self.file_hashes.items():
+                if len(files) > 1:
+                    self._rank_hash_group([self._record(f) for f in files], processed_paths, files_to_move,
+                                          file_hash)
+        
+        self.events.emit('hash_search_done', found=self.stats['duplicates_found'])
+        
+        # 2. SAME PICTURE IN ANOTHER FORMAT (HEIC original and JPEG export, PNG and JPEG, ...)
+        if self.pixel_match:
+            self.events.emit('search_start', method='pixel content')
+            with self.events.stage('group_pixels'):
+                for files in self.file_pixels.values():
+                    if len(files) > 1:
+                        self._rank_pixel_group([self._record(f) for f in files], processed_paths, files_to_move)
+            self.events.emit('pixel_search_done', found=self.stats['duplicates_same_pixels'])
+        
+        # 3. DUPLICATES BY NAME (same name, different content)
+        self.events.emit('search_start', method='filename')
+        
+        with self.events.stage('group_name'):
+            for filename, files in self.file_names.items():
+                if len(files) > 1:
+                    self._rank_name_group(filename, [self._record(f) for f in files],
+                                          processed_paths, files_to_move)
+        
+        self.events.emit('name_search_done', found=self.stats['duplicates_by_name'])
+        
+        # 4. NEAR DUPLICATES (resized/recompressed images, by perceptual hash)
+        if self.similar:
+            self.events.emit('search_start', method='perceptual hash')
+            with self.events.stage('group_similar'):
+                files_to_move.extend(self._similar_moves(processed_paths))
+            self.events.emit('similar_search_done', found=self.stats['duplicates_similar'])
+        
+        self.stats['hardlink_aliases'] = len(self.hardlink_aliases)
+        if self.hardlink_aliases:
+            self.events.emit('hardlinks_found', count=len(self.hardlink_aliases))
+        
+        return files_to_move
+    
+    def _rank(self, files):
+        """Return (kept file, duplicates to move, duplicates kept for their better quality)"""
+        # Sort: protected first, then by quality
+        files_sorted = sorted(files, 
+                            key=lambda x: (x['protected'], x['quality']), 
+                            reverse=True)
+        
+        best_file = files_sorted[0]
+        moves, kept = [], []
+        for dup in files_sorted[1:]:
+            if best_file['protected'] and dup['quality'] > best_file['quality']:
+                # Duplicate has better quality than protected - keep it
+                kept.append(dup)
+            else:
+                moves.append(dup)
+        return best_file, moves, kept
+    
+    def _rank_hash_group(self, files, processed_paths, files_to_move, digest=None):
+        """Keep the best of a group of identical files, queue the rest for moving"""
+        best_file, moves, kept = self._rank(files)
+        # Other names of the kept file (hardlinks) are not duplicates
+        moves = [dup for dup in moves if not self._is_alias(best_file, dup)]
+        kept = [dup for dup in kept if not self._is_alias(best_file, dup)]
+        self.stats['duplicates_found'] += len(moves) + len(kept)
+        
+        for dup in kept:
+            self.events.emit('better_than_protected', method='hash',
+                             protected=best_file['path'], protected_quality=best_file['quality'],
+                             better=dup['path'], better_quality=dup['quality'])
+        
+        group = next(self._group_ids) if moves else None
+        for dup in moves:
+            if dup['path'] not in processed_paths:
+                files_to_move.append({
+                    'original': best_file['path'],
+                    'duplicate': dup['path'],
+                    'size': self._reclaimable(dup),
+                    'reason': 'identical content (hash)',
+                    'group': group,
+                    'digest': digest
+                })
+                processed_paths.add(dup['path'])
+    
+    def _rank_name_group(self, filename, files, processed_paths, files_to_move):
+        """Keep the best of a group of same-name files, queue the rest for moving"""
+        # Check if these aren't already duplicates by hash (skip them)
+        unique_hashes = set()
+        for f in files:
+            # Calculate simple identifier based on path and size
+            unique_hashes.add((f['path'], f['size']))
+        
+        if len(unique_hashes) <= 1:
+            return
+        
+        best_file, moves, kept = self._rank(files)
+        moves = [dup for dup in moves if not self._is_alias(best_file, dup)]
+        kept = [dup for dup in kept if not self._is_alias(best_file, dup)]
+        # Different files with same name
+        self.stats['duplicates_by_name'] += len(moves) + len(kept)
+        
+        for dup in kept:
+            # Check if already processed
+            if dup['path'] not in processed_paths:
+                # Duplicate has better quality than protected - keep it
+                self.events.emit('better_than_protected', method='name',
+                                 protected=best_file['path'], protected_quality=best_file['quality'],
+                                 better=dup['path'], better_quality=dup['quality'])
+        
+        group = next(self._group_ids) if moves else None
+        for dup in moves:
+            if dup['path'] in processed_paths:
+                continue
+            
+            # Move duplicate
+            files_to_move.append({
+                'original': best_file['path'],
+                'duplicate': dup['path'],
+                'size': self._reclaimable(dup),
+                'reason': f'same name: {filename}',
+                'group': group,
+                'digest': None
+            })
+            processed_paths.add(dup['path'])
+    
+    def _rank_pixel_group(self, files, processed_paths, files_to_move):
+        """Keep the best of a group of files showing the same picture, queue the rest for moving"""
+        # Files already moved as identical content are out of the running
+        files = [f for f in files if f['path'] not in processed_paths]
+        if len(files) < 2:
+            return
+        
+        best_file, moves, kept = self._rank(files)
+        moves = [dup for dup in moves if not self._is_alias(best_file, dup)]
+        kept = [dup for dup in kept if not self._is_alias(best_file, dup)]
+        
+        # Groups are transitive (A~B, B~C); only files within tolerance of the keeper itself are moved
+        best_dimensions, best_pixels = self.thumbnails.get(self.thumbnail_slots[best_file.index])
+        close = []
+        for dup in moves:
+            dimensions, pixels = self.thumbnails.get(self.thumbnail_slots[dup.index])
+            distance = pixel_distance(best_pixels, pixels)
+            if same_aspect(best_dimensions, dimensions) and distance <= self.pixel_tolerance:
+                close.append((dup, distance))
+        self.stats['duplicates_same_pixels'] += len(close) + len(kept)
+        
+        for dup in kept:
+            self.events.emit('better_than_protected', method='pixels',
+                             protected=best_file['path'], protected_quality=best_file['quality'],
+                             better=dup['path'], better_quality=dup['quality'])
+        
+        group = next(self._group_ids) if close else None
+        for dup, distance in close:
+            files_to_move.append({
+                'original': best_file['path'],
+                'duplicate': dup['path'],
+                'size': self._reclaimable(dup),
+                'reason': f'same picture ({distance:.1f} grey levels apart)',
+                'group': group,
+                'digest': None
+            })
+            processed_paths.add(dup['path'])
+    
+    def _is_alias(self, best_file, dup):
+        """Whether dup is another name (hardlink) of the kept file; aliases are reported, not moved"""
+        inode = dup.get('inode')
+        if inode is None or inode != best_file.get('inode'):
+            return False
+        if dup['path'] not in self.hardlink_aliases:
+            self.hardlink_aliases[dup['path']] = best_file['path']
+            self.events.emit('hardlink_alias', path=dup['path'], original=best_file['path'], size=dup['size'])
+        return True
+    
+    def _reclaimable(self, dup):
+        """Bytes freed by removing dup: a file with several names is freed by its last name"""
+        links = dup.get('links') or 1
+        if links == 1:
+            return dup['size']
+        inode = dup['inode']
+        self._moved_links[inode] = moved = self._moved_links.get(inode, 0) + 1
+        return dup['size'] if moved == links else 0
+    
+    def _similar_moves(self, processed_paths):
+        """Pick the keeper of each near-duplicate group, return the moves"""
+        moves = []
+        for files in self.file_similar.values():
+            # Files already moved as exact/name duplicates are out of the running
+            files = [index for index in files if self.records.path(index) not in processed_paths]
+            if len(files) < 2:
+                continue
+            
+            # Sort: protected first, then by quality
+            files_sorted = sorted(files, key=lambda i: (self.records.is_protected(i), self.records.quality(i)),
+                                  reverse=True)
+            best, best_file = files_sorted[0], self.records[files_sorted[0]]
+            duplicates = [index for index in files_sorted[1:] if not self._is_alias(best_file, self.records[index])]
+            self.stats['duplicates_similar'] += len(duplicates)
+            group = next(self._group_ids) if duplicates else None
+            
+            for index in duplicates:
+                dup = self.records[index]
+                if best_file['protected'] and dup['quality'] > best_file['quality']:
+                    # Duplicate has better quality than protected - keep it
+                    self.events.emit('better_than_protected', method='similar',
+                                     protected=best_file['path'], protected_quality=best_file['quality'],
+                                     better=dup['path'], better_quality=dup['quality'])
+                    continue
                 
-                if len(unique_hashes) > 1:  # Different files with same name
-                    self.stats['duplicates_by_name'] += len(files) - 1
-                    
-                    # Sort: protected first, then by quality
-                    files_sorted = sorted(files, 
-                                        key=lambda x: (x['protected'], x['quality']), 
-                                        reverse=True)
-                    
-                    best_file = files_sorted[0]
-                    duplicates = files_sorted[1:]
-                    
-                    for dup in duplicates:
-                        # Check if already processed
-                        if dup['path'] in processed_paths:
-                            continue
-                            
-                        if best_file['protected'] and dup['quality'] > best_file['quality']:
-                            # Duplicate has better quality than protected - keep it
-                            print(f"\n⭐ Found better version (by name) than protected:")
-                            print(f"   Protected: {best_file['path']} (quality: {best_file['quality']})")
-                            print(f"   Better: {dup['path']} (quality: {dup['quality']})")
-                            continue
-                        
-                        # Move duplicate
-                        files_to_move.append({
-                            'original': best_file['path'],
-                            'duplicate': dup['path'],
-                            'size': dup['size'],
-                            'reason': f'same name: {filename}'
-                        })
-                        processed_paths.add(dup['path'])
-        
-        print(f"✅ Found {self.stats['duplicates_by_name']} additional duplicates by name")
+                if index in self.video_fingerprints:
+                    distance = video_distance(self.video_fingerprints[best], self.video_fingerprints[index])
+                    reason = f'similar video (mean frame distance {distance:.1f})'
+                else:
+                    distance = hamming(self.perceptual_hashes[best], self.perceptual_hashes[index])
+                    reason = f'similar image ({self.perceptual_algorithm} distance {distance})'
+                moves.append({
+                    'original': best_file['path'],
+                    'duplicate': dup['path'],
+                    'size': self._reclaimable(dup),
+                    'reason': reason,
+                    'group': group,
+                    'digest': None
+                })
+                processed_paths.add(dup['path'])
+        return moves
+    
+    def export_shard(self, path, shard):
+        """Write every readable scanned file to a shard index for merge_shards()"""
+        records = self.records
+        indices = sorted(index for files in self.file_names.values() for index in files)
+        
+        # Any file may have its twin on another shard, so every file needs
+        # the signature, digest and quality - not only the local candidates
+        self.events.emit('shard_start', shard=shard, count=len(indices))
+        signatures = {}
+        if self.partial_hash:
+            with self.events.stage('sample'):
+                signatures = self._partial_hashes(indices)
+        digests = {}
+        if self.compare == 'hash':  # Byte-compared groups have no digest to share
+            digests = {index: file_hash for file_hash, files in self.file_hashes.items() for index in files}
+        todo = [index for index in indices if index not in digests]
+        if todo:
+            self.events.emit('hash_start', count=len(todo))
+            with self.events.stage('hash'):
+                digests.update(self._full_hashes(todo))
+            self.events.emit('hash_done', hashed=self.stats['files_hashed'])
+        
+        items = [(records.path(index), records.stat(index)) for index in indices
+                 if digests.get(index) and records.quality(index) is None]
+        with self.events.stage('quality'):
+            qualities = self._qualities(items)
+        if self.cache:
+            self.cache.flush()
+        
+        rows = ((records.path(index), records.sizes[index], signatures.get(index), digests[index],
+                 qualities.get(records.path(index), records.quality(index)), records.is_protected(index))
+                for index in indices if digests.get(index))
+        meta = {'shard': shard, 'root': str(self.SCAN_ROOT), 'hash_algorithm': self.hash_algorithm,
+                'partial_size': self.PARTIAL_HASH_SIZE if self.partial_hash else None}
+        with self.events.stage('shard_write'):
+            count = write_shard(path, meta, rows)
+        self.events.emit('shard_written', shard=shard, path=path, files=count)
+        return count
+    
+    def merge_shards(self, paths, files_to_move=None):
+        """Find duplicates across shard indexes written by export_shard().
+        
+        Only the shard files are read, one group at a time. Moves are appended
+        to files_to_move (a list, or a PlanWriter to stream them to disk);
+        their paths are prefixed with the shard name ("nas1:/volume1/...").
+        """
+        files_to_move = [] if files_to_move is None else files_to_move
+        processed_paths = set()  # Avoid duplicating files
+        self.hardlink_aliases, self._moved_links = {}, {}
+        self._group_ids = count(1)  # Report group numbers, in planning order
+        readers = open_shards(paths)
+        try:
+            self.stats['total_scanned'] = sum(reader.meta['files'] for reader in readers)
+            self.events.emit('merge_start', shards=len(readers), files=self.stats['total_scanned'])
+            
+            self.events.emit('search_start', method='content (hash)')
+            with self.events.stage('group_hash'):
+                for file_hash, files in merge_groups(readers, 'digest'):
+                    if len(files) > 1:
+                        self._rank_hash_group(files, processed_paths, files_to_move, file_hash)
+            self.events.emit('hash_search_done', found=self.stats['duplicates_found'])
+            
+            self.events.emit('search_start', method='filename')
+            with self.events.stage('group_name'):
+                for filename, files in merge_groups(readers, 'name'):
+                    if len(files) > 1:
+                        self._rank_name_group(filename, files, processed_paths, files_to_move)
+            self.events.emit('name_search_done', found=self.stats['duplicates_by_name'])
+        finally:
+            for reader in readers:
+                reader.close()
         return files_to_move
     
     def move_duplicates(self, files_to_move):
         """Copy duplicates to review folder"""
         if not files_to_move:
-            print("\n🎉 No duplicates to move!")
+            self.events.emit('nothing_to_move')
             return []
         
         # Create review folder
-        os.makedirs(REVIEW_FOLDER, exist_ok=True)
+        os.makedirs(self.REVIEW_FOLDER, exist_ok=True)
         
-        print(f"\n📦 Copying {len(files_to_move)} duplicates to review folder...")
-        
-        report_lines = []
-        report_lines.append(f"REPORT - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        report_lines.append("="*80 + "\n\n")
+        self.events.emit('copy_start', count=len(files_to_move), method=self.backup_method)
         
         successfully_copied = []  # List of successfully copied files
+        report = self._open_report()  # Every backup is on record as soon as it is done
         
+        jobs = []
         for item in files_to_move:
+            duplicate_path = item['duplicate']
             try:
-                duplicate_path = item['duplicate']
                 # Preserve folder structure
-                relative_path = os.path.relpath(duplicate_path, SCAN_ROOT)
-                dest_path = os.path.join(REVIEW_FOLDER, relative_path)
-                
-                # Create destination folders
-                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-                
-                # Copy file
-                shutil.copy2(duplicate_path, dest_path)
+                relative_path = os.path.relpath(duplicate_path, self.SCAN_ROOT)
+            except ValueError as e:  # Other drive than SCAN_ROOT
+                self.events.emit('copy_error', path=duplicate_path, error=str(e))
+                continue
+            jobs.append((item, os.path.join(self.REVIEW_FOLDER, relative_path)))
+        
+        # Backups run in the worker pool (at most `workers` at a time), reported in order
+        methods = self.stats['backup_methods']
+        columns = ([item['duplicate'] for item, _ in jobs], [dest for _, dest in jobs],
+                   [self.backup_method] * len(jobs))
+        with self.events.stage('copy') as totals:
+            results = self._run_jobs(backup_file, columns, "📦 Backed up", 'copy')
+            for (item, dest_path), (method, error) in zip(jobs, results):
+                duplicate_path = item['duplicate']
+                if error:
+                    self.events.emit('copy_error', path=duplicate_path, error=str(error))
+                    continue
                 
                 self.stats['files_moved'] += 1
                 self.stats['space_saved'] += item['size']
+                methods[method] = methods.get(method, 0) + 1
                 
                 # Add to successful copies list
                 successfully_copied.append({
                     'original_path': duplicate_path,
                     'backup_path': dest_path,
-                    'size': item['size']
+                    'size': item['size'],
+                    'kept_path': item['original'],
+                    'reason': item['reason'],
+                    'method': method
                 })
+                report.write('backup', group=item.get('group'), keeper=item['original'],
+                             duplicate=duplicate_path, reason=item['reason'], size=item['size'],
+                             digest=item.get('digest'), backup_path=dest_path, method=method)
                 
-                # Add to report
-                report_lines.append(f"DUPLICATE #{self.stats['files_moved']}\n")
-                report_lines.append(f"  Reason: {item['reason']}\n")
-                report_lines.append(f"  Original (kept): {item['original']}\n")
-                report_lines.append(f"  Duplicate (copied): {duplicate_path}\n")
-                report_lines.append(f"  Backup location: {dest_path}\n")
-                report_lines.append(f"  Size: {item['size'] / 1024 / 1024:.2f} MB\n\n")
-                
-                print(f"   ✓ {self.stats['files_moved']}/{len(files_to_move)}", end='\r')
-                
-            except Exception as e:
-                print(f"\n⚠️ Copy error {duplicate_path}: {e}")
+                self.events.count('copy', files=1, nbytes=item['size'])
+                self.events.emit('copy_progress', done=self.stats['files_moved'], total=len(files_to_move))
+        self.stats['backup_mb_per_s'] = totals['bytes'] / 1024 / 1024 / totals['seconds'] if totals['seconds'] else 0
+        
+        report_path = self._close_report(report)
+        self.events.emit('copy_done', copied=self.stats['files_moved'], report=report_path,
+                         mb_per_s=self.stats['backup_mb_per_s'],
+                         methods=', '.join(f"{name} {count}" for name, count in sorted(methods.items())))
+        
+        return successfully_copied
+    
+    def stream_duplicates(self, queue_size=STREAM_QUEUE_SIZE):
+        """Walk, hash, probe and back up identical files concurrently (async_pipeline.py).
         
-        # Save report
-        report_path = os.path.join(REVIEW_FOLDER, "duplicate_report.txt")
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.writelines(report_lines)
+        Replaces scan_files/find_duplicates/move_duplicates for identical
+        content only (no same-name or similar groups); returns the backups
+        like move_duplicates. Raises ValueError for backup_method 'move'.
+        """
+        pipeline = StreamingPipeline(self, {'sample': partial_hash_file, 'hash': hash_file,
+                                            'probe': image_dimensions, 'copy': backup_file},
+                                     queue_size)
+        os.makedirs(self.REVIEW_FOLDER, exist_ok=True)
+        self.events.emit('stream_start', root=self.SCAN_ROOT, method=self.backup_method, queue=queue_size)
+        report = self._open_report()
+        with self.events.stage('stream') as totals:
+            backed_up = asyncio.run(self._consume(pipeline, report))
         
-        print(f"\n✅ Copied {self.stats['files_moved']} files to backup")
-        print(f"📄 Report saved: {report_path}")
+        # Keepers can change after a backup - point every backup at the final one
+        successfully_copied, moved_keepers = [], set()
+        for item in backed_up.values():
+            kept_path = self.records.path(pipeline.keepers[item['digest']])
+            if kept_path != item['original'] and item['group'] not in moved_keepers:
+                report.write('keeper', group=item['group'], keeper=kept_path)
+                moved_keepers.add(item['group'])
+            successfully_copied.append({
+                'original_path': item['duplicate'],
+                'backup_path': item['backup_path'],
+                'size': item['size'],
+                'kept_path': kept_path,
+                'reason': item['reason'],
+                'method': item['method']
+            })
         
+        copied_bytes = sum(item['size'] for item in successfully_copied)
+        methods = self.stats['backup_methods']
+        self.stats['backup_mb_per_s'] = copied_bytes / 1024 / 1024 / totals['seconds'] if totals['seconds'] else 0
+        report_path = self._close_report(report)
+        self.events.emit('copy_done', copied=self.stats['files_moved'], report=report_path,
+                         mb_per_s=self.stats['backup_mb_per_s'],
+                         methods=', '.join(f"{name} {count}" for name, count in sorted(methods.items())))
         return successfully_copied
     
-    def delete_originals(self, successfully_copied):
-        """Delete original duplicates after confirmation"""
-        if not successfully_copied:
-            return
+    async def _consume(self, pipeline, report):
+        """Collect and record the pipeline's backups as they come: {duplicate path: result}"""
+        backed_up, groups = {}, {}  # groups: digest -> report group number
+        async for result in pipeline.run():
+            if result['event'] == 'withdrawn':
+                backed_up.pop(result['duplicate'], None)
+                report.write('withdrawn', duplicate=result['duplicate'])
+            else:
+                result['group'] = groups.setdefault(result['digest'], len(groups) + 1)
+                backed_up[result['duplicate']] = result
+                report.write('backup', group=result['group'], keeper=result['original'],
+                             duplicate=result['duplicate'], reason=result['reason'], size=result['size'],
+                             digest=result['digest'], backup_path=result['backup_path'],
+                             method=result['method'])
+            self.events.emit('stream_progress', scanned=self.stats['total_scanned'],
+                             hashed=self.stats['files_hashed'], copied=len(backed_up))
+        return backed_up
+    
+    def _open_report(self):
+        """Start a backup run in the JSON-lines report (duplicate_report.py) of the review folder.
         
+        Appends: the pending deletions of earlier runs stay on record.
+        """
+        report = ReportWriter(os.path.join(self.REVIEW_FOLDER, REPORT_FILENAME))
+        report.write('run', time=datetime.now().isoformat(timespec='seconds'), root=self.SCAN_ROOT,
+                     review=self.REVIEW_FOLDER, method=self.backup_method)
+        return report
+    
+    def _close_report(self, report):
+        """Record the hardlinked aliases, close the report and render its text version; return that path"""
+        for alias, kept in self.hardlink_aliases.items():
+            report.write('alias', alias=alias, keeper=kept)
+        report.close()
+        return render_text(report.path)
+    
+    def _confirm_delete(self, count, backup_folder):
+        """Ask twice before deleting count originals; True to go ahead"""
         print(f"\n" + "="*80)
         print("⚠️  DELETING ORIGINAL DUPLICATES")
         print("="*80)
-        print(f"All {len(successfully_copied)} duplicates have been safely backed up to:")
-        print(f"📁 {REVIEW_FOLDER}")
+        print(f"All {count} duplicates have been safely backed up to:")
+        print(f"📁 {backup_folder}")
         print(f"\n💡 You can now delete the original duplicates from disk.")
         print(f"   Backup will remain in the review folder in case of issues.")
         print("="*80 + "\n")
@@ -285,36 +1544,144 @@ class DuplicateFinder:
         
         if response.lower() not in ['yes', 'y', 'tak', 't']:
             print("✋ Deletion cancelled. Duplicates remain on disk.")
-            print(f"💾 Backup is located at: {REVIEW_FOLDER}")
-            return
+            print(f"💾 Backup is located at: {backup_folder}")
+            return False
         
         # Additional confirmation
-        print(f"\n⚠️  This will delete {len(successfully_copied)} files from disk!")
+        print(f"\n⚠️  This will delete {count} files from disk!")
         confirm = input("❓ Are you sure? Type 'DELETE' to confirm: ")
         
         if confirm != 'DELETE':
             print("✋ Cancelled. No files deleted.")
+            return False
+        return True
+    
+    def delete_originals(self, successfully_copied):
+        """Delete original duplicates after confirmation"""
+        if not successfully_copied:
+            return
+        if not self._confirm_delete(len(successfully_copied), self.REVIEW_FOLDER):
             return
         
+        if self.verify_delete:
+            successfully_copied = self._confirm_deletions(successfully_copied)
+        
         # Delete files
-        print(f"\n🗑️  Deleting {len(successfully_copied)} duplicates...")
+        self.events.emit('delete_start', count=len(successfully_copied))
+        report_path = os.path.join(self.REVIEW_FOLDER, REPORT_FILENAME)
+        with ReportWriter(report_path, 'a') as report:
+            deleted_count, deleted_size = self._delete_items(successfully_copied, report,
+                                                             total=len(successfully_copied))
+        render_text(report_path)
+        
+        self.events.emit('delete_done', deleted=deleted_count, freed_gb=deleted_size / 1024 / 1024 / 1024,
+                         backup=self.REVIEW_FOLDER)
+    
+    def delete_from_report(self, report_path=None, batch_size=DELETE_BATCH):
+        """Delete the originals recorded in a JSON-lines report, batch by batch, without scanning.
+        
+        Originals already deleted, withdrawn backups and moved files are
+        skipped, and so is every original whose backup is gone. Each
+        deletion is appended to the report, so an interrupted run picks up
+        where it stopped.
+        """
+        report_path = report_path or os.path.join(self.REVIEW_FOLDER, REPORT_FILENAME)
+        if not os.path.exists(report_path):
+            self.events.emit('report_missing', path=report_path)
+            return
+        pending = sum(1 for _ in pending_deletions(report_path))
+        self.events.emit('report_loaded', path=report_path, pending=pending)
+        backup_folder = os.path.dirname(os.path.abspath(report_path))
+        if not pending or not self._confirm_delete(pending, backup_folder):
+            return
+        
+        self.events.emit('delete_start', count=pending)
+        deleted_count = deleted_size = 0
+        with ReportWriter(report_path, 'a') as report:
+            # Appended 'deleted' records are skipped by the reader still going through the file
+            for batch in batches(pending_deletions(report_path), batch_size):
+                items = self._backups_present([{
+                    'original_path': record['duplicate'],
+                    'backup_path': record['backup_path'],
+                    'size': record['size'],
+                    'kept_path': record['keeper'],
+                    'reason': record['reason']
+                } for record in batch])
+                if self.verify_delete:
+                    items = self._confirm_deletions(items)
+                count, size = self._delete_items(items, report, done=deleted_count, total=pending)
+                deleted_count += count
+                deleted_size += size
+        render_text(report_path)
+        
+        self.events.emit('delete_done', deleted=deleted_count, freed_gb=deleted_size / 1024 / 1024 / 1024,
+                         backup=backup_folder)
+    
+    def _backups_present(self, items):
+        """Keep only items whose backup still exists"""
+        present = []
+        for item in items:
+            if os.path.exists(item['backup_path']):
+                present.append(item)
+                continue
+            self.stats['delete_unconfirmed'] += 1
+            self.events.emit('delete_unconfirmed', path=item['original_path'],
+                             problem=f"backup {item['backup_path']} is missing")
+        return present
+    
+    def _delete_items(self, items, report, done=0, total=None):
+        """Delete the originals of backed-up items, recording each in the report; return (count, bytes)"""
         deleted_count = 0
         deleted_size = 0
         
+        with self.events.stage('delete'):
+            for item in items:
+                try:
+                    original_path = item['original_path']
+                    if os.path.exists(original_path):
+                        os.remove(original_path)
+                        deleted_count += 1
+                        deleted_size += item['size']
+                        report.write('deleted', duplicate=original_path, size=item['size'])
+                        self.events.count('delete', files=1, nbytes=item['size'])
+                        self.events.emit('delete_progress', done=done + deleted_count, total=total)
+                except Exception as e:
+                    self.events.emit('delete_error', path=original_path, error=str(e))
+        return deleted_count, deleted_size
+    
+    def _confirm_deletions(self, successfully_copied):
+        """Keep only deletions whose backup - and, for identical content, kept file - still match"""
+        paths = []
         for item in successfully_copied:
-            try:
-                original_path = item['original_path']
-                if os.path.exists(original_path):
-                    os.remove(original_path)
-                    deleted_count += 1
-                    deleted_size += item['size']
-                    print(f"   ✓ Deleted {deleted_count}/{len(successfully_copied)}", end='\r')
-            except Exception as e:
-                print(f"\n⚠️ Deletion error {original_path}: {e}")
-        
-        print(f"\n✅ Deleted {deleted_count} files")
-        print(f"💾 Freed: {deleted_size / 1024 / 1024 / 1024:.2f} GB")
-        print(f"🛡️ Backup remains at: {REVIEW_FOLDER}")
+            group = [item['original_path'], item['backup_path']]
+            if item.get('reason', '').startswith('identical content'):
+                group.append(item['kept_path'])
+            paths.append(group)
+        
+        self.events.emit('delete_verify_start', count=len(paths))
+        confirmed = []
+        with self.events.stage('delete_verify'):
+            results = self._run_jobs(compare_files, (paths,), "🔬 Verified", 'delete_verify')
+            for item, group, (identical, errors, bytes_read) in zip(successfully_copied, paths, results):
+                self.stats['bytes_compared'] += bytes_read
+                self.events.count('delete_verify', files=len(group), nbytes=bytes_read)
+                if identical == [list(range(len(group)))]:
+                    self.stats['delete_verified'] += 1
+                    confirmed.append(item)
+                    continue
+                self.stats['delete_unconfirmed'] += 1
+                problem = (f"cannot read {group[min(errors)]}: {errors[min(errors)]}" if errors
+                           else "contents differ")
+                self.events.emit('delete_unconfirmed', path=item['original_path'], problem=problem)
+        self.events.emit('delete_verify_done', verified=self.stats['delete_verified'],
+                         unconfirmed=self.stats['delete_unconfirmed'])
+        return confirmed
+    
+    def _total_duplicates(self):
+        """Duplicates found by every method"""
+        stats = self.stats
+        return (stats['duplicates_found'] + stats['duplicates_by_name'] + stats['duplicates_similar']
+                + stats['duplicates_same_pixels'])
     
     def print_summary(self):
         """Display summary"""
@@ -323,23 +1690,214 @@ class DuplicateFinder:
         print("="*80)
         print(f"Scanned files: {self.stats['total_scanned']}")
         print(f"Duplicates by content (hash): {self.stats['duplicates_found']}")
+        if self.pixel_match:
+            print(f"Same picture, other format: {self.stats['duplicates_same_pixels']} "
+                  f"({self.stats['thumbnails_decoded']} thumbnails decoded, {self.stats['thumbnails_reused']} reused)")
         print(f"Duplicates by name: {self.stats['duplicates_by_name']}")
-        print(f"Total duplicates: {self.stats['duplicates_found'] + self.stats['duplicates_by_name']}")
+        if self.similar:
+            print(f"Similar images/videos: {self.stats['duplicates_similar']} "
+                  f"({self.stats['perceptual_hashed']} images, {self.stats['videos_fingerprinted']} videos fingerprinted)")
+        print(f"Total duplicates: {self._total_duplicates()}")
+        if self.stats['hardlink_aliases'] or self.stats['hardlink_reads_avoided']:
+            print(f"Hardlinked aliases (not duplicates): {self.stats['hardlink_aliases']} "
+                  f"({self.stats['hardlink_reads_avoided']} reads avoided)")
         print(f"Moved files: {self.stats['files_moved']}")
+        if self.stats['backup_methods']:
+            print(f"Backup: {self.stats['backup_mb_per_s']:.1f} MB/s ("
+                  + ', '.join(f"{name}: {count}" for name, count in sorted(self.stats['backup_methods'].items())) + ")")
         print(f"Space saved: {self.stats['space_saved'] / 1024 / 1024 / 1024:.2f} GB")
-        print(f"Review folder: {REVIEW_FOLDER}")
+        print(f"Skipped by size: {self.stats['bytes_skipped'] / 1024 / 1024 / 1024:.2f} GB")
+        print(f"Sampled files: {self.stats['partial_hashed']} ({self.stats['partial_bytes_read'] / 1024 / 1024:.2f} MB read, "
+              f"{self.stats['partial_unique']} ruled out)")
+        if self.stats['files_compared'] or self.stats['delete_verified'] or self.stats['delete_unconfirmed']:
+            print(f"Compared byte by byte: {self.stats['files_compared']} files, "
+                  f"{self.stats['delete_verified']} deletions verified, "
+                  f"{self.stats['delete_unconfirmed']} refused ({self.stats['bytes_compared'] / 1024 / 1024 / 1024:.2f} GB read)")
+        print(f"Hashed files: {self.stats['files_hashed']} ({self.stats['bytes_hashed'] / 1024 / 1024 / 1024:.2f} GB read)")
+        if self.cache:
+            print(f"Cache hits: {self.stats['cache_hits']}")
+        if self.checkpointer and self.stats['checkpoints']:
+            print(f"Checkpoints: {self.stats['checkpoints']} ({self.checkpointer.seconds:.2f}s)")
+        if self.index:
+            print(f"Incremental: {self.stats['index_reused']} reused, {self.stats['index_changed']} new/modified, "
+                  f"{self.stats['index_deleted']} deleted")
+        if self.stats['io_devices'] or self.stats['throttle_wait']:
+            print(f"I/O scheduling: {self.stats['io_devices']} devices ({self.stats['io_rotational']} rotational), "
+                  f"{self.stats['io_physical_order']} files in physical order, "
+                  f"throttled {self.stats['throttle_wait']:.1f}s")
+        if self.stats['groups_spilled_bytes']:
+            print(f"Groups spilled to disk: {self.stats['groups_spilled_bytes'] / 1024 / 1024:.2f} MB")
+        print(f"Quality probes: {self.stats['quality_probed']} ({self.stats['quality_probes_avoided']} avoided)")
+        print(f"Record store: {self.stats['record_store_bytes'] / 1024 / 1024:.2f} MB "
+              f"({self.records.bytes_per_million() / 1024 / 1024:.0f} MB per million files)")
+        print(f"Review folder: {self.REVIEW_FOLDER}")
+        summary = self.events.summary()
+        if summary['stages']:
+            print("\n⏱️ Stage timings:")
+            for name, stage in summary['stages'].items():
+                rate = f", {stage['files_per_s']:.0f} files/s" if stage['files_per_s'] else ""
+                if stage['mb_per_s']:
+                    rate += f", {stage['mb_per_s']:.1f} MB/s"
+                print(f"   {name}: {stage['seconds']:.2f}s ({stage['files']} files{rate})")
+        if summary['slowest']:
+            print("\n🐢 Slowest files:")
+            for item in summary['slowest'][:5]:
+                print(f"   {item['seconds']:.3f}s [{item['stage']}] {item['path']}")
         print("="*80)
         print("\n💡 WHAT HAPPENED:")
         print(f"1. Scanned {self.stats['total_scanned']} files")
-        print(f"2. Found {self.stats['duplicates_found'] + self.stats['duplicates_by_name']} duplicates")
+        print(f"2. Found {self._total_duplicates()} duplicates")
         print(f"3. Copied {self.stats['files_moved']} duplicates to backup")
-        print(f"4. Backup is located at: {REVIEW_FOLDER}")
+        print(f"4. Backup is located at: {self.REVIEW_FOLDER}")
         print("\n💡 IF YOU DIDN'T DELETE ORIGINAL DUPLICATES:")
-        print(f"   - Check backup at: {REVIEW_FOLDER}")
+        print(f"   - Check backup at: {self.REVIEW_FOLDER}")
         print(f"   - Run script again to delete duplicates")
         print(f"   - Or delete them manually using the report as a guide")
 
-def main():
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Find and move duplicate photos/videos.")
+    parser.add_argument('--cache', default=os.path.join(REVIEW_FOLDER, CACHE_FILENAME),
+                        help="path of the persistent hash/quality cache")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="rehash every file instead of using the cache")
+    parser.add_argument('--compact-cache', action='store_true',
+                        help="evict cache entries for files that no longer exist and drop their "
+                             "thumbnails, then exit")
+    parser.add_argument('--incremental', action='store_true',
+                        help="reuse the previous scan's index and only reprocess what changed")
+    parser.add_argument('--index', default=os.path.join(REVIEW_FOLDER, INDEX_FILENAME),
+                        help="path of the scan index used by --incremental")
+    parser.add_argument('--verify-incremental', action='store_true',
+                        help="after an incremental scan, rescan everything and compare the groups")
+    parser.add_argument('--checkpoint', default=os.path.join(REVIEW_FOLDER, CHECKPOINT_FILENAME),
+                        help="where scan progress is checkpointed")
+    parser.add_argument('--checkpoint-interval', type=float, default=CHECKPOINT_INTERVAL, metavar='SECONDS',
+                        help="seconds between checkpoints (0 disables checkpoints)")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted scan from its last checkpoint")
+    parser.add_argument('--shard-out', metavar='PATH',
+                        help="scan this node's shard and write a shard index instead of moving files")
+    parser.add_argument('--shard-name', default=socket.gethostname(),
+                        help="name of this node's shard (default: host name)")
+    parser.add_argument('--merge', nargs='+', metavar='SHARD',
+                        help="find duplicates across shard indexes and write a move plan")
+    parser.add_argument('--plan', default=os.path.join(REVIEW_FOLDER, PLAN_FILENAME),
+                        help="where --merge writes the planned moves (JSON lines)")
+    parser.add_argument('--delete-from-report', nargs='?', metavar='PATH',
+                        const=os.path.join(REVIEW_FOLDER, REPORT_FILENAME),
+                        help="delete the originals recorded in an earlier run's JSON-lines report, "
+                             "without scanning (default: the report in the review folder)")
+    parser.add_argument('--delete-batch', type=int, default=DELETE_BATCH, metavar='N',
+                        help=f"originals deleted per batch by --delete-from-report (default: {DELETE_BATCH})")
+    parser.add_argument('--stream', action='store_true',
+                        help="walk, hash, probe and back up identical files concurrently "
+                             "(no same-name or similar groups; not with --backup move)")
+    parser.add_argument('--memory-limit', type=int, metavar='MB',
+                        help="memory for the duplicate group tables, which spill to disk past it; "
+                             "not a limit for the whole run - the file records, size counts and "
+                             "digests being computed stay in memory (about 120 bytes per file "
+                             "for the records alone)")
+    parser.add_argument('--spill-dir', metavar='PATH',
+                        help="where groups spill to (default: system temp folder)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of parallel hashing/probing workers")
+    parser.add_argument('--io-schedule', action='store_true',
+                        help="read each device with its own workers; spinning disks one file at a time "
+                             "in physical order (sampling and hashing then run in threads, "
+                             "whatever --executor says; so do --max-read-mb/--max-iops)")
+    parser.add_argument('--hdd-workers', type=int, default=1,
+                        help="concurrent reads per spinning disk with --io-schedule")
+    parser.add_argument('--max-read-mb', type=float, metavar='MB_PER_S',
+                        help="cap sampling/hashing reads at this many MB/s")
+    parser.add_argument('--max-iops', type=float, metavar='OPS_PER_S',
+                        help="cap sampling/hashing reads at this many read operations (1 MB) per second")
+    parser.add_argument('--executor', choices=sorted(EXECUTORS), default='thread',
+                        help="worker pool type (sampling and hashing always use threads with "
+                             "--io-schedule, --max-read-mb or --max-iops)")
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help="skip files/folders matching this pattern (repeatable)")
+    parser.add_argument('--hash', dest='hash_algorithm', choices=available_engines(), default='md5',
+                        help="digest engine for full-file hashes")
+    parser.add_argument('--mmap', dest='hash_mmap', action='store_true',
+                        help="hash files of 64 MB and more through mmap (local disks only: a file "
+                             "truncated while mapped crashes the scan)")
+    parser.add_argument('--compare', choices=COMPARE_MODES, default='hash',
+                        help="confirm same-size candidates by full digest or byte by byte")
+    parser.add_argument('--verify-delete', action='store_true',
+                        help="compare each duplicate with its backup (and kept copy) before deleting it")
+    parser.add_argument('--backup', choices=BACKUP_METHODS, default='auto',
+                        help="how duplicates reach the review folder (auto: fastest safe method per file)")
+    parser.add_argument('--pixel-match', action='store_true',
+                        help="also find the same picture in another format or encoding (HEIC and its JPEG "
+                             "export, PNG and JPEG copies) by comparing decoded thumbnails")
+    parser.add_argument('--pixel-tolerance', type=float, default=PIXEL_TOLERANCE, metavar='LEVELS',
+                        help=f"max mean grey-level difference for --pixel-match (default: {PIXEL_TOLERANCE})")
+    parser.add_argument('--similar', action='store_true',
+                        help="also find resized/recompressed images and re-encoded videos")
+    parser.add_argument('--max-distance', type=int, default=SIMILAR_DISTANCE,
+                        help="max differing bits (of 64) for --similar")
+    parser.add_argument('--perceptual', choices=sorted(PERCEPTUAL_ALGORITHMS), default='dhash',
+                        help="perceptual hash used by --similar")
+    parser.add_argument('--video-decoder', choices=sorted(DECODERS),
+                        help="frame decoder for --similar videos (default: first available)")
+    parser.add_argument('--events', metavar='PATH',
+                        help="also write progress/timing events to this file as JSON lines")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="run under cProfile and save the stats to this file")
+    args = parser.parse_args(argv)
+    if args.stream and args.backup == 'move':
+        parser.error("--stream cannot be combined with --backup move: originals would be moved "
+                     "before their group is final")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    
+    if args.compact_cache:
+        cache = ScanCache(args.cache)
+        thumbnails_path = os.path.join(os.path.dirname(args.cache), THUMBNAIL_FILENAME)
+        thumbnails = ThumbnailStore(thumbnails_path) if os.path.exists(thumbnails_path) else None
+        slots = len(thumbnails) if thumbnails is not None else 0
+        removed = cache.compact(thumbnails)
+        cache.close()
+        print(f"🧹 Removed {removed} stale entries from {args.cache}")
+        if thumbnails is not None:
+            print(f"🧹 Dropped {slots - len(thumbnails)} unused thumbnails from {thumbnails_path}")
+            thumbnails.close()
+        return
+    
+    if args.merge:
+        # Shards live on other hosts - plan the moves, each node applies its own
+        events = Instrumentation([ConsoleSink()], profile_path=args.profile)
+        if args.events:
+            events.add_sink(JsonLinesSink(args.events))
+        finder = DuplicateFinder(events=events)
+        plan = PlanWriter(args.plan)
+        try:
+            finder.merge_shards(args.merge, plan)
+        except ValueError as e:
+            print(f"❌ Cannot merge shards: {e}")
+            return
+        finally:
+            plan.close()
+            events.close()
+        print(f"\n📄 {plan.count} planned moves ({plan.total_size / 1024 / 1024 / 1024:.2f} GB) "
+              f"written to {args.plan}")
+        return
+    
+    if args.delete_from_report:
+        # Backups were made by an earlier run - its report says what to delete
+        events = Instrumentation([ConsoleSink()], profile_path=args.profile)
+        if args.events:
+            events.add_sink(JsonLinesSink(args.events))
+        finder = DuplicateFinder(workers=args.workers, executor=args.executor, events=events,
+                                 verify_delete=args.verify_delete)
+        finder.delete_from_report(args.delete_from_report, args.delete_batch)
+        finder.print_summary()
+        events.close()
+        return
+    
     print("="*80)
     print("🖼️  DUPLICATE PHOTO & VIDEO FINDER (By content + by name)")
     print("="*80)
@@ -349,17 +1907,73 @@ def main():
     print("\nSearch methods:")
     print("  ✓ Identical files (same content)")
     print("  ✓ Same names (different sizes/quality)")
+    if args.pixel_match:
+        print("  ✓ Same picture in another format (decoded thumbnails)")
+    if args.similar:
+        print("  ✓ Similar images and videos (resized/recompressed/re-encoded, perceptual hash)")
     print("="*80 + "\n")
     
     input("⏸️  Press ENTER to start scanning... ")
     
-    finder = DuplicateFinder()
+    events = Instrumentation([ConsoleSink()], profile_path=args.profile)
+    if args.events:
+        events.add_sink(JsonLinesSink(args.events))
+    
+    finder = DuplicateFinder(cache_path=None if args.no_cache else args.cache,
+                             workers=args.workers, executor=args.executor,
+                             hash_algorithm=args.hash_algorithm, exclude=args.exclude,
+                             events=events, similar=args.similar, similar_distance=args.max_distance,
+                             perceptual_algorithm=args.perceptual, video_decoder=args.video_decoder,
+                             index_path=args.index if args.incremental or args.verify_incremental else None,
+                             checkpoint_path=args.checkpoint if args.checkpoint_interval or args.resume else None,
+                             checkpoint_interval=args.checkpoint_interval, resume=args.resume,
+                             memory_limit=args.memory_limit * 1024 * 1024 if args.memory_limit else None,
+                             spill_dir=args.spill_dir, compare=args.compare,
+                             verify_delete=args.verify_delete, backup_method=args.backup,
+                             io_schedule=args.io_schedule, rotational_workers=args.hdd_workers,
+                             read_limit=args.max_read_mb * 1024 * 1024 if args.max_read_mb else None,
+                             iops_limit=args.max_iops, pixel_match=args.pixel_match,
+                             pixel_tolerance=args.pixel_tolerance, hash_mmap=args.hash_mmap)
+    
+    if args.stream:
+        # Steps 1-3 overlap: backups start while the walk is still running
+        successfully_copied = finder.stream_duplicates()
+        if finder.cache:
+            finder.cache.close()
+        if successfully_copied:
+            finder.delete_originals(successfully_copied)
+        finder.print_summary()
+        events.close()
+        return
     
     # Step 1: Scan files
-    finder.scan_files()
+    try:
+        finder.scan_files()
+    except KeyboardInterrupt:
+        if finder.checkpointer and finder.stats['checkpoints']:
+            print(f"\n✋ Scan interrupted - run again with --resume to continue from {args.checkpoint}")
+        raise
+    if finder.index:
+        finder.index.close()
+    if args.verify_incremental and finder.verify_against_full_scan():
+        print("❌ Incremental scan differs from a full scan - not moving anything.")
+        events.close()
+        return
+    
+    if args.shard_out:
+        finder.export_shard(args.shard_out, args.shard_name)
+        if finder.cache:
+            finder.cache.close()
+        finder.print_summary()
+        events.close()
+        return
     
     # Step 2: Find duplicates
     files_to_move = finder.find_duplicates()
+    if finder.cache:
+        finder.cache.close()
+    if finder.thumbnails is not None:
+        finder.thumbnails.close()
     
     if files_to_move:
         print(f"\n⚠️  Found {len(files_to_move)} duplicates to move.")
@@ -369,14 +1983,15 @@ def main():
             # Step 3: Copy duplicates
             successfully_copied = finder.move_duplicates(files_to_move)
             
-            # Step 4: Ask to delete originals
-            if successfully_copied:
+            # Step 4: Ask to delete originals (already gone with --backup move)
+            if successfully_copied and args.backup != 'move':
                 finder.delete_originals(successfully_copied)
         else:
             print("❌ Copying cancelled.")
     
     # Summary
     finder.print_summary()
+    events.close()
 
 if __name__ == "__main__":
     main()
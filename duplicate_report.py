@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Machine-readable duplicate report for Duplicate Photo Finder.
+
+Backups are appended to a JSON-lines file as they happen, one record
+per line, flushed before the next backup starts - a crash or Ctrl+C
+leaves every finished backup on record. The human-readable report is
+rendered from that file, and a later run can delete the originals
+straight from it (--delete-from-report) without scanning again.
+
+Records ('type' key):
+
+    run        time, root, review, method - start of a backup run
+    backup     group, keeper, duplicate, reason, size, digest,
+               backup_path, method
+    keeper     group, keeper - the group's keeper changed (--stream)
+    withdrawn  duplicate - an earlier backup was undone (--stream)
+    alias      alias, keeper - another name (hardlink) of a kept file
+    deleted    duplicate, size - the original was deleted
+
+Later records win: a backup is cancelled by a withdrawn or deleted
+record after it, a later backup of the same original replaces it, and a
+group's keeper is the last one recorded. Every backup run appends to the
+report, so the pending deletions of an earlier run stay on record; group
+numbers count from 1 again after each run record.
+"""
+
+import json
+import os
+from datetime import datetime
+
+REPORT_FILENAME = "duplicate_report.jsonl"
+TEXT_REPORT_FILENAME = "duplicate_report.txt"
+DELETE_BATCH = 1000  # Originals deleted (and recorded) per batch by --delete-from-report
+
+
+class ReportWriter:
+    """Append-only JSON-lines report; a record is on disk once write() returns"""
+
+    def __init__(self, path, mode='a'):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.count = 0
+        self._file = open(path, mode, encoding='utf-8')
+
+    def write(self, record_type, **fields):
+        self._file.write(json.dumps(dict(fields, type=record_type), ensure_ascii=False) + '\n')
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_records(path):
+    """Yield (line number, record) from a report; a line cut off by a crash is skipped"""
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f):
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _outcomes(path):
+    """One pass for what later records say: (keepers, withdrawn, deleted, repeated).
+
+    keepers maps (run, group) -> last recorded keeper; withdrawn and
+    deleted are the originals whose last record is such a record, and
+    repeated counts the earlier backups of originals backed up again.
+    """
+    keepers, withdrawn, deleted, backed_up, repeated = {}, set(), set(), set(), {}
+    run = 0
+    for _, record in read_records(path):
+        kind = record['type']
+        if kind == 'run':
+            run += 1
+        elif kind == 'keeper':
+            keepers[run, record['group']] = record['keeper']
+        elif kind == 'backup':
+            duplicate = record['duplicate']
+            if duplicate in backed_up:
+                repeated[duplicate] = repeated.get(duplicate, 0) + 1
+            backed_up.add(duplicate)
+            withdrawn.discard(duplicate)
+            deleted.discard(duplicate)
+        elif kind == 'withdrawn':
+            withdrawn.add(record['duplicate'])
+        elif kind == 'deleted':
+            deleted.add(record['duplicate'])
+    return keepers, withdrawn, deleted, repeated
+
+
+def backups(path):
+    """Yield the standing backups of a report with their final keeper.
+
+    Each is the backup record plus 'run' (its backup run, from 1) and
+    'deleted' (True once its original was deleted after the backup).
+    """
+    keepers, withdrawn, deleted, repeated = _outcomes(path)
+    run = 0
+    for _, record in read_records(path):
+        if record['type'] == 'run':
+            run += 1
+        if record['type'] != 'backup':
+            continue
+        duplicate = record['duplicate']
+        if repeated.get(duplicate):
+            repeated[duplicate] -= 1  # Replaced by a later backup
+            continue
+        if duplicate in withdrawn:
+            continue
+        record['keeper'] = keepers.get((run, record['group']), record['keeper'])
+        record['run'] = run
+        record['deleted'] = duplicate in deleted
+        yield record
+
+
+def pending_deletions(path):
+    """Yield the backups whose original is still to be deleted (moved files have none)"""
+    for record in backups(path):
+        if not record['deleted'] and record['method'] != 'move':
+            yield record
+
+
+def batches(records, size=DELETE_BATCH):
+    """Split an iterable of records into lists of at most size"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def render_text(path, text_path=None):
+    """Write the human-readable report for a JSON-lines report; return its path"""
+    if text_path is None:
+        text_path = os.path.join(os.path.dirname(path), TEXT_REPORT_FILENAME)
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write(f"REPORT - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write("="*80 + "\n\n")
+        for number, item in enumerate(backups(path), 1):
+            method = item['method']
+            group = item['group'] if item['run'] <= 1 else f"{item['group']} of run {item['run']}"
+            f.write(f"DUPLICATE #{number} (group {group})\n")
+            f.write(f"  Reason: {item['reason']}\n")
+            f.write(f"  Original (kept): {item['keeper']}\n")
+            action = 'moved' if method == 'move' else 'deleted' if item['deleted'] else 'copied'
+            f.write(f"  Duplicate ({action}): {item['duplicate']}\n")
+            f.write(f"  Backup location: {item['backup_path']} ({method})\n")
+            if item.get('digest'):
+                f.write(f"  Digest: {item['digest']}\n")
+            f.write(f"  Size: {item['size'] / 1024 / 1024:.2f} MB\n\n")
+
+        header = False
+        for _, record in read_records(path):
+            if record['type'] != 'alias':
+                continue
+            if not header:
+                f.write("="*80 + "\n")
+                f.write("HARDLINKED ALIASES (other names of kept files - left in place, nothing to free)\n\n")
+                header = True
+            f.write(f"  {record['alias']}\n    = {record['keeper']}\n")
+    return text_path
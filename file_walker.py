@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Directory traversal engine for Duplicate Photo Finder.
+
+Built on os.scandir: the stat result of each DirEntry is reused instead of
+calling os.path.getsize again. Directories can be listed by a thread pool;
+entries are still yielded in a deterministic depth-first order (directory
+entries sorted by name), so results never depend on scheduling.
+"""
+
+import os
+import fnmatch
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+WalkEntry = namedtuple('WalkEntry', ['path', 'name', 'stat'])
+RACY_WINDOW_NS = 2 * 10 ** 9  # Coarsest directory mtime resolution around (FAT: 2 s)
+
+
+def normalize_path(path):
+    """Return absolute, case-normalized path for comparisons"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def is_excluded(path, name, exclude):
+    """Check a path against exclude globs (matched on name and full path)"""
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern)
+               for pattern in exclude)
+
+
+def list_directory(path, extensions=None, exclude=(), prune=()):
+    """List one directory.
+
+    Returns (entries, subdirectories, errors) where errors is a list of
+    (path, exception) for the directory itself or entries that could not
+    be stat-ed.
+    """
+    files, dirs, errors = [], [], []
+    try:
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError as e:
+        return files, dirs, [(path, e)]
+
+    for entry in entries:
+        if exclude and is_excluded(entry.path, entry.name, exclude):
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if normalize_path(entry.path) not in prune:
+                    dirs.append(entry.path)
+                continue
+            if extensions is not None and os.path.splitext(entry.name)[1].lower() not in extensions:
+                continue
+            if entry.is_file():
+                files.append(WalkEntry(entry.path, entry.name, entry.stat()))
+        except OSError as e:
+            errors.append((entry.path, e))
+    return files, dirs, errors
+
+
+def list_known_directory(path, extensions=None, exclude=(), prune=(), known=None):
+    """List one directory, reusing a previous listing if the directory is unchanged.
+
+    known is (mtime_ns, file names, subdirectories) from an earlier call.
+    Returns (entries, subdirectories, errors, listing); listing is the
+    (mtime_ns, file names, subdirectories) to remember, or None.
+
+    Like git's racy timestamps: a directory whose mtime is within
+    RACY_WINDOW_NS of the listing could change again without its mtime
+    moving (FAT/exFAT keep 2 s), so its listing is remembered with mtime
+    None and never reused - the next walk lists it again.
+    """
+    try:
+        # Read before listing: a change made during the listing is seen next time
+        listed_ns = time.time_ns()
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError as e:
+        return [], [], [(path, e)], None
+
+    if known is not None and known[0] == mtime_ns:
+        # Same mtime - no entry was added, removed or renamed; files may still be modified
+        try:
+            files = [WalkEntry(os.path.join(path, name), name, os.stat(os.path.join(path, name)))
+                     for name in known[1]]
+            return files, [os.path.join(path, name) for name in known[2]], [], known
+        except OSError:
+            pass  # Changed under us after all - list it again
+
+    files, dirs, errors = list_directory(path, extensions, exclude, prune)
+    if mtime_ns > listed_ns - RACY_WINDOW_NS:
+        mtime_ns = None  # Racy - not to be trusted next time
+    listing = (mtime_ns, [entry.name for entry in files], [os.path.basename(d) for d in dirs])
+    return files, dirs, errors, listing
+
+
+def walk_files(roots, extensions=None, exclude=(), prune=(), workers=1, onerror=None,
+               known_listings=None, listings=None, frontier=None, ondirectory=None, max_pending=None):
+    """Yield WalkEntry(path, name, stat) for every matching file under roots.
+
+    extensions -- set of lowercase suffixes to keep (None keeps everything)
+    exclude    -- glob patterns; matching files and directories are skipped
+    prune      -- directories that are never entered (e.g. the review folder)
+    workers    -- number of threads listing directories ahead of the consumer
+    onerror    -- called with (path, exception) for unreadable entries
+    known_listings -- {directory: listing} from a previous walk; unchanged
+                      directories are not listed again (incremental rescans)
+    listings   -- dict filled with {directory: listing} for the next walk
+    frontier   -- directories still to walk (next one last), to resume an
+                  interrupted walk instead of starting from roots
+    ondirectory -- called with the current frontier after all files of a
+                  directory were consumed (a safe point to checkpoint)
+    max_pending -- directories listed ahead of the consumer at most
+                   (workers > 1); None lists every discovered directory
+    """
+    if isinstance(roots, (str, os.PathLike)):
+        roots = [roots]
+    prune = {normalize_path(path) for path in prune}
+    exclude = tuple(exclude)
+
+    known_listings = known_listings or {}
+
+    def report(errors):
+        if onerror:
+            for path, error in errors:
+                onerror(path, error)
+
+    def lister(path):
+        if listings is None:
+            return list_directory(path, extensions, exclude, prune)
+        files, dirs, errors, listing = list_known_directory(
+            path, extensions, exclude, prune, known_listings.get(path))
+        if listing is not None:
+            listings[path] = listing
+        return files, dirs, errors
+
+    if frontier:
+        paths = list(frontier)
+    else:
+        paths = [root for root in reversed(roots) if normalize_path(root) not in prune]
+
+    if workers <= 1:
+        while paths:
+            files, dirs, errors = lister(paths.pop())
+            report(errors)
+            yield from files
+            paths.extend(reversed(dirs))
+            if ondirectory:
+                ondirectory(paths)
+        return
+
+    # Parallel: discovered directories are listed by the pool ahead of the
+    # consumer (at most max_pending at a time, next ones first), while
+    # results are consumed in the same depth-first order as above.
+    # paths mirrors the stack of futures, for ondirectory.
+    pool = ThreadPoolExecutor(max_workers=workers)
+    stack = [None] * len(paths)  # Future listing each path, None until submitted
+    outstanding = 0
+
+    def list_ahead(count):
+        nonlocal outstanding
+        for position in range(len(stack) - 1, max(len(stack) - 1 - count, -1), -1):
+            if max_pending and outstanding >= max_pending:
+                break
+            if stack[position] is None:
+                stack[position] = pool.submit(lister, paths[position])
+                outstanding += 1
+
+    list_ahead(max_pending or len(stack))
+    try:
+        while stack:
+            path, future = paths.pop(), stack.pop()
+            if future is None:
+                files, dirs, errors = lister(path)
+            else:
+                outstanding -= 1
+                files, dirs, errors = future.result()
+            report(errors)
+            yield from files
+            paths.extend(reversed(dirs))
+            stack.extend([None] * len(dirs))
+            list_ahead(max_pending or len(dirs))
+            if ondirectory:
+                ondirectory(paths)
+    finally:
+        for future in stack:
+            if future:
+                future.cancel()
+        pool.shutdown(wait=False)
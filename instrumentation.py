@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentation for Duplicate Photo Finder.
+
+DuplicateFinder reports everything it does as events: dicts with an
+'event' name plus fields. Sinks consume them - ConsoleSink renders the
+familiar emoji output, JsonLinesSink writes one JSON object per line.
+Instrumentation also keeps per-stage timers, file/byte counters, the
+slowest files per stage, and can run cProfile for the whole session.
+"""
+
+import cProfile
+import heapq
+import json
+import time
+from contextlib import contextmanager
+
+
+def timed_call(func, *args, **kwargs):
+    """Return (seconds, func(*args, **kwargs)) - used to time jobs inside worker pools"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _better_version(fields):
+    by_name = {'name': " (by name)", 'similar': " (similar image/video)",
+               'pixels': " (same picture)"}.get(fields['method'], "")
+    return (f"\n⭐ Found better version{by_name} than protected:\n"
+            f"   Protected: {fields['protected']} (quality: {fields['protected_quality']})\n"
+            f"   Better: {fields['better']} (quality: {fields['better_quality']})")
+
+
+class ConsoleSink:
+    """Render events as the interactive console output"""
+
+    # event -> (template or callable, line ending)
+    TEMPLATES = {
+        'scan_start': ("🔍 Scanning {root}...\n🛡️ Protected folder: {protected}\n"
+                       "📁 Looking for: {extensions}\n🔑 Digest engine: {algorithm}\n", '\n'),
+        'cache_loaded': ("💾 Loaded {entries} cached entries from {path}", '\n'),
+        'scan_progress': ("   📸 Scanned: {scanned} photos/videos... (Current: {current})", '\r'),
+        'walk_error': ("\n⚠️ Cannot stat: {path} - {error}", '\n'),
+        'scan_done': ("\n✅ Scanned: {scanned} files", '\n'),
+        'progress': ("   {label}: {done}/{total} files...", '\r'),
+        'read_error': ("\n⚠️ Read error: {path} - {error}", '\n'),
+        'quality_error': ("⚠️ Cannot determine quality: {path} - {error}", '\n'),
+        'sample_start': ("🔑 Sampling {count} files with a shared size...", '\n'),
+        'sample_done': ("\n✅ Sampled: {sampled} files ({ruled_out} ruled out by head/tail signature)", '\n'),
+        'hash_start': ("🔑 Hashing {count} candidate files...", '\n'),
+        'hash_done': ("\n✅ Hashed: {hashed} files", '\n'),
+        'compare_start': ("🔬 Comparing {count} candidate files byte by byte ({groups} groups)...", '\n'),
+        'compare_done': ("\n✅ Compared: {compared} files ({mb:.2f} MB read)", '\n'),
+        'record_store': ("🧮 Record store: {mb:.2f} MB ({mb_per_million:.0f} MB per million files)", '\n'),
+        'groups_spilled': ("💽 Duplicate groups over the memory limit: {mb:.2f} MB spilled to disk "
+                           "in {spills} runs", '\n'),
+        'index_loaded': (lambda r: (f"📇 Loaded scan index: {r['files']} files from {r['path']}" if r['valid']
+                                    else f"📇 No usable scan index at {r['path']} - full scan"), '\n'),
+        'index_saved': ("📇 Incremental: {reused} files reused, {changed} new/modified, {deleted} deleted", '\n'),
+        'verify_start': ("\n🔬 Verifying against a full scan...", '\n'),
+        'verify_difference': ("⚠️ {kind} group {problem} in incremental scan: {paths}", '\n'),
+        'verify_done': ("✅ Verification: {differences} differences", '\n'),
+        'checkpoint_saved': ("\n💾 Checkpoint: {files} files ({mb:.2f} MB, {seconds:.2f}s)", '\n'),
+        'checkpoint_resumed': ("♻️ Resuming: {files} files already scanned, {pending} folders left, "
+                               "{hashed} files already hashed", '\n'),
+        'checkpoint_missing': ("⚠️ No usable checkpoint at {path} - starting a new scan", '\n'),
+        'shard_start': ("🧩 Completing shard '{shard}': digests and quality for {count} files...", '\n'),
+        'shard_written': ("🧩 Shard '{shard}': {files} files written to {path}", '\n'),
+        'merge_start': ("🧩 Merging {shards} shards ({files} files)...", '\n'),
+        'cache_stats': ("💾 Cache: {hits} hits, {misses} misses", '\n'),
+        'quality_start': ("🖼️ Evaluating quality of {count} grouped files...", '\n'),
+        'search_start': ("\n🔎 Looking for duplicates by {method}...", '\n'),
+        'better_than_protected': (_better_version, '\n'),
+        'hash_search_done': ("✅ Found {found} duplicates by content", '\n'),
+        'name_search_done': ("✅ Found {found} additional duplicates by name", '\n'),
+        'hardlinks_found': ("🔗 {count} other names of kept files (hardlinks) left in place - "
+                            "not duplicates", '\n'),
+        'similar_start': ("🧬 Fingerprinting {count} images ({algorithm})...", '\n'),
+        'phash_error': ("\n⚠️ Cannot fingerprint: {path} - {error}", '\n'),
+        'video_start': ("🎞️ Sampling frames of {count} videos ({decoder})...", '\n'),
+        'video_decoder_missing': ("⚠️ No video decoder (PyAV, OpenCV or ffmpeg) - {count} videos not compared", '\n'),
+        'similar_done': ("\n✅ Fingerprinted: {hashed} files, {groups} similar groups", '\n'),
+        'similar_search_done': ("✅ Found {found} similar images", '\n'),
+        'thumbnail_start': ("🖼️ Decoding {count} thumbnails ({reused} already stored)...", '\n'),
+        'thumbnail_error': ("\n⚠️ Cannot decode: {path} - {error}", '\n'),
+        'pixel_done': ("\n✅ Compared {thumbnails} thumbnails: {groups} groups showing the same picture", '\n'),
+        'pixel_search_done': ("✅ Found {found} copies of the same picture in other formats", '\n'),
+        'nothing_to_move': ("\n🎉 No duplicates to move!", '\n'),
+        'stream_start': ("🌊 Streaming {root}: walking, hashing and backing up ({method}) together, "
+                         "{queue} jobs per stage...", '\n'),
+        'stream_progress': ("   🌊 Scanned {scanned}, hashed {hashed}, backed up {copied}", '\r'),
+        'copy_start': ("\n📦 Copying {count} duplicates to review folder ({method})...", '\n'),
+        'copy_progress': ("   ✓ {done}/{total}", '\r'),
+        'copy_error': ("\n⚠️ Copy error {path}: {error}", '\n'),
+        'copy_done': ("\n✅ Copied {copied} files to backup ({mb_per_s:.1f} MB/s; {methods})\n"
+                      "📄 Report saved: {report}", '\n'),
+        'report_missing': ("❌ No duplicate report at {path}", '\n'),
+        'report_loaded': ("📄 {pending} originals still to delete in {path}", '\n'),
+        'delete_start': ("\n🗑️  Deleting {count} duplicates...", '\n'),
+        'delete_verify_start': ("🔬 Verifying {count} duplicates against their backups before deleting...", '\n'),
+        'delete_unconfirmed': ("\n⚠️ Not deleting {path}: {problem}", '\n'),
+        'delete_verify_done': ("\n✅ Verified: {verified} ready to delete, {unconfirmed} kept", '\n'),
+        'delete_progress': ("   ✓ Deleted {done}/{total}", '\r'),
+        'delete_error': ("\n⚠️ Deletion error {path}: {error}", '\n'),
+        'delete_done': ("\n✅ Deleted {deleted} files\n💾 Freed: {freed_gb:.2f} GB\n"
+                        "🛡️ Backup remains at: {backup}", '\n'),
+        'profile_saved': ("📈 Profile saved: {path}", '\n'),
+    }
+
+    def __call__(self, record):
+        template = self.TEMPLATES.get(record['event'])
+        if template is None:
+            return  # Not meant for the console (stage timers, file timings...)
+        text, end = template
+        print(text(record) if callable(text) else text.format(**record), end=end)
+
+
+class JsonLinesSink:
+    """Append every event as one JSON object per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, record):
+        self._file.write(json.dumps(record, default=str, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class Instrumentation:
+    """Event dispatcher with per-stage timers, counters and slowest files"""
+
+    def __init__(self, sinks=None, slowest=10, profile_path=None):
+        self.sinks = list(sinks or [])
+        self.stages = {}  # name -> {'seconds', 'files', 'bytes', 'runs'}
+        self.slowest = slowest
+        self._slowest = {}  # stage -> min-heap of (seconds, path)
+        self.profile_path = profile_path
+        self._profiler = None
+        if profile_path:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def emit(self, event, **fields):
+        """Send an event to every sink"""
+        record = {'event': event, 'time': time.time()}
+        record.update(fields)
+        for sink in self.sinks:
+            sink(record)
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {'seconds': 0.0, 'files': 0, 'bytes': 0, 'runs': 0})
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage; counters added while it runs are reported on exit"""
+        totals = self._stage(name)
+        files, nbytes = totals['files'], totals['bytes']
+        self.emit('stage_start', stage=name)
+        start = time.perf_counter()
+        try:
+            yield totals
+        finally:
+            seconds = time.perf_counter() - start
+            totals['seconds'] += seconds
+            totals['runs'] += 1
+            files, nbytes = totals['files'] - files, totals['bytes'] - nbytes
+            self.emit('stage_end', stage=name, seconds=seconds, files=files, bytes=nbytes,
+                      **self._rates(seconds, files, nbytes))
+
+    def count(self, stage, files=0, nbytes=0):
+        """Add processed files/bytes to a stage"""
+        totals = self._stage(stage)
+        totals['files'] += files
+        totals['bytes'] += nbytes
+
+    def record_file(self, stage, path, seconds, nbytes=None):
+        """Record how long one file took, keeping the slowest per stage"""
+        heap = self._slowest.setdefault(stage, [])
+        item = (seconds, path)
+        if len(heap) < self.slowest:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+        self.emit('file_timing', stage=stage, path=path, seconds=seconds, bytes=nbytes)
+
+    def slowest_files(self, stage=None):
+        """Slowest files, slowest first (for one stage or all stages)"""
+        stages = [stage] if stage else list(self._slowest)
+        files = [{'stage': name, 'path': path, 'seconds': seconds}
+                 for name in stages for seconds, path in self._slowest.get(name, [])]
+        files.sort(key=lambda item: item['seconds'], reverse=True)
+        return files if stage else files[:self.slowest]
+
+    @staticmethod
+    def _rates(seconds, files, nbytes):
+        if not seconds:
+            return {'files_per_s': None, 'mb_per_s': None}
+        return {'files_per_s': files / seconds, 'mb_per_s': nbytes / 1024 / 1024 / seconds}
+
+    def summary(self):
+        """Per-stage totals with throughput, plus the slowest files"""
+        stages = {}
+        for name, totals in self.stages.items():
+            stages[name] = dict(totals, **self._rates(totals['seconds'], totals['files'], totals['bytes']))
+        return {'stages': stages, 'slowest': self.slowest_files()}
+
+    def close(self):
+        """Emit the summary, save the profile and close sinks"""
+        if self._profiler:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            self._profiler = None
+            self.emit('profile_saved', path=self.profile_path)
+        self.emit('summary', **self.summary())
+        for sink in self.sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
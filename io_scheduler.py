@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+I/O-aware scheduling of file reads for Duplicate Photo Finder.
+
+Parallel random reads make spinning disks seek themselves to a crawl,
+while one read at a time leaves SSDs idle. IOScheduler groups read jobs
+by device (st_dev) and gives each device its own worker threads:
+
+    SSD / unknown   `workers` concurrent reads, in job order
+    rotational      `rotational_workers` (default 1), in physical order -
+                    the first extent's disk offset from FIEMAP where the
+                    filesystem supports it, else inode number order
+
+The scheduler opens no file of its own: jobs run with locate=True (the
+head/tail sampling) are handed a `located` callback and report the
+extent of the file they already have open. Offsets are kept per inode,
+so the first read of a spinning disk goes by inode number and the full
+reads after it by disk offset.
+
+Devices are read concurrently. Rotational media is detected through
+/sys/dev/block/<major>:<minor>/queue/rotational (Linux); devices it
+cannot identify (other systems, network and virtual filesystems) are
+treated as SSDs.
+
+An optional Throttle caps the bytes and read operations per second over
+all devices, so scans can run on busy file servers.
+"""
+
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from digest_engines import READ_BUFFER_SIZE
+
+FS_IOC_FIEMAP = 0xC020660B  # _IOWR('f', 11, struct fiemap) from linux/fs.h
+FIEMAP_HEADER = struct.Struct('=QQIIII')  # start, length, flags, mapped, count, reserved
+FIEMAP_EXTENT = struct.Struct('=QQQQQIIII')  # logical, physical, length, 2 reserved, flags, 3 reserved
+THROTTLE_BURST = 1.0  # Seconds of budget that may be spent at once after an idle spell
+SYSFS_BLOCK = '/sys/dev/block'
+
+_rotational = {}  # st_dev -> True/False, or None when unknown
+
+
+def is_rotational(dev):
+    """Whether st_dev is a spinning disk: True, False or None (unknown)"""
+    if dev not in _rotational:
+        _rotational[dev] = _read_rotational(dev)
+    return _rotational[dev]
+
+
+def _read_rotational(dev):
+    if not hasattr(os, 'major'):  # Windows
+        return None
+    base = os.path.join(SYSFS_BLOCK, f"{os.major(dev)}:{os.minor(dev)}")
+    # Partitions have no queue of their own - it belongs to the parent disk
+    for folder in (base, os.path.join(base, '..')):
+        try:
+            with open(os.path.join(folder, 'queue', 'rotational')) as f:
+                return f.read().strip() == '1'
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def physical_offset(fd):
+    """Disk offset of the first extent of an open file (FIEMAP), or None.
+
+    Without FIEMAP_FLAG_SYNC: dirty pages are not flushed first, so a file
+    still being written may report no extent yet - good enough for ordering.
+    """
+    if fcntl is None:
+        return None
+    request = bytearray(FIEMAP_HEADER.pack(0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0) + bytes(FIEMAP_EXTENT.size))
+    try:
+        fcntl.ioctl(fd, FS_IOC_FIEMAP, request, True)
+    except OSError:
+        return None
+    mapped = FIEMAP_HEADER.unpack_from(request)[3]
+    if not mapped:
+        return 0  # Empty or inline file - nothing to seek to
+    return FIEMAP_EXTENT.unpack_from(request, FIEMAP_HEADER.size)[1]
+
+
+class Throttle:
+    """Shared budget of bytes and read operations per second (thread-safe)"""
+
+    def __init__(self, bytes_per_s=None, ops_per_s=None, burst=THROTTLE_BURST):
+        self.rates = (bytes_per_s, ops_per_s)
+        self.burst = burst
+        self.next_free = [0.0, 0.0]  # Per limit: when its budget is free again
+        self.waited = 0.0  # Total seconds readers were held back
+        self.lock = threading.Lock()
+
+    def acquire(self, nbytes):
+        """Reserve a read of nbytes (one operation per READ_BUFFER_SIZE) and wait for it"""
+        amounts = (nbytes, max(1, -(-nbytes // READ_BUFFER_SIZE)))
+        with self.lock:
+            now = time.monotonic()
+            delay = 0.0
+            for i, (rate, amount) in enumerate(zip(self.rates, amounts)):
+                if not rate:
+                    continue
+                start = max(now - self.burst, self.next_free[i])
+                self.next_free[i] = start + amount / rate
+                delay = max(delay, start - now)
+            self.waited += delay
+        if delay > 0:
+            time.sleep(delay)
+
+
+class IOScheduler:
+    """Run read jobs with per-device concurrency and ordering"""
+
+    def __init__(self, workers=1, rotational_workers=1, throttle=None, per_device=True):
+        self.workers = max(1, workers)
+        self.rotational_workers = max(1, rotational_workers)
+        self.throttle = throttle
+        self.per_device = per_device  # False: one queue in job order (throttle only)
+        self.devices = set()  # Devices read so far
+        self.rotational = set()  # ...of which spinning disks
+        self.physical_order = 0  # Files scheduled by FIEMAP offset
+        self.offsets = {}  # (st_dev, st_ino) -> first extent offset, from located jobs
+
+    def plan(self, files):
+        """Return [(device, rotational, ordered positions)] for (path, stat, nbytes) files"""
+        if not self.per_device:
+            return [(None, False, list(range(len(files))))]
+        by_device = defaultdict(list)
+        for position, (_, st, _) in enumerate(files):
+            by_device[st.st_dev].append(position)
+
+        plan = []
+        for dev, positions in by_device.items():
+            rotational = bool(is_rotational(dev))
+            self.devices.add(dev)
+            if rotational:
+                self.rotational.add(dev)
+                positions.sort(key=self._physical_key(files))
+            plan.append((dev, rotational, positions))
+        return plan
+
+    def _physical_key(self, files):
+        """Sort key for a spinning disk: first extent offset where known, else inode"""
+        offsets = self.offsets
+
+        def key(position):
+            st = files[position][1]
+            offset = offsets.get((st.st_dev, st.st_ino))
+            if offset is None:
+                return (1, st.st_ino)
+            self.physical_order += 1
+            return (0, offset)
+        return key
+
+    def _locator(self, st):
+        """Callback recording the extent of a file from a job's open descriptor"""
+        def located(fd):
+            offset = physical_offset(fd)
+            if offset is not None:
+                self.offsets[st.st_dev, st.st_ino] = offset
+        return located
+
+    def map(self, func, jobs, files, locate=False):
+        """Yield func(*job) for every job, in job order; files[i] is (path, stat, nbytes) of job i.
+
+        With locate, jobs of spinning disks whose offset is not known yet
+        are called as func(*job, located=callback) - see physical_offset.
+        """
+        futures = [None] * len(jobs)
+        pools = []
+        try:
+            for dev, rotational, positions in self.plan(files):
+                limit = self.rotational_workers if rotational else self.workers
+                pool = ThreadPoolExecutor(max_workers=limit)
+                pools.append(pool)
+                for position in positions:
+                    _, st, nbytes = files[position]
+                    locator = (self._locator(st) if locate and rotational
+                               and (st.st_dev, st.st_ino) not in self.offsets else None)
+                    futures[position] = pool.submit(self._run, func, jobs[position], nbytes, locator)
+            for future in futures:
+                yield future.result()
+        finally:
+            for pool in pools:
+                pool.shutdown()
+
+    def _run(self, func, job, nbytes, locator=None):
+        if self.throttle:
+            self.throttle.acquire(nbytes)
+        if locator is None:
+            return func(*job)
+        return func(*job, located=locator)
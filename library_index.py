@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent library index for Duplicate Photo Finder.
+
+Duplicates are cheapest to stop at the door. The library index keeps the
+results of a scan in SQLite, keyed the way the duplicate search narrows
+candidates down - size, then head/tail signature, then full digest - plus
+the lower-case file name and a perceptual hash (in four 16-bit bands).
+check() answers "is this already in the library?" for an incoming file
+and reads only what it has to:
+
+    no library file of the same size        nothing
+    none with the same head/tail signature  2 x PARTIAL_HASH_SIZE bytes
+    otherwise                               the whole file, once
+
+Library files whose keys were never computed (their size was unique when
+the index was built) get them the first time a lookup needs them, and
+the index keeps them. A digest match is only reported after the library
+file's stat identity has been checked, so files changed in place are
+re-hashed rather than trusted.
+
+accept() adds a checked file in one transaction, so an import that stops
+halfway leaves every accepted file indexed and nothing else.
+
+    python library_index.py --build --root /photos
+    python library_index.py --check /media/card --import-to /photos/2024
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from backup_methods import backup_file
+from duplicate_finder import (DuplicateFinder, PARTIAL_HASH_SIZE, PERCEPTUAL_EXTENSIONS, REVIEW_FOLDER,
+                              SCAN_ROOT, SIMILAR_DISTANCE, SUPPORTED_EXTENSIONS, hash_file, partial_hash_file)
+from file_walker import walk_files
+from perceptual_hash import hamming, perceptual_hash
+from scan_cache import CACHE_FILENAME
+
+LIBRARY_FILENAME = "duplicate_finder_library.sqlite"
+LIBRARY_VERSION = 1
+BANDS = 4  # Perceptual hashes are looked up by 16-bit band (pigeonhole, see MultiIndexHash)
+BAND_BITS = 64 // BANDS
+COLUMNS = ('path', 'name', 'dev', 'ino', 'size', 'mtime_ns', 'partial', 'digest', 'phash') + tuple(
+    f'band{i}' for i in range(BANDS))
+
+
+def _signed(value):
+    """64-bit hash as an SQLite integer"""
+    return value - (1 << 64) if value is not None and value >= 1 << 63 else value
+
+
+def _bands(value):
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (64 - (i + 1) * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+def _flips(radius):
+    """XOR masks of at most radius bits within one band"""
+    flips = {0}
+    for _ in range(radius):
+        flips |= {flip | (1 << bit) for flip in flips for bit in range(BAND_BITS)}
+    return sorted(flips)
+
+
+def _row(filepath, st, partial=None, digest=None, phash=None):
+    bands = _bands(phash) if phash is not None else [None] * BANDS
+    return (filepath, os.path.basename(filepath).lower(), st.st_dev, st.st_ino, st.st_size,
+            st.st_mtime_ns, partial, digest, _signed(phash), *bands)
+
+
+class LibraryIndex:
+    """SQLite index of a photo library for ingest-time duplicate checks"""
+
+    def __init__(self, path, hash_algorithm='md5', partial_size=PARTIAL_HASH_SIZE,
+                 perceptual_algorithm='dhash', max_distance=SIMILAR_DISTANCE):
+        self.path = path
+        # Settings of a new index; an existing index keeps the ones it was built with
+        self.meta = {'version': LIBRARY_VERSION, 'hash_algorithm': hash_algorithm,
+                     'partial_size': partial_size, 'perceptual_algorithm': perceptual_algorithm}
+        self.max_distance = max_distance
+        self._conn = None
+
+    def open(self):
+        """Open (and create if needed) the index database"""
+        if self._conn is not None:
+            return
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        conn = self._conn
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute(f"CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, name TEXT, dev INTEGER, "
+                     f"ino INTEGER, size INTEGER, mtime_ns INTEGER, partial TEXT, digest TEXT, phash INTEGER, "
+                     f"{', '.join(f'band{i} INTEGER' for i in range(BANDS))})")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_by_size ON files (size, partial)")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_by_digest ON files (digest)")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_by_name ON files (name)")
+        for i in range(BANDS):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS files_by_band{i} ON files (band{i})")
+        stored = dict(conn.execute("SELECT key, value FROM meta"))
+        if stored:
+            if int(stored.get('version', 0)) != LIBRARY_VERSION:
+                conn.close()
+                self._conn = None
+                raise ValueError(f"{self.path}: unsupported library index version {stored.get('version')}")
+            self.meta = {'version': LIBRARY_VERSION, 'hash_algorithm': stored['hash_algorithm'],
+                         'partial_size': int(stored['partial_size']),
+                         'perceptual_algorithm': stored['perceptual_algorithm']}
+        else:
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [(k, str(v)) for k, v in self.meta.items()])
+        conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __len__(self):
+        self.open()
+        return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def replace_all(self, rows):
+        """Replace the whole index with (path, stat, partial, digest, phash) rows in one transaction"""
+        self.open()
+        placeholders = ', '.join('?' * len(COLUMNS))
+        with self._conn:
+            self._conn.execute("DELETE FROM files")
+            cursor = self._conn.executemany(f"INSERT INTO files VALUES ({placeholders})",
+                                            (_row(*row) for row in rows))
+        return cursor.rowcount
+
+    def check(self, filepath, similar=False):
+        """Look an incoming file up in the library.
+
+        Returns a dict with the library paths of identical files
+        ('duplicates'), of files with the same name ('same_name'), of
+        similar images as (distance, path) ('similar', with similar=True),
+        the bytes read and the keys computed on the way (for accept()).
+        Raises OSError if the incoming file cannot be read.
+        """
+        self.open()
+        st = os.stat(filepath)
+        keys = {'stat': st, 'partial': None, 'digest': None, 'phash': None}
+        result = {'path': filepath, 'duplicates': [], 'same_name': [], 'similar': [],
+                  'bytes_read': 0, 'keys': keys}
+
+        result['same_name'] = [path for (path,) in self._conn.execute(
+            "SELECT path FROM files WHERE name = ? AND path != ?",
+            (os.path.basename(filepath).lower(), filepath))]
+
+        candidates = self._select("size = ? AND path != ?", (st.st_size, filepath))
+        if candidates:
+            keys['partial'] = self._read_key(filepath, st, 'partial', result)
+            candidates = [row for row in candidates
+                          if self._library_key(row, 'partial') == keys['partial']]
+        if candidates:
+            keys['digest'] = self._read_key(filepath, st, 'digest', result)
+            result['duplicates'] = [row['path'] for row in candidates
+                                    if self._library_key(row, 'digest', verify=True) == keys['digest']]
+
+        if similar and os.path.splitext(filepath)[1].lower() in PERCEPTUAL_EXTENSIONS:
+            value, _ = perceptual_hash(filepath, self.meta['perceptual_algorithm'])
+            if value:
+                keys['phash'] = int(value, 16)
+                result['similar'] = self._similar(keys['phash'], filepath)
+        return result
+
+    def accept(self, filepath, result=None):
+        """Add (or update) a file in the index, reusing the keys of its check() result"""
+        self.open()
+        keys = result['keys'] if result else {'stat': os.stat(filepath), 'partial': None,
+                                              'digest': None, 'phash': None}
+        placeholders = ', '.join('?' * len(COLUMNS))
+        with self._conn:
+            self._conn.execute(f"INSERT OR REPLACE INTO files VALUES ({placeholders})",
+                               _row(filepath, keys['stat'], keys['partial'], keys['digest'], keys['phash']))
+
+    def _select(self, where, params):
+        cursor = self._conn.execute(f"SELECT {', '.join(COLUMNS[:8])} FROM files WHERE {where}", params)
+        return [dict(zip(COLUMNS[:8], row)) for row in cursor]
+
+    def _read_key(self, filepath, st, field, result):
+        """Compute the signature or digest of a file (raises OSError)"""
+        if field == 'partial':
+            sample = self.meta['partial_size']
+            value, error = partial_hash_file(filepath, st.st_size, sample)
+            result['bytes_read'] += min(st.st_size, sample * 2)
+        else:
+            value, error = hash_file(filepath, self.meta['hash_algorithm'])
+            result['bytes_read'] += st.st_size
+        if error:
+            raise error
+        return value
+
+    def _library_key(self, row, field, verify=False):
+        """Signature or digest of a library file, computed and stored if missing.
+
+        With verify (or when the key is missing) the file's stat identity
+        is checked first; a changed file loses its stored keys, a missing
+        one leaves the index. Returns None for files that no longer match.
+        """
+        if row[field] is not None and not verify:
+            return row[field]
+        try:
+            st = os.stat(row['path'])
+        except OSError:
+            with self._conn:
+                self._conn.execute("DELETE FROM files WHERE path = ?", (row['path'],))
+            return None
+        if (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns) != (row['dev'], row['ino'], row['size'], row['mtime_ns']):
+            with self._conn:
+                self._conn.execute(f"UPDATE files SET dev = ?, ino = ?, size = ?, mtime_ns = ?, partial = NULL, "
+                                   f"digest = NULL, phash = NULL, {', '.join(f'band{i} = NULL' for i in range(BANDS))} "
+                                   f"WHERE path = ?", (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, row['path']))
+            if st.st_size != row['size']:
+                return None
+            row.update(dev=st.st_dev, ino=st.st_ino, mtime_ns=st.st_mtime_ns, partial=None, digest=None)
+        if row[field] is None:
+            try:
+                row[field] = self._read_key(row['path'], st, field, {'bytes_read': 0})
+            except OSError:
+                return None
+            with self._conn:
+                self._conn.execute(f"UPDATE files SET {field} = ? WHERE path = ?", (row[field], row['path']))
+        return row[field]
+
+    def _similar(self, value, filepath):
+        """[(distance, path)] of indexed images within max_distance of a perceptual hash"""
+        flips = _flips(self.max_distance // BANDS)
+        found = {}
+        for i, band in enumerate(_bands(value)):
+            keys = [band ^ flip for flip in flips]
+            cursor = self._conn.execute(
+                f"SELECT path, phash FROM files WHERE band{i} IN ({', '.join('?' * len(keys))}) AND path != ?",
+                keys + [filepath])
+            for path, other in cursor:
+                if path not in found:
+                    distance = hamming(value, other & ((1 << 64) - 1))
+                    if distance <= self.max_distance:
+                        found[path] = distance
+        return sorted((distance, path) for path, distance in found.items())
+
+
+def build_index(finder, index):
+    """Scan finder.SCAN_ROOT and replace the index with its files and known keys"""
+    finder.scan_files()
+    records = finder.records
+    digests = {}
+    for digest, indices in finder.file_hashes.items():
+        if not digest.startswith('bytes:'):  # compare='bytes' groups have no digest
+            for entry in indices:
+                digests[entry] = digest
+    phashes = {}
+    if finder.similar:
+        images = [i for i in range(len(records))
+                  if os.path.splitext(records.names[i])[1].lower() in finder.PERCEPTUAL_EXTENSIONS]
+        phashes = finder._perceptual_hashes(images)
+
+    def rows():
+        for i in range(len(records)):
+            filepath, st = records.path(i), records.stat(i)
+            entry = finder.cache.lookup(filepath, st) if finder.cache else None
+            partial = entry['partial'] if entry and entry['partial_size'] == index.meta['partial_size'] else None
+            yield filepath, st, partial, digests.get(i), phashes.get(i)
+    return index.replace_all(rows())
+
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Check incoming photos/videos against a library index.")
+    parser.add_argument('--index', default=os.path.join(REVIEW_FOLDER, LIBRARY_FILENAME),
+                        help="path of the library index")
+    parser.add_argument('--build', action='store_true',
+                        help="scan --root and (re)build the index")
+    parser.add_argument('--root', default=SCAN_ROOT,
+                        help="library folder scanned by --build")
+    parser.add_argument('--cache', default=os.path.join(REVIEW_FOLDER, CACHE_FILENAME),
+                        help="scan cache reused by --build")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of parallel hashing workers for --build")
+    parser.add_argument('--check', nargs='+', metavar='PATH',
+                        help="incoming files or folders to look up")
+    parser.add_argument('--similar', action='store_true',
+                        help="also index/look up perceptual hashes of images")
+    parser.add_argument('--accept', action='store_true',
+                        help="add new files to the index where they are")
+    parser.add_argument('--import-to', metavar='FOLDER',
+                        help="copy new files into this library folder and index the copies")
+    return parser.parse_args(argv)
+
+
+def _incoming(paths):
+    """Files to check: given files as they are, folders walked for supported files"""
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in walk_files(path, SUPPORTED_EXTENSIONS):
+                yield entry.path, path
+        else:
+            yield path, os.path.dirname(path)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    index = LibraryIndex(args.index)
+    try:
+        index.open()
+    except (ValueError, sqlite3.DatabaseError) as e:
+        print(f"❌ Cannot open library index: {e}")
+        return 1
+
+    if args.build:
+        finder = DuplicateFinder(cache_path=args.cache, workers=args.workers, similar=args.similar,
+                                 hash_algorithm=index.meta['hash_algorithm'],
+                                 perceptual_algorithm=index.meta['perceptual_algorithm'])
+        finder.SCAN_ROOT = args.root
+        count = build_index(finder, index)
+        finder.cache.close()
+        print(f"\n📚 Indexed {count} files from {args.root} into {args.index}")
+
+    checked = new = duplicates = bytes_read = 0
+    start = time.perf_counter()
+    for filepath, root in _incoming(args.check or []):
+        try:
+            result = index.check(filepath, similar=args.similar)
+        except OSError as e:
+            print(f"⚠️ Cannot read {filepath}: {e}")
+            continue
+        checked += 1
+        bytes_read += result['bytes_read']
+        if result['duplicates']:
+            duplicates += 1
+            print(f"♻️  {filepath}\n    = {result['duplicates'][0]}")
+            continue
+
+        new += 1
+        print(f"🆕 {filepath}")
+        for path in result['same_name'][:3]:
+            print(f"    🔤 same name: {path}")
+        for distance, path in result['similar'][:3]:
+            print(f"    👀 similar ({distance} bits): {path}")
+        if args.import_to:
+            dest = os.path.join(args.import_to, os.path.relpath(filepath, root))
+            method, error = backup_file(filepath, dest, 'copy')
+            if error:
+                print(f"    ⚠️ Import error: {error}")
+                continue
+            result['keys']['stat'] = os.stat(dest)
+            index.accept(dest, result)
+        elif args.accept:
+            index.accept(filepath, result)
+
+    if checked:
+        seconds = time.perf_counter() - start
+        print(f"\n📊 Checked {checked} files: {new} new, {duplicates} already in the library "
+              f"({seconds * 1000 / checked:.1f} ms per file, {bytes_read / 1024 / 1024:.2f} MB read)")
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Header-only dimension probing for Duplicate Photo Finder.
+
+Reads width and height straight from the file headers without decoding:
+JPEG SOF markers, the PNG IHDR chunk, HEIF 'ispe' properties and MP4
+'tkhd' track headers ('mvhd' also gives the movie duration). Only
+marker/box headers are read; large payloads (EXIF blocks, 'mdat' media
+data) are skipped with seek().
+"""
+
+import struct
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+HEIF_BRANDS = {b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1', b'avif'}
+# SOF markers carrying frame dimensions (C4 = DHT, C8 = JPG, CC = DAC are not frames)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+MAX_BOX_PAYLOAD = 1024 * 1024  # Never read more than this for a single header box
+MAX_JPEG_SEGMENTS = 256
+
+
+def probe_dimensions(filepath):
+    """Return (width, height) parsed from file headers, or None"""
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(32)
+            if head.startswith(b'\xff\xd8'):
+                return _jpeg_dimensions(f)
+            if head.startswith(PNG_SIGNATURE):
+                return _png_dimensions(head)
+            if head[4:8] == b'ftyp':
+                if head[8:12] in HEIF_BRANDS:
+                    return _heif_dimensions(f)
+                return _mp4_dimensions(f)
+    except (OSError, struct.error, ValueError):
+        pass
+    return None
+
+
+def probe_mp4(filepath):
+    """Return {'duration', 'width', 'height'} from MP4 'mvhd'/'tkhd' boxes, or None"""
+    try:
+        with open(filepath, 'rb') as f:
+            if f.read(12)[4:8] != b'ftyp':
+                return None
+            duration = _mp4_duration(f)
+            if duration is None:
+                return None
+            width, height = _mp4_dimensions(f) or (None, None)
+            return {'duration': duration, 'width': width, 'height': height}
+    except (OSError, struct.error, ValueError):
+        return None
+
+
+def _jpeg_dimensions(f):
+    """Walk JPEG marker segments until the first SOF"""
+    f.seek(2)
+    for _ in range(MAX_JPEG_SEGMENTS):
+        marker = f.read(2)
+        while marker[:1] == b'\xff' and marker[1:2] == b'\xff':
+            marker = marker[1:] + f.read(1)  # Fill bytes
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xD9 or code == 0xDA:  # EOI / start of scan - no frame header found
+            return None
+        if 0xD0 <= code <= 0xD7 or code == 0x01:  # Markers without a length
+            continue
+        length = struct.unpack('>H', f.read(2))[0]
+        if code in JPEG_SOF_MARKERS:
+            _precision, height, width = struct.unpack('>BHH', f.read(5))
+            return (width, height) if width and height else None
+        f.seek(length - 2, 1)
+    return None
+
+
+def _png_dimensions(head):
+    """Read IHDR, which must be the first chunk"""
+    if head[12:16] != b'IHDR':
+        return None
+    width, height = struct.unpack('>II', head[16:24])
+    return (width, height) if width and height else None
+
+
+def iter_boxes(f, start, end):
+    """Yield (type, payload_offset, box_end) for ISO-BMFF boxes in [start, end)"""
+    offset = start
+    while end is None or offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        payload = offset + 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            payload += 8
+        elif size == 0:
+            f.seek(0, 2)
+            size = f.tell() - offset
+        if size < payload - offset:
+            return
+        box_end = offset + size
+        yield box_type, payload, box_end
+        offset = box_end
+
+
+def find_box(f, start, end, path):
+    """Return (payload_offset, box_end) of the first box matching a type path"""
+    for box_type, payload, box_end in iter_boxes(f, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload, box_end
+            return find_box(f, payload, box_end, path[1:])
+    return None
+
+
+def read_payload(f, payload, box_end):
+    """Read a (bounded) box payload"""
+    f.seek(payload)
+    return f.read(min(box_end - payload, MAX_BOX_PAYLOAD))
+
+
+def _heif_dimensions(f):
+    """Largest 'ispe' (image spatial extents) property in meta/iprp/ipco"""
+    meta = find_box(f, 0, None, [b'meta'])
+    if not meta:
+        return None
+    # 'meta' is a full box: 4 bytes of version/flags precede its children
+    ipco = find_box(f, meta[0] + 4, meta[1], [b'iprp', b'ipco'])
+    if not ipco:
+        return None
+    best = None
+    for box_type, payload, box_end in iter_boxes(f, ipco[0], ipco[1]):
+        if box_type == b'ispe':
+            data = read_payload(f, payload, box_end)
+            width, height = struct.unpack('>II', data[4:12])
+            if best is None or width * height > best[0] * best[1]:
+                best = (width, height)
+    return best if best and best[0] and best[1] else None
+
+
+def _mp4_dimensions(f):
+    """Largest 'tkhd' width/height among the tracks in 'moov'"""
+    moov = find_box(f, 0, None, [b'moov'])
+    if not moov:
+        return None
+    best = None
+    for box_type, payload, box_end in iter_boxes(f, moov[0], moov[1]):
+        if box_type != b'trak':
+            continue
+        tkhd = find_box(f, payload, box_end, [b'tkhd'])
+        if not tkhd:
+            continue
+        data = read_payload(f, *tkhd)
+        # Width/height are 16.16 fixed point at the end of the box
+        offset = 76 if data[0] == 0 else 88
+        width, height = struct.unpack('>II', data[offset:offset + 8])
+        width, height = width >> 16, height >> 16
+        if width and height and (best is None or width * height > best[0] * best[1]):
+            best = (width, height)
+    return best
+
+
+def _mp4_duration(f):
+    """Movie duration in seconds from the 'mvhd' header"""
+    mvhd = find_box(f, 0, None, [b'moov', b'mvhd'])
+    if not mvhd:
+        return None
+    data = read_payload(f, *mvhd)
+    if data[0] == 1:
+        timescale, duration = struct.unpack('>IQ', data[20:32])
+    else:
+        timescale, duration = struct.unpack('>II', data[12:20])
+    return duration / timescale if timescale else None
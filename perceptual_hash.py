@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perceptual hashing for Duplicate Photo Finder.
+
+Resized, recompressed or re-exported copies of a photo have different
+bytes but nearly the same 64-bit perceptual hash. Images are decoded at
+reduced size (JPEG draft mode, then Image.reduce) before hashing, and near
+matches are found with multi-index hashing, which only compares hashes
+that share a (nearly) identical 16-bit substring with the query.
+"""
+
+import math
+
+from PIL import Image, ImageOps
+
+HASH_SIZE = 8  # 8x8 = 64-bit hashes
+PHASH_SIZE = 32  # pHash works on a 32x32 image and keeps the 8x8 low frequencies
+
+try:
+    RESAMPLE = Image.Resampling.LANCZOS
+except AttributeError:  # Pillow < 9.1
+    RESAMPLE = Image.LANCZOS
+
+
+def load_reduced(filepath, size):
+    """Decode a grayscale image, not much bigger than size x size"""
+    with Image.open(filepath) as img:
+        # JPEG only: decode at 1/2 .. 1/8 scale directly
+        img.draft('L', (size * 4, size * 4))
+        img = ImageOps.exif_transpose(img)
+        factor = min(img.width, img.height) // (size * 4)
+        if factor > 1:
+            img = img.reduce(factor)
+        return img.convert('L')
+
+
+def dhash(filepath, size=HASH_SIZE):
+    """Difference hash: is each pixel brighter than its right neighbour"""
+    return dhash_image(load_reduced(filepath, size), size)
+
+
+def dhash_image(img, size=HASH_SIZE):
+    """Difference hash of an already decoded image (e.g. a video frame)"""
+    img = img.convert('L').resize((size + 1, size), RESAMPLE)
+    pixels = img.tobytes()  # One byte per pixel in mode L
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def _dct_matrix(n, keep):
+    """First `keep` rows of the DCT-II basis for n samples"""
+    return [[math.cos(math.pi * k * (2 * i + 1) / (2 * n)) for i in range(n)] for k in range(keep)]
+
+
+_DCT = _dct_matrix(PHASH_SIZE, HASH_SIZE)
+
+
+def phash(filepath, size=HASH_SIZE):
+    """DCT hash: is each low-frequency coefficient above the median"""
+    return phash_image(load_reduced(filepath, PHASH_SIZE), size)
+
+
+def phash_image(img, size=HASH_SIZE):
+    """DCT hash of an already decoded image (e.g. a stored thumbnail)"""
+    img = img.convert('L').resize((PHASH_SIZE, PHASH_SIZE), RESAMPLE)
+    pixels = img.tobytes()  # One byte per pixel in mode L
+    rows = [pixels[i:i + PHASH_SIZE] for i in range(0, PHASH_SIZE * PHASH_SIZE, PHASH_SIZE)]
+    dct = _DCT if size == HASH_SIZE else _dct_matrix(PHASH_SIZE, size)
+    # 2-D DCT restricted to the top-left size x size coefficients
+    partial = [[sum(b * v for b, v in zip(basis, row)) for basis in dct] for row in rows]
+    coefficients = [sum(dct[u][y] * partial[y][v] for y in range(PHASH_SIZE))
+                    for u in range(size) for v in range(size)]
+    median = sorted(coefficients[1:])[len(coefficients[1:]) // 2]  # Ignore the DC term
+    value = 0
+    for coefficient in coefficients:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+ALGORITHMS = {
+    'dhash': dhash,
+    'phash': phash,
+}
+IMAGE_ALGORITHMS = {  # The same hashes of an already decoded image
+    'dhash': dhash_image,
+    'phash': phash_image,
+}
+
+
+def perceptual_hash(filepath, algorithm='dhash'):
+    """Return (hash as hex string, error) - never raises, for worker pools"""
+    try:
+        return format(ALGORITHMS[algorithm](filepath), '016x'), None
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+        return None, e
+
+
+def hamming(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+
+class MultiIndexHash:
+    """Multi-index hashing of 64-bit hashes for Hamming-distance queries.
+
+    Each hash is split into `blocks` substrings, each with its own table.
+    Two hashes within max_distance differ in at most max_distance // blocks
+    bits in at least one substring (pigeonhole), so a query only looks up
+    the substrings within that radius instead of comparing every hash.
+    """
+
+    def __init__(self, max_distance, bits=64, blocks=4):
+        self.max_distance = max_distance
+        self.block_bits = bits // blocks
+        self.radius = max_distance // blocks
+        self.tables = [{} for _ in range(blocks)]  # substring -> [(hash, item)]
+        self.size = 0
+        mask = (1 << self.block_bits) - 1
+        self._shifts = [(bits - (i + 1) * self.block_bits, mask) for i in range(blocks)]
+        # XOR masks of at most `radius` bits within one substring
+        self._flips = [0]
+        for _ in range(self.radius):
+            self._flips = sorted(set(self._flips) | {flip | (1 << bit) for flip in self._flips
+                                                     for bit in range(self.block_bits)})
+
+    def __len__(self):
+        return self.size
+
+    def add(self, value, item):
+        """Index an item under a hash"""
+        self.size += 1
+        for table, (shift, mask) in zip(self.tables, self._shifts):
+            table.setdefault((value >> shift) & mask, []).append((value, item))
+
+    def search(self, value):
+        """Return [(distance, item)] for every hash within max_distance"""
+        found = {}
+        for table, (shift, mask) in zip(self.tables, self._shifts):
+            key = (value >> shift) & mask
+            for flip in self._flips:
+                for other, item in table.get(key ^ flip, ()):
+                    if item not in found:
+                        distance = hamming(value, other)
+                        if distance <= self.max_distance:
+                            found[item] = distance
+        return [(distance, item) for item, distance in found.items()]
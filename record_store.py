@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact columnar storage of scanned files for Duplicate Photo Finder.
+
+Instead of one dict per file, every attribute lives in its own column:
+sizes, qualities and stat identity in typed arrays, directories in an
+interned table with one small index per file, and the protected flag in
+a bitset. Duplicate groups hold integer indices into the store.
+"""
+
+import os
+import sys
+from array import array
+from collections import namedtuple
+
+NO_QUALITY = -1  # Quality not evaluated yet
+WIDE_INODE = 2 ** 64 - 1  # Stands in the inode column for an st_ino kept in wide_inodes
+
+# Stat fields needed to validate cache entries (compatible with os.stat_result)
+StatKey = namedtuple('StatKey', ['st_dev', 'st_ino', 'st_size', 'st_mtime_ns'])
+
+
+class FileRecord:
+    """Lightweight view of one record, indexable like the old file_info dict"""
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        store, index = self.store, self.index
+        if key == 'path':
+            return store.path(index)
+        if key == 'size':
+            return store.sizes[index]
+        if key == 'quality':
+            return store.quality(index)
+        if key == 'protected':
+            return store.is_protected(index)
+        if key == 'name':
+            return store.names[index]
+        if key == 'inode':
+            return store.inode(index)
+        if key == 'links':
+            return store.links.get(index, 1)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key != 'quality':
+            raise KeyError(f"{key} is read-only")
+        self.store.set_quality(self.index, value)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"FileRecord({self.index}, {self['path']!r})"
+
+
+class FileRecordStore:
+    """Columnar store of scanned files, addressed by integer index"""
+
+    def __init__(self):
+        self.dirs = []  # Interned directory table
+        self._dir_ids = {}  # directory -> position in self.dirs
+        self.dir_ids = array('q')
+        self.names = []  # Basenames
+        self.sizes = array('q')
+        self.qualities = array('q')
+        self.mtimes = array('q')  # st_mtime_ns
+        self.devices = array('Q')  # st_dev
+        self.inodes = array('Q')  # st_ino
+        self.wide_inodes = {}  # index -> st_ino too wide for the column (ReFS file IDs are 128-bit)
+        self.protected = bytearray()  # Bitset, one bit per record
+        self.links = {}  # index -> st_nlink, only for files with more than one name
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self.sizes):
+            raise IndexError(index)
+        return FileRecord(self, index)
+
+    def add(self, path, st, protected=False, quality=None):
+        """Append a file and return its index"""
+        folder, name = os.path.split(path)
+        dir_id = self._dir_ids.get(folder)
+        if dir_id is None:
+            dir_id = self._dir_ids[folder] = len(self.dirs)
+            self.dirs.append(folder)
+
+        index = len(self.sizes)
+        self.dir_ids.append(dir_id)
+        self.names.append(name)
+        self.sizes.append(st.st_size)
+        self.qualities.append(NO_QUALITY if quality is None else quality)
+        self.mtimes.append(st.st_mtime_ns)
+        self.devices.append(st.st_dev)
+        if st.st_ino < WIDE_INODE:
+            self.inodes.append(st.st_ino)
+        else:
+            self.inodes.append(WIDE_INODE)
+            self.wide_inodes[index] = st.st_ino
+        if index % 8 == 0:
+            self.protected.append(0)
+        if protected:
+            self.protected[index >> 3] |= 1 << (index & 7)
+        nlink = getattr(st, 'st_nlink', 1)
+        if nlink > 1:
+            self.links[index] = nlink
+        return index
+
+    def path(self, index):
+        """Full path of a record"""
+        return os.path.join(self.dirs[self.dir_ids[index]], self.names[index])
+
+    def stat(self, index):
+        """Stat identity of a record (usable with ScanCache)"""
+        return StatKey(self.devices[index], self._ino(index),
+                       self.sizes[index], self.mtimes[index])
+
+    def inode(self, index):
+        """(st_dev, st_ino) of a record, or None where the platform reports no inode"""
+        ino = self._ino(index)
+        return (self.devices[index], ino) if ino else None
+
+    def _ino(self, index):
+        ino = self.inodes[index]
+        return self.wide_inodes[index] if ino == WIDE_INODE else ino
+
+    def is_protected(self, index):
+        return bool(self.protected[index >> 3] & (1 << (index & 7)))
+
+    def quality(self, index):
+        quality = self.qualities[index]
+        return None if quality == NO_QUALITY else quality
+
+    def set_quality(self, index, quality):
+        self.qualities[index] = NO_QUALITY if quality is None else quality
+
+    def memory_usage(self):
+        """Approximate bytes held by the store"""
+        total = sys.getsizeof(self.dirs) + sys.getsizeof(self._dir_ids)
+        total += sum(sys.getsizeof(folder) for folder in self.dirs)
+        total += sys.getsizeof(self.names) + sum(sys.getsizeof(name) for name in self.names)
+        for column in (self.dir_ids, self.sizes, self.qualities,
+                       self.mtimes, self.devices, self.inodes, self.protected):
+            total += sys.getsizeof(column)
+        return total + sys.getsizeof(self.links) + sys.getsizeof(self.wide_inodes)
+
+    def bytes_per_million(self):
+        """Memory usage scaled to one million files"""
+        if not len(self):
+            return 0
+        return self.memory_usage() * 1000000 // len(self)
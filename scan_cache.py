@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of per-file scan results for Duplicate Photo Finder.
+
+Entries are keyed by path and validated against the file's stat identity
+(device, inode, size, mtime_ns), so unchanged files are never re-read.
+"""
+
+import os
+import sqlite3
+
+CACHE_FILENAME = "duplicate_finder_cache.sqlite"
+FLUSH_EVERY = 10000  # Pending entries written per transaction
+
+# Cached result columns (besides path and stat identity) and their SQL types
+RESULT_COLUMNS = {
+    'partial_size': 'INTEGER',
+    'partial': 'TEXT',
+    'algorithm': 'TEXT',  # Digest engine that produced 'digest'
+    'digest': 'TEXT',
+    'width': 'INTEGER',
+    'height': 'INTEGER',
+    'quality': 'INTEGER',
+    'phash_algorithm': 'TEXT',  # Perceptual hash that produced 'phash'
+    'phash': 'TEXT',
+    'video_samples': 'INTEGER',  # Frames sampled for 'video_fingerprint'
+    'video_fingerprint': 'TEXT',
+    'thumbnail_store': 'TEXT',  # Thumbnail store (thumbnail_store.py) holding 'thumbnail_slot'
+    'thumbnail_slot': 'INTEGER',
+}
+RESULT_FIELDS = tuple(RESULT_COLUMNS)
+STAT_FIELDS = ('dev', 'ino', 'size', 'mtime_ns')
+
+
+def stat_key(st):
+    """Return the stat identity used to validate a cache entry"""
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class ScanCache:
+    """SQLite-backed cache of digests, signatures and quality scores"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}  # path -> entry dict
+        self.pending = {}  # path -> entry dict waiting to be written
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+
+    def open(self):
+        """Open (and create if needed) the cache database"""
+        if self._conn is not None:
+            return
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [f"{name} INTEGER" for name in STAT_FIELDS]
+        columns += [f"{name} {kind}" for name, kind in RESULT_COLUMNS.items()]
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, {', '.join(columns)})"
+        )
+        # Add columns introduced after the cache file was created
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(files)")}
+        for name, kind in RESULT_COLUMNS.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE files ADD COLUMN {name} {kind}")
+        self._conn.commit()
+
+    def load(self):
+        """Bulk-load all entries into memory"""
+        self.open()
+        fields = ('path',) + STAT_FIELDS + RESULT_FIELDS
+        cursor = self._conn.execute(f"SELECT {', '.join(fields)} FROM files")
+        for row in cursor:
+            entry = dict(zip(fields, row))
+            self.entries[entry.pop('path')] = entry
+        return len(self.entries)
+
+    def lookup(self, filepath, st):
+        """Return cached entry if the file's stat identity still matches"""
+        entry = self.entries.get(filepath)
+        if entry is not None and tuple(entry[name] for name in STAT_FIELDS) == stat_key(st):
+            return entry
+        return None
+
+    def get(self, filepath, st, field, **expected):
+        """Return a cached field, or None if missing, stale or computed differently"""
+        entry = self.lookup(filepath, st)
+        if (entry is None or entry.get(field) is None
+                or any(entry.get(name) != value for name, value in expected.items())):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[field]
+
+    def update(self, filepath, st, **fields):
+        """Record new results for a file (written on the next flush)"""
+        entry = self.entries.get(filepath)
+        key = stat_key(st)
+        if entry is None or tuple(entry[name] for name in STAT_FIELDS) != key:
+            # New file or file changed - previous results are stale
+            entry = dict(zip(STAT_FIELDS, key))
+            entry.update(dict.fromkeys(RESULT_FIELDS))
+            self.entries[filepath] = entry
+        entry.update(fields)
+        self.pending[filepath] = entry
+        if len(self.pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """Write pending entries in a single transaction"""
+        if not self.pending:
+            return 0
+        self.open()
+        fields = ('path',) + STAT_FIELDS + RESULT_FIELDS
+        rows = [
+            (path,) + tuple(entry[name] for name in STAT_FIELDS + RESULT_FIELDS)
+            for path, entry in self.pending.items()
+        ]
+        placeholders = ", ".join("?" * len(fields))
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO files ({', '.join(fields)}) VALUES ({placeholders})",
+                rows,
+            )
+        self.pending.clear()
+        return len(rows)
+
+    def compact(self, thumbnails=None):
+        """Evict entries whose paths no longer exist and shrink the file.
+        
+        A ThumbnailStore given as thumbnails is compacted too: it keeps only
+        the slots the remaining entries reference, and they follow the new
+        slot numbers.
+        """
+        self.open()
+        self.flush()
+        paths = [row[0] for row in self._conn.execute("SELECT path FROM files")]
+        missing = [(path,) for path in paths if not os.path.exists(path)]
+        with self._conn:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", missing)
+        for (path,) in missing:
+            self.entries.pop(path, None)
+        if thumbnails is not None:
+            self._compact_thumbnails(thumbnails)
+        self._conn.execute("VACUUM")
+        return len(missing)
+
+    def _compact_thumbnails(self, thumbnails):
+        """Compact a thumbnail store down to the slots entries reference, and renumber them"""
+        rows = self._conn.execute("SELECT path, thumbnail_slot FROM files WHERE thumbnail_store = ? "
+                                  "AND thumbnail_slot IS NOT NULL", (thumbnails.id,)).fetchall()
+        renumbered = thumbnails.compact(slot for _, slot in rows)
+        moved = [(thumbnails.id, renumbered.get(slot), path) for path, slot in rows]
+        with self._conn:
+            # Slots in other (or started over) stores are gone
+            self._conn.execute("UPDATE files SET thumbnail_store = NULL, thumbnail_slot = NULL "
+                               "WHERE thumbnail_store IS NOT NULL")
+            self._conn.executemany("UPDATE files SET thumbnail_store = ?, thumbnail_slot = ? WHERE path = ?", moved)
+        for entry in self.entries.values():
+            entry['thumbnail_store'] = entry['thumbnail_slot'] = None
+        for store_id, slot, path in moved:
+            if path in self.entries:
+                self.entries[path].update(thumbnail_store=store_id, thumbnail_slot=slot)
+
+    def close(self):
+        """Flush pending entries and close the database"""
+        self.flush()
+        if self._conn is None:
+            return
+        self._conn.close()
+        self._conn = None
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent scan index for incremental rescans in Duplicate Photo Finder.
+
+The index keeps what the previous scan saw: every directory listing with
+the directory's mtime, and every file's stat identity with the outcome of
+the staged hash pipeline. On the next run a directory whose mtime did not
+change is not listed again (its files are only stat-ed), unchanged files
+keep their previous hash result, and only the size buckets that gained,
+lost or changed a file go through the hash pipeline again. A directory
+changed within 2 s of being listed (the FAT mtime resolution) is listed
+again regardless, see file_walker.list_known_directory.
+
+The index is only valid for the settings it was built with (scan root,
+extensions, excludes, digest engine...); any change discards it.
+"""
+
+import json
+import os
+import sqlite3
+
+INDEX_FILENAME = "duplicate_finder_index.sqlite"
+
+NOT_CANDIDATE = True  # Hash pipeline outcome: never needed a full digest
+READ_ERROR = None  # Hash pipeline outcome: file could not be read
+
+
+def encode_hash(value):
+    """Store pipeline outcomes as TEXT: NULL = not a candidate, '' = read error"""
+    if value is NOT_CANDIDATE:
+        return None
+    return '' if value is READ_ERROR else value
+
+
+def decode_hash(value):
+    if value is None:
+        return NOT_CANDIDATE
+    return value or READ_ERROR
+
+
+class ScanIndex:
+    """SQLite-backed index of the previous scan's directories and files"""
+
+    def __init__(self, path):
+        self.path = path
+        self.listings = {}  # directory -> (mtime_ns, [file names], [subdirectories])
+        self.files = {}  # path -> ((dev, ino, size, mtime_ns), hash outcome)
+        self.valid = False  # Loaded and built with the same settings
+        self._conn = None
+
+    def open(self):
+        """Open (and create if needed) the index database"""
+        if self._conn is not None:
+            return
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS directories "
+                           "(path TEXT PRIMARY KEY, mtime_ns INTEGER, files TEXT, subdirs TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, dev INTEGER, "
+                           "ino INTEGER, size INTEGER, mtime_ns INTEGER, hash TEXT)")
+        self._conn.commit()
+
+    def load(self, settings):
+        """Load the index if it was built with these settings; return whether it was"""
+        self.open()
+        self.listings, self.files = {}, {}
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'settings'").fetchone()
+        self.valid = row is not None and row[0] == json.dumps(settings, sort_keys=True)
+        if not self.valid:
+            return False
+        for path, mtime_ns, files, subdirs in self._conn.execute(
+                "SELECT path, mtime_ns, files, subdirs FROM directories"):
+            self.listings[path] = (mtime_ns, json.loads(files), json.loads(subdirs))
+        for path, dev, ino, size, mtime_ns, value in self._conn.execute(
+                "SELECT path, dev, ino, size, mtime_ns, hash FROM files"):
+            self.files[path] = ((dev, ino, size, mtime_ns), decode_hash(value))
+        return True
+
+    def save(self, settings, listings, changed, deleted):
+        """Write one scan's changes in a single transaction.
+
+        listings -- every directory listing of this scan
+        changed  -- {path: (stat key, hash outcome)} for new or re-processed files
+        deleted  -- paths of files that are gone
+        """
+        self.open()
+        rows = [(path, mtime_ns, json.dumps(files), json.dumps(subdirs))
+                for path, (mtime_ns, files, subdirs) in listings.items()
+                if self.listings.get(path) != (mtime_ns, files, subdirs)]
+        gone = [(path,) for path in self.listings if path not in listings]
+        with self._conn:
+            if not self.valid:
+                self._conn.execute("DELETE FROM directories")
+                self._conn.execute("DELETE FROM files")
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('settings', ?)",
+                               (json.dumps(settings, sort_keys=True),))
+            self._conn.executemany("INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?)", rows)
+            self._conn.executemany("DELETE FROM directories WHERE path = ?", gone)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                [(path,) + tuple(key) + (encode_hash(value),) for path, (key, value) in changed.items()])
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in deleted])
+        self.listings = dict(listings)
+        for path in deleted:
+            self.files.pop(path, None)
+        self.files.update(changed)
+        self.valid = True
+
+    def close(self):
+        if self._conn is None:
+            return
+        self._conn.close()
+        self._conn = None
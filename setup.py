@@ -19,7 +19,12 @@ setup(
     long_description=long_description,
     long_description_content_type='text/markdown',
     url='https://github.com/krudzki/duplicate_photo_finder',
-    py_modules=['duplicate_finder'],
+    py_modules=['duplicate_finder', 'scan_cache', 'digest_engines', 'media_probe', 'file_walker', 'record_store',
+                'instrumentation', 'perceptual_hash', 'video_fingerprint',
+                'scan_index', 'checkpoint', 'shard_index', 'spill_groups',
+                'byte_compare', 'backup_methods', 'async_pipeline',
+                'io_scheduler', 'library_index', 'duplicate_report',
+                'thumbnail_store'],
     python_requires='>=3.8',
     install_requires=[
         'Pillow>=10.0.0',
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shard index files for multi-node scans in Duplicate Photo Finder.
+
+Each node scans its own root (its shard) and writes every readable file
+to a self-contained SQLite file: path, size, head/tail signature, full
+digest, quality score and protected flag. Because every file carries a
+full digest, shards can be compared with each other without reading any
+file content again.
+
+A merge reads any number of shard files side by side, each ordered by
+digest (then by lower-case file name), and walks them with a k-way merge,
+so only one group at a time is held in memory.
+"""
+
+import heapq
+import json
+import os
+import sqlite3
+from datetime import datetime
+from itertools import groupby
+
+SHARD_VERSION = 1
+
+# Orderings a shard can be read in; both are backed by an index
+ORDERINGS = {
+    'digest': "digest, path",
+    'name': "name, path",
+}
+
+
+def write_shard(path, meta, rows):
+    """Write a shard file from (path, size, partial, digest, quality, protected) rows.
+
+    meta -- dict stored with the shard ('shard' name, 'hash_algorithm', ...)
+    Returns the number of files written.
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE files (path TEXT PRIMARY KEY, name TEXT, size INTEGER, "
+                     "partial TEXT, digest TEXT, quality INTEGER, protected INTEGER)")
+        cursor = conn.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((filepath, os.path.basename(filepath).lower(), size, partial, digest, quality, int(protected))
+             for filepath, size, partial, digest, quality, protected in rows))
+        count = cursor.rowcount
+        meta = dict(meta, version=SHARD_VERSION, files=count, created=datetime.now().isoformat())
+        conn.executemany("INSERT INTO meta VALUES (?, ?)",
+                         [(key, json.dumps(value)) for key, value in meta.items()])
+        # Built after the bulk insert - cheaper than maintaining them row by row
+        conn.execute("CREATE INDEX files_by_digest ON files (digest, path)")
+        conn.execute("CREATE INDEX files_by_name ON files (name, path)")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+class ShardReader:
+    """Read-only access to one shard file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            self.meta = {key: json.loads(value) for key, value in
+                         self._conn.execute("SELECT key, value FROM meta")}
+        except sqlite3.DatabaseError as e:
+            self._conn.close()
+            raise ValueError(f"{path} is not a shard index: {e}")
+        if self.meta.get('version') != SHARD_VERSION:
+            self._conn.close()
+            raise ValueError(f"{path}: unsupported shard version {self.meta.get('version')}")
+        self.name = self.meta['shard']
+
+    def records(self, order):
+        """Yield every file as a record dict, in the given ORDERINGS order"""
+        shard = self.name
+        query = ("SELECT path, name, size, partial, digest, quality, protected FROM files "
+                 f"ORDER BY {ORDERINGS[order]}")
+        for filepath, name, size, partial, digest, quality, protected in self._conn.execute(query):
+            yield {
+                'path': f"{shard}:{filepath}",  # Unique across shards
+                'shard': shard,
+                'name': name,
+                'size': size,
+                'partial': partial,
+                'digest': digest,
+                'quality': quality,
+                'protected': bool(protected),
+            }
+
+    def close(self):
+        self._conn.close()
+
+
+def open_shards(paths):
+    """Open shard files and check that they can be merged"""
+    readers = []
+    try:
+        for path in paths:
+            readers.append(ShardReader(path))
+        names = [reader.name for reader in readers]
+        if len(set(names)) != len(names):
+            raise ValueError(f"duplicate shard names: {sorted(names)}")
+        algorithms = {reader.meta['hash_algorithm'] for reader in readers}
+        if len(algorithms) > 1:
+            raise ValueError(f"shards were hashed with different engines: {sorted(algorithms)}")
+    except Exception:
+        for reader in readers:
+            reader.close()
+        raise
+    return readers
+
+
+def merge_groups(readers, order):
+    """Yield (key, [records]) for each digest or name across all shards.
+
+    The shards are already sorted, so this is a streaming k-way merge;
+    records with the same key from every shard come out together.
+    """
+    def key(record):
+        return (record[order], record['path'])
+
+    merged = heapq.merge(*(reader.records(order) for reader in readers), key=key)
+    for value, records in groupby(merged, key=lambda record: record[order]):
+        yield value, list(records)
+
+
+class PlanWriter:
+    """List-like sink that streams planned moves to a JSON-lines file"""
+
+    def __init__(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.count = 0
+        self.total_size = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def append(self, move):
+        self._file.write(json.dumps(move, ensure_ascii=False) + '\n')
+        self.count += 1
+        self.total_size += move['size']
+
+    def extend(self, moves):
+        for move in moves:
+            self.append(move)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._file.close()
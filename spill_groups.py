@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Disk-spilling duplicate groups for Duplicate Photo Finder.
+
+SpillingGroups maps a key (digest or lower-case name) to the list of
+record indices that share it, like the defaultdict(list) it replaces.
+While the estimated size of the table stays under its memory limit it
+is exactly that. Past the limit the buffered groups are appended to
+partition run files, chosen by a hash of the key, and the buffer starts
+over; reading the groups back then goes one partition at a time. A
+partition that is itself too large for the limit is split again with a
+different hash before it is loaded, so the memory used while resolving
+groups stays bounded whatever the library size.
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import weakref
+import zlib
+from array import array
+from collections import defaultdict
+
+PARTITIONS = 64  # Run files per spill directory (and per re-split)
+MAX_SPLITS = 4  # Re-split an oversized partition at most this many times
+
+# Rough CPython cost of the in-memory table, used to decide when to spill
+KEY_OVERHEAD = 160  # Dict slot, str object, list object
+VALUE_BYTES = 36  # int object and its list slot
+RUN_EXPANSION = 4  # Memory used per byte of run file once loaded
+
+_HEADER = struct.Struct('<HI')  # key length, value count
+
+
+def _partition(key, level, partitions):
+    """Stable partition number of a key (str hash is salted per process)"""
+    return zlib.crc32(key, level) % partitions
+
+
+def _write_group(f, key, values):
+    f.write(_HEADER.pack(len(key), len(values)))
+    f.write(key)
+    f.write(array('q', values).tobytes())
+
+
+def _read_groups(path):
+    """Yield (key bytes, values) records of a run file in write order"""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if not header:
+                return
+            key_length, count = _HEADER.unpack(header)
+            key = f.read(key_length)
+            values = array('q')
+            values.frombytes(f.read(count * 8))
+            yield key, values
+
+
+class SpillingGroups:
+    """key -> [record index] table with a memory ceiling.
+
+    memory_limit -- bytes the in-memory table may use (None: never spill)
+    spill_dir    -- where run files go (default: the system temp directory)
+    """
+
+    def __init__(self, memory_limit=None, spill_dir=None, partitions=PARTITIONS):
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self.partitions = partitions
+        self._buffer = defaultdict(list)
+        self._estimate = 0  # Bytes used by self._buffer, roughly
+        self._runs = None  # Directory of partition run files, once spilled
+        self.spills = 0
+        self.bytes_spilled = 0
+
+    @property
+    def spilled(self):
+        return self._runs is not None
+
+    def add(self, key, value):
+        """Append a record index to the group of key"""
+        group = self._buffer[key]
+        group.append(value)
+        if self.memory_limit is None:
+            return
+        self._estimate += VALUE_BYTES if len(group) > 1 else KEY_OVERHEAD + len(key) + VALUE_BYTES
+        if self._estimate > self.memory_limit:
+            self.spill()
+
+    def spill(self):
+        """Append the buffered groups to the partition run files"""
+        if not self._buffer:
+            return
+        if self._runs is None:
+            self._runs = tempfile.mkdtemp(prefix='duplicate_finder_groups_', dir=self.spill_dir)
+            self._cleanup = weakref.finalize(self, shutil.rmtree, self._runs, True)
+        by_partition = defaultdict(list)
+        for key, values in self._buffer.items():
+            key = key.encode('utf-8', 'surrogateescape')
+            by_partition[_partition(key, 0, self.partitions)].append((key, values))
+        for number, groups in by_partition.items():
+            path = os.path.join(self._runs, f"{number}.run")
+            with open(path, 'ab') as f:
+                for key, values in groups:
+                    _write_group(f, key, values)
+                self.bytes_spilled += f.tell()
+        self.spills += 1
+        self._buffer = defaultdict(list)
+        self._estimate = 0
+
+    def items(self):
+        """Yield (key, [indices]); after a spill, one partition at a time"""
+        if not self.spilled:
+            yield from self._buffer.items()
+            return
+        self.spill()  # Everything on disk, so each key lives in exactly one partition
+        for number in range(self.partitions):
+            path = os.path.join(self._runs, f"{number}.run")
+            if os.path.exists(path):
+                yield from self._resolve(path, 1)
+
+    def _resolve(self, path, level):
+        """Load one run file into groups, splitting it first if it is too large"""
+        if (self.memory_limit is not None and level <= MAX_SPLITS
+                and os.path.getsize(path) * RUN_EXPANSION > self.memory_limit):
+            parts = {}
+            try:
+                for key, values in _read_groups(path):
+                    number = _partition(key, level, self.partitions)
+                    if number not in parts:
+                        parts[number] = open(f"{path}.{number}", 'wb')
+                    _write_group(parts[number], key, values)
+            finally:
+                for f in parts.values():
+                    f.close()
+            # The run file itself is kept for the next pass over the groups
+            for number in sorted(parts):
+                part = f"{path}.{number}"
+                try:
+                    yield from self._resolve(part, level + 1)
+                finally:
+                    os.remove(part)
+            return
+        groups = defaultdict(list)
+        for key, values in _read_groups(path):
+            groups[key.decode('utf-8', 'surrogateescape')].extend(values)
+        yield from groups.items()
+
+    def values(self):
+        for _, values in self.items():
+            yield values
+
+    def keys(self):
+        for key, _ in self.items():
+            yield key
+
+    __iter__ = keys
+
+    def __getitem__(self, key):
+        if not self.spilled:
+            return self._buffer[key]  # defaultdict: a new group can be appended to
+        values = list(self._buffer.get(key, ()))
+        encoded = key.encode('utf-8', 'surrogateescape')
+        path = os.path.join(self._runs, f"{_partition(encoded, 0, self.partitions)}.run")
+        if os.path.exists(path):
+            found = [v for k, v in _read_groups(path) if k == encoded]
+            values = [value for run in found for value in run] + values
+        return values
+
+    def __contains__(self, key):
+        return bool(self[key]) if self.spilled else key in self._buffer
+
+    def __len__(self):
+        return sum(1 for _ in self.items()) if self.spilled else len(self._buffer)
+
+    def close(self):
+        """Remove the run files"""
+        if self._runs is not None:
+            self._cleanup()
+            self._runs = None
+        self._buffer = defaultdict(list)
+        self._estimate = 0
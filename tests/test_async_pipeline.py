@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the streaming (asyncio) pipeline
+"""
+
+import unittest
+import tempfile
+import shutil
+import asyncio
+import threading
+import os
+import sys
+from unittest import mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import async_pipeline
+from async_pipeline import StreamingPipeline
+from backup_methods import backup_file
+import duplicate_finder
+from duplicate_finder import DuplicateFinder, hash_file, partial_hash_file
+from instrumentation import Instrumentation
+
+
+class TestStreamingPipeline(unittest.TestCase):
+    """Test cases for StreamingPipeline and DuplicateFinder.stream_duplicates"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.test_dir, "photos")
+        self.write("a/same.jpg", b"identical")
+        self.write("b/same_copy.jpg", b"identical")
+        self.write("c/other.jpg", b"IDENTICAL")  # Same size, different content
+        self.write("d/unique.png", b"unique size")
+        self.write("protected/same.jpg", b"identical")
+        for folder in range(12):
+            self.write(f"many/{folder}/pair.jpg", b"pair %d" % (folder % 3))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, relative_path, content):
+        filepath = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        return filepath
+
+    def finder(self, **options):
+        finder = DuplicateFinder(events=Instrumentation(), **options)
+        finder.SCAN_ROOT = self.root
+        finder.PROTECTED_FOLDER = os.path.join(self.root, "protected")
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        return finder
+
+    def jobs(self, **overrides):
+        jobs = {'sample': partial_hash_file, 'hash': hash_file,
+                'probe': lambda path: None, 'copy': backup_file}
+        jobs.update(overrides)
+        return jobs
+
+    def collect(self, pipeline, limit=None):
+        async def consume():
+            results = []
+            async for result in pipeline.run():
+                results.append(result)
+                if len(results) == limit:
+                    break
+            return results
+        return asyncio.run(consume())
+
+    def test_same_backups_as_staged_run(self):
+        """Test that streaming backs up exactly the identical-content moves"""
+        staged = self.finder(workers=2)
+        staged.scan_files()
+        expected = {(move['duplicate'], move['original']) for move in staged.find_duplicates()
+                    if move['reason'] == 'identical content (hash)'}
+
+        streamed = self.finder(workers=2, backup_method='copy')
+        copied = streamed.stream_duplicates(queue_size=1)  # Every stage full all the time
+        self.assertEqual({(item['original_path'], item['kept_path']) for item in copied}, expected)
+        self.assertEqual(streamed.stats['duplicates_found'], staged.stats['duplicates_found'])
+        self.assertEqual(streamed.stats['files_moved'], len(expected))
+        self.assertEqual(streamed.stats['partial_unique'], staged.stats['partial_unique'])
+        self.assertEqual(streamed.stats['bytes_skipped'], len(b"unique size"))
+        for item in copied:
+            self.assertTrue(os.path.exists(item['backup_path']))
+        with open(os.path.join(streamed.REVIEW_FOLDER, "duplicate_report.txt"), encoding='utf-8') as f:
+            self.assertIn(os.path.join(self.root, "protected", "same.jpg"), f.read())
+
+    def test_later_protected_file_becomes_keeper(self):
+        """Test that a keeper chosen early is backed up once a protected twin arrives"""
+        finder = self.finder(backup_method='copy')
+        results = self.collect(StreamingPipeline(finder, self.jobs()))
+        backed_up = {result['duplicate'] for result in results if result['event'] == 'backed_up'}
+        self.assertIn(os.path.join(self.root, "a", "same.jpg"), backed_up)
+        self.assertIn(os.path.join(self.root, "b", "same_copy.jpg"), backed_up)
+        self.assertNotIn(os.path.join(self.root, "protected", "same.jpg"), backed_up)
+
+    def test_withdrawn_backup_is_removed(self):
+        """Test that a backup is undone when the ranking keeps the file after all"""
+        resolutions = {"same.jpg": (100, 100), "same_copy.jpg": (50, 50), "protected": (10, 10)}
+
+        def probe(path):
+            return resolutions["protected" if "protected" in path else os.path.basename(path)]
+
+        copied = threading.Event()
+
+        def copy(source, dest, method):
+            result = backup_file(source, dest, method)
+            copied.set()
+            return result
+
+        def gated_walk(*args, **kwargs):
+            # The protected twin only shows up after the first backup
+            for entry in async_pipeline_walk(*args, **kwargs):
+                if "protected" in entry[0]:
+                    copied.wait(5)
+                yield entry
+
+        async_pipeline_walk = async_pipeline.walk_files
+        finder = self.finder(backup_method='copy')
+        finder.exclude = ('*/many', '*/c', '*/d')
+        with mock.patch('async_pipeline.walk_files', gated_walk):
+            results = self.collect(StreamingPipeline(finder, self.jobs(probe=probe, copy=copy)))
+
+        copy_path = os.path.join(self.root, "b", "same_copy.jpg")
+        self.assertEqual([(result['event'], result['duplicate']) for result in results],
+                         [('backed_up', copy_path), ('withdrawn', copy_path)])
+        # Both unprotected files beat the protected one - nothing is moved in the end
+        self.assertFalse(os.path.exists(os.path.join(finder.REVIEW_FOLDER, "b", "same_copy.jpg")))
+        self.assertEqual(finder.stats['files_moved'], 0)
+        self.assertEqual(finder.stats['duplicates_found'], 2)
+
+    def test_decide_only(self):
+        """Test that backup=False yields decisions without touching the disk"""
+        finder = self.finder()
+        results = self.collect(StreamingPipeline(finder, self.jobs(), backup=False))
+        self.assertEqual({result['event'] for result in results}, {'duplicate'})
+        self.assertEqual(len(results), 11)  # 2 same.jpg + 3 x 3 pairs
+        self.assertFalse(os.path.exists(finder.REVIEW_FOLDER))
+
+    def test_move_is_rejected(self):
+        """Test that streaming never moves originals while rankings are provisional"""
+        finder = self.finder(backup_method='move')
+        with self.assertRaises(ValueError):
+            finder.stream_duplicates()
+        self.assertFalse(os.path.exists(finder.REVIEW_FOLDER))
+        with self.assertRaises(SystemExit), mock.patch('sys.stderr'):
+            duplicate_finder.parse_args(['--stream', '--backup', 'move'])
+
+    def test_consumer_can_stop_early(self):
+        """Test that leaving the loop stops the walk and the workers"""
+        finder = self.finder(workers=2)
+        results = self.collect(StreamingPipeline(finder, self.jobs(), queue_size=1, backup=False), limit=1)
+        self.assertEqual(len(results), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Unit tests for backup strategies
+"""
+
+import unittest
+import tempfile
+import shutil
+import errno
+import os
+import sys
+from unittest import mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import backup_methods
+from backup_methods import backup_file
+from duplicate_finder import DuplicateFinder
+from instrumentation import Instrumentation
+
+
+class TestBackupFile(unittest.TestCase):
+    """Test cases for backup_file"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.test_dir, "photos", "a.jpg")
+        os.makedirs(os.path.dirname(self.source))
+        with open(self.source, 'wb') as f:
+            f.write(b"photo bytes" * 1000)
+        os.utime(self.source, ns=(1_000_000_000, 1_000_000_000))
+        self.dest = os.path.join(self.test_dir, "review", "photos", "a.jpg")
+        backup_methods._unsupported.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def assertBackedUp(self):
+        with open(self.dest, 'rb') as f:
+            self.assertEqual(f.read(), b"photo bytes" * 1000)
+        self.assertFalse(os.path.exists(self.dest + '.part'))
+
+    def test_explicit_methods(self):
+        """Test that each copying method produces a full backup with its mtime"""
+        for method in ('copy_range', 'copy'):
+            self.assertEqual(backup_file(self.source, self.dest, method), (method, None))
+            self.assertBackedUp()
+            self.assertEqual(os.stat(self.dest).st_mtime_ns, 1_000_000_000)
+
+    def test_hardlink_shares_the_inode(self):
+        """Test that a hardlink backup is the same file"""
+        self.assertEqual(backup_file(self.source, self.dest, 'hardlink'), ('hardlink', None))
+        self.assertEqual(os.stat(self.dest).st_ino, os.stat(self.source).st_ino)
+
+    def test_move(self):
+        """Test that move mode leaves nothing behind"""
+        self.assertEqual(backup_file(self.source, self.dest, 'move'), ('move', None))
+        self.assertBackedUp()
+        self.assertFalse(os.path.exists(self.source))
+
+    def test_auto_falls_back(self):
+        """Test that auto skips what the filesystem cannot do and remembers it"""
+        unsupported = OSError(errno.EOPNOTSUPP, "no reflinks here")
+        failing = OSError(errno.EPERM, "protected_hardlinks: not the owner")
+        copiers = dict(backup_methods.COPIERS, reflink=mock.Mock(side_effect=unsupported),
+                       hardlink=mock.Mock(side_effect=failing))
+        with mock.patch.dict('backup_methods.COPIERS', copiers):
+            self.assertEqual(backup_file(self.source, self.dest), ('copy', None))
+            self.assertBackedUp()
+            backup_file(self.source, self.dest)
+        self.assertEqual(copiers['reflink'].call_count, 1)  # Not tried again on these devices
+        self.assertEqual(copiers['hardlink'].call_count, 2)  # A file error is not a filesystem limit
+
+    @unittest.skipUnless(hasattr(os, 'copy_file_range'), "needs os.copy_file_range")
+    def test_short_copy_range_fails(self):
+        """Test that copy_file_range stopping early is an error, not a short backup"""
+        with mock.patch('os.copy_file_range', return_value=0):
+            method, error = backup_file(self.source, self.dest, 'copy_range')
+        self.assertIsNone(method)
+        self.assertEqual(error.errno, errno.EIO)
+        self.assertFalse(os.path.exists(self.dest))
+        self.assertFalse(os.path.exists(self.dest + '.part'))
+
+    def test_short_backup_is_not_kept(self):
+        """Test that a backup smaller than its source is never renamed into place"""
+        def truncated(source, dest):
+            with open(dest, 'wb') as f:
+                f.write(b"photo")
+        with mock.patch.dict('backup_methods.COPIERS', copy=truncated):
+            method, error = backup_file(self.source, self.dest, 'copy')
+        self.assertIsNone(method)
+        self.assertEqual(error.errno, errno.EIO)
+        self.assertFalse(os.path.exists(self.dest))
+
+    def test_missing_source(self):
+        """Test that errors are returned, not raised"""
+        method, error = backup_file(os.path.join(self.test_dir, "gone.jpg"), self.dest)
+        self.assertIsNone(method)
+        self.assertIsInstance(error, OSError)
+
+
+class TestMoveDuplicates(unittest.TestCase):
+    """Test cases for move_duplicates with backup methods"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.test_dir, "photos")
+        for folder in "abcd":
+            filepath = os.path.join(self.root, folder, "same.jpg")
+            os.makedirs(os.path.dirname(filepath))
+            with open(filepath, 'wb') as f:
+                f.write(b"identical")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def move(self, **options):
+        finder = DuplicateFinder(events=Instrumentation(), **options)
+        finder.SCAN_ROOT = self.root
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        finder.scan_files()
+        return finder, finder.move_duplicates(finder.find_duplicates())
+
+    def test_parallel_backups_in_order(self):
+        """Test that concurrent backups are reported in plan order"""
+        finder, copied = self.move(workers=3, backup_method='copy')
+        self.assertEqual(len(copied), 3)
+        self.assertEqual([item['original_path'] for item in copied],
+                         sorted(item['original_path'] for item in copied))
+        self.assertEqual(finder.stats['backup_methods'], {'copy': 3})
+        self.assertEqual(finder.stats['space_saved'], 3 * len(b"identical"))
+        for item in copied:
+            self.assertTrue(os.path.exists(item['backup_path']))
+
+    def test_move_mode(self):
+        """Test that move mode takes the duplicates out of the scan root"""
+        finder, copied = self.move(backup_method='move')
+        self.assertEqual(len(copied), 3)
+        self.assertEqual(sum(os.path.exists(item['original_path']) for item in copied), 0)
+        self.assertEqual(len(os.listdir(self.root)), 4)  # Folders stay, one file kept
+        with open(os.path.join(finder.REVIEW_FOLDER, "duplicate_report.txt"), encoding='utf-8') as f:
+            self.assertIn("Duplicate (moved)", f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
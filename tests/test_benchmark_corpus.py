@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the benchmark corpus generator
+"""
+
+import unittest
+import tempfile
+import shutil
+import hashlib
+import os
+import sys
+
+# Add parent and benchmarks directories to path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from corpus import generate_corpus, RESOLUTIONS
+from duplicate_finder import DuplicateFinder
+from media_probe import probe_dimensions
+
+
+class TestCorpus(unittest.TestCase):
+    """Test cases for generate_corpus"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.test_dir = tempfile.mkdtemp()
+        
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.test_dir)
+    
+    def fingerprint(self, root):
+        """Helper returning {relative path: md5} for a folder"""
+        result = {}
+        for folder, _, files in os.walk(root):
+            for name in files:
+                path = os.path.join(folder, name)
+                with open(path, 'rb') as f:
+                    result[os.path.relpath(path, root)] = hashlib.md5(f.read()).hexdigest()
+        return result
+    
+    def test_reproducible(self):
+        """Test that the same seed produces the same corpus"""
+        first = os.path.join(self.test_dir, "first")
+        second = os.path.join(self.test_dir, "second")
+        generate_corpus(first, files=60, seed=7, median_size=2048)
+        generate_corpus(second, files=60, seed=7, median_size=2048)
+        self.assertEqual(self.fingerprint(first), self.fingerprint(second))
+    
+    def test_headers_and_duplicates(self):
+        """Test real headers and the expected number of identical copies"""
+        root = os.path.join(self.test_dir, "corpus")
+        manifest = generate_corpus(root, files=120, seed=3, median_size=4096)
+        self.assertEqual(manifest['files'], 120)
+        
+        finder = DuplicateFinder()
+        finder.SCAN_ROOT = root
+        finder.scan_files()
+        finder.find_duplicates()
+        self.assertEqual(finder.stats['total_scanned'], 120)
+        self.assertEqual(finder.stats['duplicates_found'], manifest['duplicates'])
+        
+        for index in range(len(finder.records)):
+            self.assertIn(probe_dimensions(finder.records.path(index)), RESOLUTIONS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Unit tests for lockstep byte comparison
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+from unittest import mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import byte_compare
+from byte_compare import compare_files
+from duplicate_finder import DuplicateFinder
+from instrumentation import Instrumentation
+
+
+class TestCompareFiles(unittest.TestCase):
+    """Test cases for compare_files"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, name, content):
+        filepath = os.path.join(self.test_dir, name)
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        return filepath
+
+    def test_groups_split_where_contents_diverge(self):
+        """Test early, late and no differences in one group"""
+        base = bytes(range(256)) * 1024
+        paths = [self.write("a", base), self.write("b", b"X" + base[1:]), self.write("c", base),
+                 self.write("d", base[:-1] + b"Y"), self.write("e", b"X" + base[1:])]
+        groups, errors, _ = compare_files(paths, block_size=byte_compare.MIN_BLOCK_SIZE)
+        self.assertEqual(groups, [[0, 2], [1, 4]])
+        self.assertEqual(errors, {})
+
+    def test_stops_once_all_differ(self):
+        """Test that files differing in the first block are not read further"""
+        size = 4 * 1024 * 1024
+        paths = [self.write(name, bytes([value]) * size) for name, value in (("a", 1), ("b", 2), ("c", 3))]
+        groups, _, bytes_read = compare_files(paths, block_size=byte_compare.MIN_BLOCK_SIZE)
+        self.assertEqual(groups, [])
+        self.assertEqual(bytes_read, 3 * byte_compare.MIN_BLOCK_SIZE)
+
+    def test_large_groups_reopen_files(self):
+        """Test that groups over MAX_OPEN give the same answer"""
+        paths = [self.write(str(i), b"same" * 40000 if i % 2 else b"diff" * 40000) for i in range(6)]
+        with mock.patch('byte_compare.MAX_OPEN', 2):
+            groups, _, _ = compare_files(paths, block_size=byte_compare.MIN_BLOCK_SIZE)
+        self.assertEqual(groups, [[0, 2, 4], [1, 3, 5]])
+
+    def test_unreadable_file(self):
+        """Test that an unreadable member is reported and left out"""
+        paths = [self.write("a", b"abc"), os.path.join(self.test_dir, "missing"), self.write("b", b"abc")]
+        groups, errors, _ = compare_files(paths)
+        self.assertEqual(groups, [[0, 2]])
+        self.assertEqual(list(errors), [1])
+
+
+class TestFinderByteCompare(unittest.TestCase):
+    """Test cases for DuplicateFinder(compare='bytes') and verify_delete"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.test_dir, "photos")
+        for relative_path, content in [("a/one.jpg", b"same content"), ("b/one_copy.jpg", b"same content"),
+                                       ("c/other.jpg", b"SAME CONTENT"), ("d/two.png", b"unique")]:
+            filepath = os.path.join(self.root, relative_path)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            with open(filepath, 'wb') as f:
+                f.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def finder(self, **options):
+        finder = DuplicateFinder(events=Instrumentation(), **options)
+        finder.SCAN_ROOT = self.root
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        return finder
+
+    def test_same_groups_without_hashing(self):
+        """Test that byte comparison finds the hash groups without digests"""
+        compared, hashed = self.finder(compare='bytes'), self.finder()
+        compared.scan_files()
+        hashed.scan_files()
+        self.assertEqual(compared._path_groups(compared.file_hashes), hashed._path_groups(hashed.file_hashes))
+        self.assertEqual(compared.stats['files_hashed'], 0)
+        self.assertEqual(compared.stats['files_compared'], 2)  # other.jpg ruled out by its signature
+        self.assertGreater(compared.stats['bytes_compared'], 0)
+
+    def test_verify_delete_refuses_changed_files(self):
+        """Test that a duplicate changed after its backup is not deleted"""
+        finder = self.finder(verify_delete=True)
+        finder.scan_files()
+        copied = finder.move_duplicates(finder.find_duplicates())
+        self.assertEqual(len(copied), 1)
+        duplicate = copied[0]['original_path']
+        with open(duplicate, 'wb') as f:
+            f.write(b"edited since")  # Same size, different content
+
+        with mock.patch('builtins.input', side_effect=['yes', 'DELETE']):
+            finder.delete_originals(copied)
+        self.assertTrue(os.path.exists(duplicate))
+        self.assertEqual(finder.stats['delete_unconfirmed'], 1)
+
+    def test_verify_delete_allows_identical_files(self):
+        """Test that verified duplicates are deleted"""
+        finder = self.finder(verify_delete=True)
+        finder.scan_files()
+        copied = finder.move_duplicates(finder.find_duplicates())
+        with mock.patch('builtins.input', side_effect=['yes', 'DELETE']):
+            finder.delete_originals(copied)
+        self.assertFalse(os.path.exists(copied[0]['original_path']))
+        self.assertEqual(finder.stats['delete_verified'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
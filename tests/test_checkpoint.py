@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Unit tests for scan checkpoints and --resume
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+from unittest import mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import duplicate_finder
+from checkpoint import Checkpointer, load_checkpoint, save_checkpoint
+from duplicate_finder import DuplicateFinder
+from instrumentation import Instrumentation
+
+
+class TestCheckpointFile(unittest.TestCase):
+    """Test cases for checkpoint files"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "checkpoint.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_round_trip(self):
+        """Test that a saved state loads back and no temporary file is left"""
+        save_checkpoint(self.path, {'frontier': ['/a', '/b'], 'progress': {'digest': {3: 'abc'}}})
+        state = load_checkpoint(self.path)
+        self.assertEqual(state['frontier'], ['/a', '/b'])
+        self.assertEqual(state['progress'], {'digest': {3: 'abc'}})
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_corrupt_or_missing(self):
+        """Test that unusable checkpoints are ignored"""
+        self.assertIsNone(load_checkpoint(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(b"truncated")
+        self.assertIsNone(load_checkpoint(self.path))
+
+    def test_overhead_is_bounded(self):
+        """Test that a slow write postpones the next checkpoint"""
+        checkpointer = Checkpointer(self.path, interval=0.001, max_overhead=0.5)
+        with mock.patch('checkpoint.save_checkpoint', side_effect=lambda path, state: 10):
+            with mock.patch('checkpoint.time.monotonic', side_effect=[100.0, 102.0, 102.0]):
+                checkpointer.save({})
+        # 2 seconds spent writing at 50% max overhead -> next one 4 seconds later
+        self.assertEqual(checkpointer._next, 106.0)
+        self.assertFalse(Checkpointer(self.path, interval=0).due())
+
+
+class TestResume(unittest.TestCase):
+    """Test cases for interrupted and resumed scans"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.test_dir, "photos")
+        self.checkpoint = os.path.join(self.test_dir, "checkpoint.bin")
+        for folder in "abcd":
+            for name, content in [("same.jpg", b"identical"), (f"{folder}.jpg", folder.encode() * 9)]:
+                path = os.path.join(self.root, folder, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def finder(self, **options):
+        options.setdefault('checkpoint_path', self.checkpoint)
+        finder = DuplicateFinder(checkpoint_interval=1e-9, events=Instrumentation(), **options)
+        finder.SCAN_ROOT = self.root
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        if finder.checkpointer:
+            finder.checkpointer.max_overhead = float('inf')  # Checkpoint at every opportunity
+        return finder
+
+    def groups(self, finder):
+        return (finder._path_groups(finder.file_hashes), finder._path_groups(finder.file_names))
+
+    def test_resume_interrupted_walk(self):
+        """Test that a resumed walk neither misses nor repeats folders"""
+        finder = self.finder()
+        original = finder._walk_checkpoint
+        calls = []
+
+        def interrupt_after_two(frontier):
+            original(frontier)
+            calls.append(frontier)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+
+        finder._walk_checkpoint = interrupt_after_two
+        with self.assertRaises(KeyboardInterrupt):
+            finder.scan_files()
+        self.assertTrue(os.path.exists(self.checkpoint))
+
+        resumed = self.finder(resume=True)
+        resumed.scan_files()
+        reference = self.finder(checkpoint_path=None)
+        reference.scan_files()
+        self.assertEqual(len(resumed.records), 8)
+        self.assertEqual(resumed.stats['total_scanned'], 8)
+        self.assertEqual(self.groups(resumed), self.groups(reference))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resume_does_not_rehash(self):
+        """Test that files hashed before the interruption are not hashed again"""
+        hashed = []
+        real_hash_file = duplicate_finder.hash_file
+
+        def interrupting_hash_file(filepath, algorithm='md5'):
+            if len(hashed) == 2:
+                raise KeyboardInterrupt
+            hashed.append(filepath)
+            return real_hash_file(filepath, algorithm)
+
+        with mock.patch('duplicate_finder.hash_file', interrupting_hash_file):
+            with self.assertRaises(KeyboardInterrupt):
+                self.finder().scan_files()
+
+        first_run = list(hashed)
+        with mock.patch('duplicate_finder.hash_file', lambda *args: hashed.append(args[0]) or real_hash_file(*args)):
+            resumed = self.finder(resume=True)
+            resumed.scan_files()
+
+        self.assertEqual(len(first_run), 2)
+        self.assertEqual(sorted(hashed[2:]), sorted(set(hashed[2:]) - set(first_run)))
+        self.assertEqual(len(hashed), 4)  # The four same.jpg copies, each hashed once
+        self.assertEqual(len(resumed._path_groups(resumed.file_hashes)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
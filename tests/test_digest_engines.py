@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the pluggable digest engines
+"""
+
+import unittest
+import tempfile
+import shutil
+import hashlib
+import os
+import sys
+from unittest import mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import digest_engines
+from digest_engines import digest_file, get_engine, available_engines
+from duplicate_finder import DuplicateFinder
+
+
+class TestDigestEngines(unittest.TestCase):
+    """Test cases for digest engines"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.test_dir = tempfile.mkdtemp()
+        self.content = os.urandom(3 * 1024 * 1024 + 17)
+        self.filepath = os.path.join(self.test_dir, "video.mp4")
+        with open(self.filepath, 'wb') as f:
+            f.write(self.content)
+        
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.test_dir)
+    
+    def test_hashlib_engines_match_hashlib(self):
+        """Test that buffered reads produce the plain hashlib digest"""
+        for name in ('md5', 'sha256', 'blake2b'):
+            self.assertIn(name, available_engines())
+            expected = hashlib.new(name, self.content).hexdigest()
+            self.assertEqual(digest_file(self.filepath, name), expected)
+    
+    def test_mmap_path_matches_buffered_path(self):
+        """Test that large files hashed through mmap give the same digest"""
+        buffered = digest_file(self.filepath, 'blake2b')
+        threshold = digest_engines.MMAP_THRESHOLD
+        digest_engines.MMAP_THRESHOLD = 1024
+        try:
+            with mock.patch('digest_engines.mmap.mmap', side_effect=AssertionError("mapped")):
+                self.assertEqual(digest_file(self.filepath, 'blake2b'), buffered)  # Opt-in only
+            self.assertEqual(digest_file(self.filepath, 'blake2b', use_mmap=True), buffered)
+        finally:
+            digest_engines.MMAP_THRESHOLD = threshold
+    
+    def test_unknown_engine(self):
+        """Test that unknown engines are rejected"""
+        with self.assertRaises(ValueError):
+            get_engine('crc1')
+        with self.assertRaises(ValueError):
+            DuplicateFinder(hash_algorithm='crc1')
+    
+    def test_cache_does_not_mix_engines(self):
+        """Test that digests cached by one engine are not reused by another"""
+        shutil.copy(self.filepath, os.path.join(self.test_dir, "copy.mp4"))
+        cache_path = os.path.join(self.test_dir, "cache", "cache.sqlite")
+        
+        digests = []
+        for algorithm in ('md5', 'sha256'):
+            finder = DuplicateFinder(cache_path=cache_path, hash_algorithm=algorithm)
+            finder.SCAN_ROOT = self.test_dir
+            finder.scan_files()
+            finder.cache.close()
+            self.assertEqual(finder.stats['files_hashed'], 2)
+            digests.append(list(finder.file_hashes))
+        
+        self.assertEqual(digests[0], [hashlib.md5(self.content).hexdigest()])
+        self.assertEqual(digests[1], [hashlib.sha256(self.content).hexdigest()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -111,6 +111,186 @@ class TestDuplicateFinder(unittest.TestCase):
         self.assertEqual(len(duplicates), 1)
         self.assertIn('identical content', duplicates[0]['reason'])
     
+    def test_size_prefilter_skips_unique_sizes(self):
+        """Test that files with a unique size are never hashed"""
+        self.create_test_file("a/image.jpg", b"same bytes")
+        self.create_test_file("b/copy.jpg", b"same bytes")
+        self.create_test_file("c/other.jpg", b"a much longer unique file")
+        self.finder.SCAN_ROOT = self.test_dir
+        
+        self.finder.scan_files()
+        
+        self.assertEqual(self.finder.stats['total_scanned'], 3)
+        self.assertEqual(self.finder.stats['files_hashed'], 2)
+        self.assertEqual(self.finder.stats['bytes_skipped'], len(b"a much longer unique file"))
+        self.assertEqual(len(self.finder.find_duplicates()), 1)
+    
+    def test_size_prefilter_matches_full_scan(self):
+        """Test that the size prefilter produces the same duplicate groups"""
+        self.create_test_file("a/one.jpg", b"AAAA")
+        self.create_test_file("b/two.jpg", b"AAAA")
+        self.create_test_file("c/three.jpg", b"BBBB")
+        self.create_test_file("d/one.jpg", b"CCCCCC")
+        
+        groups = []
+        for prefilter in (True, False):
+            finder = DuplicateFinder(size_prefilter=prefilter)
+            finder.SCAN_ROOT = self.test_dir
+            finder.scan_files()
+            groups.append(sorted(
+                sorted(finder.records.path(i) for i in files)
+                for files in finder.file_hashes.values() if len(files) > 1
+            ))
+        
+        self.assertEqual(groups[0], groups[1])
+        self.assertEqual(len(groups[0]), 1)
+    
+    def test_partial_hash_rules_out_different_heads(self):
+        """Test that same-size files with different heads skip the full hash"""
+        self.create_test_file("a/one.jpg", b"HEAD-A" + b"x" * 100)
+        self.create_test_file("b/two.jpg", b"HEAD-B" + b"x" * 100)
+        self.finder.SCAN_ROOT = self.test_dir
+        self.finder.PARTIAL_HASH_SIZE = 8
+        
+        self.finder.scan_files()
+        
+        self.assertEqual(self.finder.stats['partial_hashed'], 2)
+        self.assertEqual(self.finder.stats['partial_unique'], 2)
+        self.assertEqual(self.finder.stats['files_hashed'], 0)
+        self.assertEqual(self.finder.find_duplicates(), [])
+    
+    def test_partial_hash_collision_confirmed_by_full_hash(self):
+        """Test that matching head/tail signatures still need identical content"""
+        self.create_test_file("a/one.jpg", b"HEAD" + b"1" * 50 + b"TAIL")
+        self.create_test_file("b/two.jpg", b"HEAD" + b"2" * 50 + b"TAIL")
+        self.create_test_file("c/three.jpg", b"HEAD" + b"1" * 50 + b"TAIL")
+        self.finder.SCAN_ROOT = self.test_dir
+        self.finder.PARTIAL_HASH_SIZE = 4
+        
+        self.finder.scan_files()
+        
+        self.assertEqual(self.finder.stats['partial_unique'], 0)
+        self.assertEqual(self.finder.stats['files_hashed'], 3)
+        groups = [files for files in self.finder.file_hashes.values() if len(files) > 1]
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(sorted(self.finder.records.names[i] for i in groups[0]),
+                         ['one.jpg', 'three.jpg'])
+    
+    def test_parallel_scan_matches_serial(self):
+        """Test that worker pools produce identical groups in identical order"""
+        for i in range(6):
+            self.create_test_file(f"dir{i}/photo.jpg", b"same" * (i % 2 + 1))
+            self.create_test_file(f"dir{i}/unique{i}.jpg", b"u" * (20 + i))
+        
+        results = []
+        for workers, executor in ((1, 'thread'), (4, 'thread'), (2, 'process')):
+            finder = DuplicateFinder(workers=workers, executor=executor)
+            finder.SCAN_ROOT = self.test_dir
+            finder.scan_files()
+            results.append((
+                [[finder.records.path(i) for i in files] for files in finder.file_hashes.values()],
+                finder.find_duplicates(),
+                finder.stats['files_hashed']
+            ))
+        
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+    
+    def test_unknown_executor(self):
+        """Test that an unknown pool type is rejected"""
+        with self.assertRaises(ValueError):
+            DuplicateFinder(executor='gpu')
+    
+    def test_quality_evaluated_only_for_grouped_files(self):
+        """Test that files outside any group are never probed"""
+        self.create_test_file("a/photo.jpg", b"same content")
+        self.create_test_file("b/photo.jpg", b"same content")
+        self.create_test_file("c/lonely.jpg", b"nobody else has this")
+        self.finder.SCAN_ROOT = self.test_dir
+        
+        self.finder.scan_files()
+        self.assertEqual(self.finder.stats['quality_probed'], 0)
+        
+        self.finder.find_duplicates()
+        
+        # The two copies share a hash group and a name group but are probed once
+        self.assertEqual(self.finder.stats['quality_probed'], 2)
+        self.assertEqual(self.finder.stats['quality_probes_avoided'], 1)
+        self.assertIsNone(self.finder.records.quality(self.finder.file_names['lonely.jpg'][0]))
+    
+    def test_similar_images_grouped_by_perceptual_hash(self):
+        """Test that a resized copy is found and the larger original is kept"""
+        from PIL import Image, ImageDraw
+        img = Image.new('RGB', (800, 600), (30, 60, 90))
+        draw = ImageDraw.Draw(img)
+        draw.ellipse([100, 100, 500, 400], fill=(250, 220, 10))
+        draw.rectangle([450, 50, 750, 550], fill=(200, 30, 30))
+        os.makedirs(os.path.join(self.test_dir, "a"))
+        os.makedirs(os.path.join(self.test_dir, "b"))
+        original = os.path.join(self.test_dir, "a", "original.jpg")
+        resized = os.path.join(self.test_dir, "b", "small.jpg")
+        img.save(original, quality=95)
+        img.resize((200, 150)).save(resized, quality=70)
+        Image.new('RGB', (800, 600), (0, 200, 0)).save(os.path.join(self.test_dir, "a", "green.png"))
+        
+        self.finder.similar = True
+        self.finder.SCAN_ROOT = self.test_dir
+        self.finder.scan_files()
+        files_to_move = self.finder.find_duplicates()
+        
+        self.assertEqual(self.finder.stats['perceptual_hashed'], 3)
+        self.assertEqual(self.finder.stats['duplicates_similar'], 1)
+        self.assertEqual([(m['original'], m['duplicate']) for m in files_to_move], [(original, resized)])
+        self.assertTrue(files_to_move[0]['reason'].startswith('similar image'))
+    
+    def test_hardlinks_read_once_and_not_duplicates(self):
+        """Test that another name of the kept file is neither re-read nor moved"""
+        original = self.create_test_file("a/photo.jpg", b"same content")
+        os.makedirs(os.path.join(self.test_dir, "b"))
+        os.link(original, os.path.join(self.test_dir, "b", "photo_link.jpg"))
+        copy = self.create_test_file("c/copy.jpg", b"same content")
+        self.finder.SCAN_ROOT = self.test_dir
+        
+        self.finder.scan_files()
+        self.assertEqual(self.finder.stats['files_hashed'], 2)
+        self.assertEqual(self.finder.stats['hardlink_reads_avoided'], 1)
+        
+        files_to_move = self.finder.find_duplicates()
+        self.assertEqual([(m['original'], m['duplicate']) for m in files_to_move], [(original, copy)])
+        self.assertEqual(self.finder.stats['duplicates_found'], 1)
+        self.assertEqual(self.finder.stats['hardlink_aliases'], 1)
+    
+    def test_hardlinks_of_a_unique_size_are_not_read(self):
+        """Test that two names of one file do not make a shared size"""
+        solo = self.create_test_file("a/solo.jpg", b"only one file")
+        os.makedirs(os.path.join(self.test_dir, "b"))
+        os.link(solo, os.path.join(self.test_dir, "b", "solo_link.jpg"))
+        self.finder.SCAN_ROOT = self.test_dir
+        
+        self.finder.scan_files()
+        self.assertEqual(self.finder.stats['partial_hashed'], 0)
+        self.assertEqual(self.finder.stats['files_hashed'], 0)
+        self.assertEqual(self.finder.find_duplicates(), [])
+    
+    def test_space_saved_counts_reclaimable_bytes(self):
+        """Test that a duplicate with several names is freed by its last name only"""
+        content = b"x" * 1000
+        self.create_test_file("keep/photo.jpg", content)
+        first = self.create_test_file("dup/one.jpg", content)
+        os.link(first, os.path.join(self.test_dir, "dup", "two.jpg"))
+        outside = self.create_test_file("elsewhere/shared.jpg", content)
+        os.link(outside, os.path.join(self.test_dir, "dup", "three.jpg"))
+        self.finder.SCAN_ROOT = self.test_dir
+        self.finder.PROTECTED_FOLDER = os.path.join(self.test_dir, "keep")
+        self.finder.exclude = ('*/elsewhere',)  # Its other name is outside the scan
+        
+        self.finder.scan_files()
+        files_to_move = self.finder.find_duplicates()
+        sizes = {os.path.basename(m['duplicate']): m['size'] for m in files_to_move}
+        self.assertEqual(set(sizes), {'one.jpg', 'two.jpg', 'three.jpg'})
+        self.assertEqual(sizes['one.jpg'] + sizes['two.jpg'], 1000)
+        self.assertEqual(sizes['three.jpg'], 0)
+    
     def test_stats_initialization(self):
         """Test that stats are properly initialized"""
         self.assertEqual(self.finder.stats['total_scanned'], 0)
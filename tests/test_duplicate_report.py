@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the JSON-lines duplicate report
+"""
+
+import unittest
+import tempfile
+import shutil
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+from unittest import mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import duplicate_finder
+from duplicate_finder import DuplicateFinder
+from duplicate_report import REPORT_FILENAME, ReportWriter, backups, pending_deletions, read_records, render_text
+from instrumentation import Instrumentation
+
+
+class TestReportRecords(unittest.TestCase):
+    """Test cases for reading a report back"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, REPORT_FILENAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def backup(self, report, group, keeper, duplicate, method='copy'):
+        report.write('backup', group=group, keeper=keeper, duplicate=duplicate, reason='identical content (hash)',
+                     size=10, digest='d%d' % group, backup_path='/review' + duplicate, method=method)
+
+    def test_later_records_win(self):
+        """Test that keeper, withdrawn and deleted records apply to the backups before them"""
+        with ReportWriter(self.path) as report:
+            self.backup(report, 1, '/a/x.jpg', '/b/x.jpg')
+            self.backup(report, 1, '/a/x.jpg', '/c/x.jpg')
+            report.write('keeper', group=1, keeper='/p/x.jpg')
+            self.backup(report, 1, '/p/x.jpg', '/a/x.jpg')
+            report.write('withdrawn', duplicate='/c/x.jpg')
+            report.write('withdrawn', duplicate='/d/y.jpg')
+            self.backup(report, 2, '/a/y.jpg', '/d/y.jpg')  # Wanted again after its withdrawal
+            self.backup(report, 3, '/a/z.jpg', '/e/z.jpg', method='move')
+            report.write('deleted', duplicate='/b/x.jpg', size=10)
+
+        standing = [(item['duplicate'], item['keeper'], item['deleted']) for item in backups(self.path)]
+        self.assertEqual(standing, [('/b/x.jpg', '/p/x.jpg', True), ('/a/x.jpg', '/p/x.jpg', False),
+                                    ('/d/y.jpg', '/a/y.jpg', False), ('/e/z.jpg', '/a/z.jpg', False)])
+        self.assertEqual([item['duplicate'] for item in pending_deletions(self.path)], ['/a/x.jpg', '/d/y.jpg'])
+
+    def test_torn_last_line(self):
+        """Test that a record cut off by a crash is skipped"""
+        with ReportWriter(self.path) as report:
+            self.backup(report, 1, '/a/x.jpg', '/b/x.jpg')
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"type": "backup", "group": 2, "kee')
+        self.assertEqual(len(list(read_records(self.path))), 1)
+        with open(render_text(self.path), encoding='utf-8') as f:
+            text = f.read()
+        self.assertIn("DUPLICATE #1 (group 1)", text)
+        self.assertNotIn("DUPLICATE #2", text)
+
+
+class TestFinderReport(unittest.TestCase):
+    """Test cases for the report written by DuplicateFinder"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.test_dir, "photos")
+        self.review = os.path.join(self.test_dir, "review")
+        for folder in ("a", "b", "c", "d"):
+            os.makedirs(os.path.join(self.root, folder))
+            with open(os.path.join(self.root, folder, "same.jpg"), 'wb') as f:
+                f.write(b"identical")
+        self.report = os.path.join(self.review, REPORT_FILENAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def finder(self, **options):
+        finder = DuplicateFinder(events=Instrumentation(), **options)
+        finder.SCAN_ROOT = self.root
+        finder.REVIEW_FOLDER = self.review
+        return finder
+
+    def backed_up(self):
+        finder = self.finder(backup_method='copy')
+        finder.scan_files()
+        return finder.move_duplicates(finder.find_duplicates())
+
+    def test_backups_are_recorded(self):
+        """Test that every backup is in the JSON-lines report and the text rendered from it"""
+        copied = self.backed_up()
+        records = [record for _, record in read_records(self.report)]
+        self.assertEqual([record['type'] for record in records], ['run', 'backup', 'backup', 'backup'])
+        self.assertEqual({record['group'] for record in records[1:]}, {1})
+        self.assertEqual([record['duplicate'] for record in records[1:]],
+                         [item['original_path'] for item in copied])
+        self.assertTrue(all(record['digest'] for record in records[1:]))
+        with open(os.path.join(self.review, "duplicate_report.txt"), encoding='utf-8') as f:
+            text = f.read()
+        self.assertEqual(text.count("Duplicate (copied)"), 3)
+        self.assertIn(f"Digest: {records[1]['digest']}", text)
+
+    def test_second_run_appends(self):
+        """Test that a second backup run keeps the first on record and replaces its backups"""
+        self.backed_up()
+        again = self.backed_up()
+        records = [record for _, record in read_records(self.report)]
+        self.assertEqual([record['type'] for record in records].count('run'), 2)
+        pending = list(pending_deletions(self.report))
+        self.assertEqual([(item['duplicate'], item['backup_path'], item['run']) for item in pending],
+                         [(item['original_path'], item['backup_path'], 2) for item in again])
+        with open(os.path.join(self.review, "duplicate_report.txt"), encoding='utf-8') as f:
+            self.assertEqual(f.read().count("(group 1 of run 2)"), 3)
+
+    def test_delete_in_batches_without_scanning(self):
+        """Test that a later run deletes from the report and records what it deleted"""
+        copied = self.backed_up()
+        os.remove(copied[1]['backup_path'])  # Reviewed and thrown away - keep its original
+
+        finder = self.finder()
+        with mock.patch('builtins.input', side_effect=['yes', 'DELETE']):
+            finder.delete_from_report(self.report, batch_size=1)
+        remaining = [os.path.exists(item['original_path']) for item in copied]
+        self.assertEqual(remaining, [False, True, False])
+        self.assertEqual(finder.stats['total_scanned'], 0)
+        self.assertEqual(finder.stats['delete_unconfirmed'], 1)
+        self.assertEqual([item['duplicate'] for item in pending_deletions(self.report)],
+                         [copied[1]['original_path']])
+        with open(os.path.join(self.review, "duplicate_report.txt"), encoding='utf-8') as f:
+            self.assertEqual(f.read().count("Duplicate (deleted)"), 2)
+
+    def test_cli(self):
+        """Test --delete-from-report with the verified deletion path"""
+        copied = self.backed_up()
+        with mock.patch('builtins.input', side_effect=['yes', 'DELETE']), redirect_stdout(io.StringIO()):
+            duplicate_finder.main(['--delete-from-report', self.report, '--delete-batch', '2', '--verify-delete'])
+        self.assertEqual(sum(os.path.exists(item['original_path']) for item in copied), 0)
+
+        with mock.patch('builtins.input') as asked, redirect_stdout(io.StringIO()) as output:
+            duplicate_finder.main(['--delete-from-report', self.report])
+        asked.assert_not_called()  # Nothing left to delete
+        self.assertIn("0 originals still to delete", output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the scandir-based directory walker
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+import time
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from unittest import mock
+
+import file_walker
+from file_walker import walk_files
+from duplicate_finder import DuplicateFinder
+
+
+class TestFileWalker(unittest.TestCase):
+    """Test cases for walk_files"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.test_dir = tempfile.mkdtemp()
+        for path in ("a/1.jpg", "a/b/2.JPG", "a/b/c/3.png", "a/notes.txt",
+                     "d/4.mp4", "d/e/5.heic", "review/6.jpg", "tmp/7.jpg"):
+            self.create_test_file(path, path.encode())
+        
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.test_dir)
+    
+    def create_test_file(self, filename, content):
+        """Helper to create test files"""
+        filepath = os.path.join(self.test_dir, filename)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        return filepath
+    
+    def relative(self, entries):
+        """Helper returning walked paths relative to the test folder"""
+        return [os.path.relpath(entry.path, self.test_dir).replace(os.sep, '/') for entry in entries]
+    
+    def test_depth_first_sorted_order(self):
+        """Test that files are yielded depth-first in name order"""
+        entries = list(walk_files(self.test_dir, {'.jpg', '.png', '.mp4', '.heic'}))
+        self.assertEqual(self.relative(entries), [
+            "a/1.jpg", "a/b/2.JPG", "a/b/c/3.png", "d/4.mp4", "d/e/5.heic",
+            "review/6.jpg", "tmp/7.jpg"])
+    
+    def test_parallel_walk_matches_serial(self):
+        """Test that listing directories in threads does not change the order"""
+        serial = list(walk_files(self.test_dir))
+        parallel = list(walk_files(self.test_dir, workers=4))
+        self.assertEqual(serial, parallel)
+    
+    def test_parallel_walk_lists_at_most_max_pending_ahead(self):
+        """Test that a bounded parallel walk lists few directories ahead, in the same order"""
+        for folder in range(20):
+            self.create_test_file(f"wide/{folder:02d}/x.jpg", b"x")
+        listed = []
+        real_list_directory = file_walker.list_directory
+        def list_directory(path, *args):
+            listed.append(path)
+            return real_list_directory(path, *args)
+        
+        with mock.patch('file_walker.list_directory', side_effect=list_directory):
+            walker = walk_files(self.test_dir, workers=4, max_pending=2)
+            first = next(walker)
+            self.assertLessEqual(len(listed), 3)  # The root, then a and d ahead
+            entries = [first] + list(walker)
+        self.assertEqual(entries, list(walk_files(self.test_dir)))
+    
+    def test_stat_is_reused(self):
+        """Test that entries carry their stat result"""
+        for entry in walk_files(self.test_dir, {'.mp4'}):
+            self.assertEqual(entry.stat.st_size, os.path.getsize(entry.path))
+            self.assertEqual(entry.name, "4.mp4")
+    
+    def test_prune_and_exclude(self):
+        """Test pruning of the review folder and exclude globs"""
+        entries = walk_files(self.test_dir, {'.jpg'},
+                             exclude=['tmp', '*/b/*'],
+                             prune=[os.path.join(self.test_dir, "review")])
+        self.assertEqual(self.relative(entries), ["a/1.jpg"])
+    
+    def age_directories(self, seconds=3600):
+        """Backdate every directory mtime, as if the tree was last changed long ago"""
+        past = time.time_ns() - seconds * 10 ** 9
+        for folder, _, _ in os.walk(self.test_dir):
+            os.utime(folder, ns=(past, past))
+    
+    def test_unchanged_directories_not_listed_again(self):
+        """Test that known listings are reused while the directory mtime is unchanged"""
+        self.age_directories()
+        listings = {}
+        first = list(walk_files(self.test_dir, {'.jpg'}, listings=listings))
+        
+        with mock.patch.object(file_walker, 'list_directory', wraps=file_walker.list_directory) as lister:
+            self.create_test_file("d/8.jpg", b"new")  # Only d/ changes
+            second = list(walk_files(self.test_dir, {'.jpg'}, known_listings=listings, listings={}))
+        
+        self.assertEqual(self.relative(second), self.relative(first)[:2] + ["d/8.jpg"] + self.relative(first)[2:])
+        self.assertEqual([call.args[0] for call in lister.call_args_list], [os.path.join(self.test_dir, "d")])
+    
+    def test_racy_listings_not_reused(self):
+        """Test that a directory changed within the mtime granularity is listed again"""
+        self.age_directories()
+        racy = os.path.join(self.test_dir, "a", "b")
+        os.utime(racy)  # Changed just now: it may change again without its mtime moving
+        listings = {}
+        list(walk_files(self.test_dir, {'.jpg'}, listings=listings))
+        self.assertIsNone(listings[racy][0])
+        
+        with mock.patch.object(file_walker, 'list_directory', wraps=file_walker.list_directory) as lister:
+            list(walk_files(self.test_dir, {'.jpg'}, known_listings=listings, listings={}))
+        self.assertEqual([call.args[0] for call in lister.call_args_list], [racy])
+    
+    def test_unreadable_root_reported(self):
+        """Test that listing errors go to onerror"""
+        errors = []
+        missing = os.path.join(self.test_dir, "missing")
+        self.assertEqual(list(walk_files(missing, onerror=lambda p, e: errors.append(p))), [])
+        self.assertEqual(errors, [missing])
+    
+    def test_scan_skips_review_folder(self):
+        """Test that a review folder inside the scan root is not rescanned"""
+        finder = DuplicateFinder()
+        finder.SCAN_ROOT = self.test_dir
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        finder.scan_files()
+        self.assertNotIn("6.jpg", finder.file_names)
+        self.assertEqual(finder.stats['total_scanned'], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Unit tests for stage timers and progress events
+"""
+
+import unittest
+import os
+import sys
+import json
+import tempfile
+import shutil
+from contextlib import redirect_stdout
+from io import StringIO
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from instrumentation import Instrumentation, ConsoleSink, JsonLinesSink, timed_call
+from duplicate_finder import DuplicateFinder
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Test cases for Instrumentation class"""
+
+    def setUp(self):
+        self.records = []
+        self.events = Instrumentation([self.records.append], slowest=2)
+
+    def test_emit(self):
+        """Test that events reach every sink with their fields"""
+        self.events.emit('scan_done', scanned=3)
+        self.assertEqual(self.records[0]['event'], 'scan_done')
+        self.assertEqual(self.records[0]['scanned'], 3)
+        self.assertIn('time', self.records[0])
+
+    def test_stage_counters(self):
+        """Test that a stage reports the files and bytes counted inside it"""
+        with self.events.stage('hash'):
+            self.events.count('hash', files=2, nbytes=2048)
+        with self.events.stage('hash'):
+            self.events.count('hash', files=1, nbytes=1024)
+
+        ends = [r for r in self.records if r['event'] == 'stage_end']
+        self.assertEqual([(r['files'], r['bytes']) for r in ends], [(2, 2048), (1, 1024)])
+
+        stage = self.events.summary()['stages']['hash']
+        self.assertEqual(stage['files'], 3)
+        self.assertEqual(stage['bytes'], 3072)
+        self.assertEqual(stage['runs'], 2)
+
+    def test_slowest_files(self):
+        """Test that only the slowest files are kept, slowest first"""
+        for path, seconds in [('a', 0.1), ('b', 0.5), ('c', 0.3)]:
+            self.events.record_file('hash', path, seconds)
+
+        slowest = self.events.slowest_files('hash')
+        self.assertEqual([item['path'] for item in slowest], ['b', 'c'])
+
+    def test_timed_call(self):
+        """Test that timed_call returns the duration and the result"""
+        seconds, result = timed_call(max, 1, 2)
+        self.assertEqual(result, 2)
+        self.assertGreaterEqual(seconds, 0)
+
+    def test_console_sink(self):
+        """Test that console output is rendered from events"""
+        out = StringIO()
+        with redirect_stdout(out):
+            sink = ConsoleSink()
+            sink({'event': 'hash_start', 'count': 4})
+            sink({'event': 'stage_end', 'stage': 'hash'})  # Not for the console
+        self.assertEqual(out.getvalue(), "🔑 Hashing 4 candidate files...\n")
+
+
+class TestFinderEvents(unittest.TestCase):
+    """Test events emitted by DuplicateFinder"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_scan_events_and_json_lines(self):
+        """Test stage timings for a scan and the JSON lines output"""
+        for name, content in [('a.jpg', b'same'), ('b.jpg', b'same'), ('c.jpg', b'other!')]:
+            with open(os.path.join(self.test_dir, name), 'wb') as f:
+                f.write(content)
+
+        log_path = os.path.join(self.test_dir, 'events.jsonl')
+        events = Instrumentation([JsonLinesSink(log_path)])
+        finder = DuplicateFinder(events=events)
+        finder.SCAN_ROOT = self.test_dir
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, 'review')
+        finder.scan_files()
+        finder.find_duplicates()
+        events.close()
+
+        stages = events.summary()['stages']
+        self.assertEqual(stages['walk']['files'], 3)
+        self.assertEqual(stages['hash']['files'], 2)
+        self.assertEqual(stages['hash']['bytes'], 8)
+
+        with open(log_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        names = [r['event'] for r in records]
+        self.assertIn('scan_start', names)
+        self.assertIn('hash_search_done', names)
+        self.assertEqual(names[-1], 'summary')
+        timed = {r['path'] for r in records if r['event'] == 'file_timing' and r['stage'] == 'hash'}
+        self.assertEqual({os.path.basename(p) for p in timed}, {'a.jpg', 'b.jpg'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Unit tests for I/O-aware read scheduling
+"""
+
+import unittest
+import tempfile
+import shutil
+import threading
+import os
+import sys
+from types import SimpleNamespace
+from unittest import mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from duplicate_finder import DuplicateFinder
+from instrumentation import Instrumentation
+from io_scheduler import IOScheduler, Throttle, physical_offset
+
+HDD, SSD = 1, 2
+
+
+def fake_files(layout):
+    """(path, stat, nbytes) for (device, inode) pairs"""
+    return [(f"/data/{i}", SimpleNamespace(st_dev=dev, st_ino=ino), 100) for i, (dev, ino) in enumerate(layout)]
+
+
+class TestIOScheduler(unittest.TestCase):
+    """Test cases for IOScheduler and Throttle"""
+
+    def setUp(self):
+        patcher = mock.patch('io_scheduler.is_rotational', side_effect=lambda dev: dev == HDD)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rotational_devices_in_inode_order(self):
+        """Test that spinning disks are read by inode without opening files, SSDs in job order"""
+        files = fake_files([(HDD, 30), (SSD, 9), (HDD, 10), (SSD, 1), (HDD, 20)])
+        scheduler = IOScheduler(workers=4)
+        with mock.patch('io_scheduler.physical_offset') as offsets:
+            plan = scheduler.plan(files)
+        self.assertEqual(plan, [(HDD, True, [2, 4, 0]), (SSD, False, [1, 3])])
+        offsets.assert_not_called()
+        self.assertEqual(scheduler.rotational, {HDD})
+
+    def test_physical_order(self):
+        """Test that known FIEMAP offsets win over inode numbers"""
+        files = fake_files([(HDD, 1), (HDD, 2), (HDD, 3)])
+        scheduler = IOScheduler()
+        scheduler.offsets = {(HDD, 1): 9000, (HDD, 2): 100}
+        self.assertEqual(scheduler.plan(files)[0][2], [1, 0, 2])
+        self.assertEqual(scheduler.physical_order, 2)
+
+    def test_located_jobs_record_offsets(self):
+        """Test that located jobs report offsets once per inode, on spinning disks only"""
+        files = fake_files([(HDD, 2), (SSD, 1), (HDD, 1)])
+        offsets = {"/data/0": 100, "/data/2": 9000}
+
+        def read(path, located=None):
+            if located:
+                located(path)  # Stands in for the descriptor
+            return located is not None
+
+        scheduler = IOScheduler()
+        jobs = [(path,) for path, _, _ in files]
+        with mock.patch('io_scheduler.physical_offset', side_effect=offsets.get):
+            self.assertEqual(list(scheduler.map(read, jobs, files, locate=True)), [True, False, True])
+            self.assertEqual(list(scheduler.map(read, jobs, files, locate=True)), [False] * 3)
+        self.assertEqual(scheduler.offsets, {(HDD, 2): 100, (HDD, 1): 9000})
+        self.assertEqual(scheduler.plan(files)[0][2], [0, 2])
+
+    def test_map_runs_per_device_and_yields_in_job_order(self):
+        """Test per-device concurrency limits and ordered results"""
+        files = fake_files([(HDD, 3), (SSD, 1), (HDD, 1), (SSD, 2), (HDD, 2), (SSD, 3)])
+        lock = threading.Lock()
+        running, peak, hdd_order = {HDD: 0, SSD: 0}, {HDD: 0, SSD: 0}, []
+        release = threading.Barrier(3, timeout=5)  # All three SSD reads must overlap
+
+        def read(position):
+            dev = files[position][1].st_dev
+            with lock:
+                running[dev] += 1
+                peak[dev] = max(peak[dev], running[dev])
+                if dev == HDD:
+                    hdd_order.append(position)
+            if dev == SSD:
+                release.wait()
+            with lock:
+                running[dev] -= 1
+            return position
+
+        scheduler = IOScheduler(workers=3, rotational_workers=1)
+        results = list(scheduler.map(read, [(i,) for i in range(len(files))], files))
+        self.assertEqual(results, list(range(len(files))))
+        self.assertEqual(peak, {HDD: 1, SSD: 3})
+        self.assertEqual(hdd_order, [2, 4, 0])
+
+    def test_throttle(self):
+        """Test that reads past the byte budget wait"""
+        throttle = Throttle(bytes_per_s=10000, burst=0)
+        for _ in range(3):
+            throttle.acquire(1000)
+        self.assertGreaterEqual(throttle.waited, 0.19)  # 0.1s before each read after the first
+        ops_only = Throttle(ops_per_s=1000)
+        ops_only.acquire(10 ** 9)  # 954 reads of 1 MB
+        self.assertEqual(ops_only.waited, 0)  # Within the first second's burst
+
+
+class TestFinderIOSchedule(unittest.TestCase):
+    """Test cases for DuplicateFinder(io_schedule=True)"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.test_dir, "photos")
+        for folder in range(6):
+            for name, content in [("same.jpg", b"identical"), (f"{folder}.jpg", b"size %d" % folder),
+                                  ("half.jpg", b"half %d" % (folder % 2))]:
+                filepath = os.path.join(self.root, str(folder), name)
+                os.makedirs(os.path.dirname(filepath), exist_ok=True)
+                with open(filepath, 'wb') as f:
+                    f.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def scan(self, **options):
+        finder = DuplicateFinder(events=Instrumentation(), **options)
+        finder.SCAN_ROOT = self.root
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        finder.scan_files()
+        return finder
+
+    def test_same_groups(self):
+        """Test that scheduling changes the read order, not the result"""
+        scheduled = self.scan(workers=2, io_schedule=True, read_limit=10 ** 9)
+        plain = self.scan(workers=2)
+        self.assertEqual(scheduled._path_groups(scheduled.file_hashes), plain._path_groups(plain.file_hashes))
+        self.assertEqual(scheduled.stats['io_devices'], 1)
+        self.assertEqual(scheduled.stats['files_hashed'], plain.stats['files_hashed'])
+
+    def test_physical_offset_of_real_file(self):
+        """Test that FIEMAP answers with an offset or None, never an error"""
+        with open(os.path.join(self.root, "0", "same.jpg"), 'rb') as f:
+            offset = physical_offset(f.fileno())
+        self.assertTrue(offset is None or offset >= 0)
+        read_end, write_end = os.pipe()
+        self.addCleanup(os.close, read_end)
+        self.addCleanup(os.close, write_end)
+        self.assertIsNone(physical_offset(read_end))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the persistent library index
+"""
+
+import unittest
+import tempfile
+import shutil
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import library_index
+from duplicate_finder import DuplicateFinder, PARTIAL_HASH_SIZE
+from instrumentation import Instrumentation
+from library_index import LibraryIndex, build_index
+
+
+class TestLibraryIndex(unittest.TestCase):
+    """Test cases for LibraryIndex class"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.library = os.path.join(self.test_dir, "library")
+        self.incoming = os.path.join(self.test_dir, "incoming")
+        self.write(self.library, "2023/a.jpg", b"A" * 100000)
+        self.write(self.library, "2023/a_copy.jpg", b"A" * 100000)  # Shared size: sampled and hashed
+        self.write(self.library, "2024/b.jpg", b"B" * 5000)  # Unique size: never read by the build
+        self.index_path = os.path.join(self.test_dir, "library.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, root, relative_path, content):
+        filepath = os.path.join(root, relative_path)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        return filepath
+
+    def build(self, **options):
+        finder = DuplicateFinder(events=Instrumentation(), **options)
+        finder.SCAN_ROOT = self.library
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        index = LibraryIndex(self.index_path)
+        self.assertEqual(build_index(finder, index), len(finder.records))
+        self.addCleanup(index.close)
+        return index
+
+    def test_reads_only_what_it_needs(self):
+        """Test the bytes read at each level of the lookup"""
+        index = self.build()
+        unique = index.check(self.write(self.incoming, "new.jpg", b"N" * 1234))
+        self.assertEqual((unique['duplicates'], unique['bytes_read']), ([], 0))
+
+        different = index.check(self.write(self.incoming, "x.jpg", b"Z" * 100000))
+        self.assertEqual(different['duplicates'], [])
+        self.assertEqual(different['bytes_read'], 2 * PARTIAL_HASH_SIZE)
+
+        same = index.check(self.write(self.incoming, "a.jpg", b"A" * 100000))
+        self.assertEqual(sorted(same['duplicates']),
+                         [os.path.join(self.library, "2023", name) for name in ("a.jpg", "a_copy.jpg")])
+        self.assertEqual(same['bytes_read'], 2 * PARTIAL_HASH_SIZE + 100000)
+        self.assertEqual(same['same_name'], [os.path.join(self.library, "2023", "a.jpg")])
+
+    def test_missing_library_keys_are_filled_once(self):
+        """Test that a library file's keys are computed on first need and kept"""
+        self.build()
+        incoming = self.write(self.incoming, "b.jpg", b"B" * 5000)
+        index = LibraryIndex(self.index_path)
+        self.assertEqual(index.check(incoming)['duplicates'], [os.path.join(self.library, "2024", "b.jpg")])
+        row = index._select("name = ?", ("b.jpg",))[0]
+        self.assertIsNotNone(row['partial'])
+        self.assertIsNotNone(row['digest'])
+        index.close()
+
+    def test_changed_and_deleted_library_files(self):
+        """Test that stale entries are re-read or dropped, never trusted"""
+        index = self.build()
+        with open(os.path.join(self.library, "2023", "a.jpg"), 'r+b') as f:
+            f.seek(50000)
+            f.write(b"edited")  # Same size, same head/tail, new content
+        os.utime(os.path.join(self.library, "2023", "a.jpg"), ns=(1, 1))
+        os.remove(os.path.join(self.library, "2023", "a_copy.jpg"))
+
+        result = index.check(self.write(self.incoming, "in.jpg", b"A" * 100000))
+        self.assertEqual(result['duplicates'], [])
+        self.assertEqual(len(index), 2)
+
+    def test_accept(self):
+        """Test that accepted files are found by later lookups"""
+        index = self.build()
+        first = self.write(self.incoming, "day1/new.jpg", b"fresh" * 999)
+        result = index.check(first)
+        self.assertEqual(result['duplicates'], [])
+        index.accept(first, result)
+        self.assertEqual(len(index), 4)
+
+        second = self.write(self.incoming, "day2/new_again.jpg", b"fresh" * 999)
+        self.assertEqual(index.check(second)['duplicates'], [first])
+
+    def test_similar_images(self):
+        """Test perceptual lookups through the band indexes"""
+        fractal = Image.effect_mandelbrot((128, 128), (-2, -1.5, 1, 1.5), 100).convert('RGB')
+        fractal.save(os.path.join(self.library, "2023", "fractal.png"))
+        index = self.build(similar=True)
+
+        incoming = os.path.join(self.incoming, "smaller.jpg")
+        os.makedirs(self.incoming)
+        fractal.resize((64, 64)).save(incoming, quality=80)
+        result = index.check(incoming, similar=True)
+        self.assertEqual([path for _, path in result['similar']],
+                         [os.path.join(self.library, "2023", "fractal.png")])
+        self.assertEqual(result['duplicates'], [])
+
+    def test_cli_import(self):
+        """Test that --import-to copies and indexes only new files"""
+        self.build().close()
+        self.write(self.incoming, "card/a.jpg", b"A" * 100000)
+        self.write(self.incoming, "card/c.jpg", b"C" * 777)
+        destination = os.path.join(self.library, "2025")
+        with redirect_stdout(io.StringIO()) as output:
+            library_index.main(['--index', self.index_path, '--check', self.incoming,
+                                '--import-to', destination])
+        self.assertIn("1 new, 1 already in the library", output.getvalue())
+        self.assertEqual(os.listdir(os.path.join(destination, "card")), ["c.jpg"])
+        index = LibraryIndex(self.index_path)
+        self.assertEqual(len(index), 4)
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Unit tests for header-only dimension probing
+"""
+
+import unittest
+import tempfile
+import shutil
+import struct
+import os
+import sys
+
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from media_probe import probe_dimensions, probe_mp4
+from duplicate_finder import DuplicateFinder
+
+
+def box(box_type, payload):
+    """Build an ISO-BMFF box"""
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type, payload, version=0):
+    """Build an ISO-BMFF full box (version + flags)"""
+    return box(box_type, bytes([version, 0, 0, 0]) + payload)
+
+
+def tkhd(width, height, version=0):
+    """Build a track header with 16.16 fixed-point dimensions"""
+    times = b'\x00' * (20 if version == 0 else 32)
+    return full_box(b'tkhd', times + b'\x00' * 52 + struct.pack('>II', width << 16, height << 16), version)
+
+
+class TestMediaProbe(unittest.TestCase):
+    """Test cases for probe_dimensions"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.test_dir = tempfile.mkdtemp()
+        
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.test_dir)
+    
+    def write(self, filename, content):
+        """Helper to create test files"""
+        filepath = os.path.join(self.test_dir, filename)
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        return filepath
+    
+    def test_jpeg_with_exif(self):
+        """Test JPEG SOF parsing behind an APP1 segment"""
+        filepath = os.path.join(self.test_dir, "photo.jpg")
+        exif = Image.Exif()
+        exif[0x010E] = "x" * 5000  # ImageDescription, makes APP1 large
+        Image.new('RGB', (321, 123)).save(filepath, exif=exif.tobytes())
+        self.assertEqual(probe_dimensions(filepath), (321, 123))
+    
+    def test_png(self):
+        """Test PNG IHDR parsing"""
+        filepath = os.path.join(self.test_dir, "image.png")
+        Image.new('L', (64, 48)).save(filepath)
+        self.assertEqual(probe_dimensions(filepath), (64, 48))
+    
+    def test_heif_ispe(self):
+        """Test HEIF picks the largest image spatial extents"""
+        ipco = box(b'ipco', full_box(b'ispe', struct.pack('>II', 512, 512))
+                   + full_box(b'ispe', struct.pack('>II', 4032, 3024)))
+        meta = full_box(b'meta', box(b'hdlr', b'\x00' * 20) + box(b'iprp', ipco))
+        filepath = self.write("photo.heic", box(b'ftyp', b'heic\x00\x00\x00\x00mif1heic') + meta)
+        self.assertEqual(probe_dimensions(filepath), (4032, 3024))
+    
+    def test_mp4_tkhd_after_mdat(self):
+        """Test MP4 video track dimensions with 'moov' after the media data"""
+        audio = box(b'trak', tkhd(0, 0))
+        video = box(b'trak', tkhd(1920, 1080, version=1))
+        content = (box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41')
+                   + box(b'mdat', b'\x00' * 100000)
+                   + box(b'moov', full_box(b'mvhd', b'\x00' * 96) + audio + video))
+        filepath = self.write("clip.mp4", content)
+        self.assertEqual(probe_dimensions(filepath), (1920, 1080))
+    
+    def test_mp4_duration(self):
+        """Test movie duration from 'mvhd' (version 0 and 1)"""
+        mvhd0 = full_box(b'mvhd', struct.pack('>IIII', 0, 0, 1000, 12500) + b'\x00' * 80)
+        mvhd1 = full_box(b'mvhd', struct.pack('>QQIQ', 0, 0, 600, 1800) + b'\x00' * 80, version=1)
+        for mvhd, duration in [(mvhd0, 12.5), (mvhd1, 3.0)]:
+            content = (box(b'ftyp', b'isom\x00\x00\x02\x00')
+                       + box(b'moov', mvhd + box(b'trak', tkhd(640, 480)))
+                       + box(b'mdat', b'\x00' * 1000))
+            info = probe_mp4(self.write("clip.mp4", content))
+            self.assertEqual(info, {'duration': duration, 'width': 640, 'height': 480})
+        self.assertIsNone(probe_mp4(self.write("photo.png", b"not a video")))
+    
+    def test_garbage_returns_none(self):
+        """Test that unknown or truncated files are not parsed"""
+        self.assertIsNone(probe_dimensions(self.write("bad.jpg", b"\xff\xd8\xff\xe1\x00")))
+        self.assertIsNone(probe_dimensions(self.write("text.png", b"not an image")))
+        self.assertIsNone(probe_dimensions(os.path.join(self.test_dir, "missing.jpg")))
+    
+    def test_video_quality_uses_resolution(self):
+        """Test that videos are ranked by resolution as well as size"""
+        moov = box(b'moov', box(b'trak', tkhd(1280, 720)))
+        filepath = self.write("clip.mp4", box(b'ftyp', b'isom\x00\x00\x02\x00') + moov)
+        quality = DuplicateFinder().get_image_quality(filepath)
+        self.assertEqual(quality, 1280 * 720 * 10 + os.path.getsize(filepath))
+
+
+if __name__ == '__main__':
+    unittest.main()
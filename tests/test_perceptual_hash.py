@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Unit tests for perceptual hashing and the multi-index hash
+"""
+
+import unittest
+import os
+import sys
+import random
+import tempfile
+import shutil
+
+from PIL import Image, ImageDraw
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from perceptual_hash import MultiIndexHash, dhash, phash, hamming, perceptual_hash
+
+
+def draw_scene(size, seed):
+    """Helper drawing a reproducible picture"""
+    rng = random.Random(seed)
+    img = Image.new('RGB', size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    draw = ImageDraw.Draw(img)
+    width, height = size
+    for _ in range(12):
+        x, y = rng.randrange(width), rng.randrange(height)
+        w, h = rng.randrange(width // 2), rng.randrange(height // 2)
+        draw.ellipse([x, y, x + w, y + h], fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    return img
+
+
+class TestPerceptualHash(unittest.TestCase):
+    """Test cases for dhash/phash"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def save(self, img, name, **options):
+        path = os.path.join(self.test_dir, name)
+        img.save(path, **options)
+        return path
+
+    def test_resized_and_recompressed_copies_match(self):
+        """Test that re-exports hash close together and other pictures do not"""
+        scene = draw_scene((1600, 1200), seed=1)
+        original = self.save(scene, 'original.jpg', quality=95)
+        small = self.save(scene.resize((400, 300)), 'small.jpg', quality=60)
+        png = self.save(scene.resize((800, 600)), 'export.png')
+        other = self.save(draw_scene((1600, 1200), seed=2), 'other.jpg', quality=95)
+
+        for algorithm in (dhash, phash):
+            reference = algorithm(original)
+            self.assertLessEqual(hamming(reference, algorithm(small)), 6)
+            self.assertLessEqual(hamming(reference, algorithm(png)), 6)
+            self.assertGreater(hamming(reference, algorithm(other)), 10)
+
+    def test_unreadable_file(self):
+        """Test that decoding errors are returned, not raised"""
+        path = os.path.join(self.test_dir, 'broken.jpg')
+        with open(path, 'wb') as f:
+            f.write(b'not an image')
+        value, error = perceptual_hash(path)
+        self.assertIsNone(value)
+        self.assertIsNotNone(error)
+
+
+class TestMultiIndexHash(unittest.TestCase):
+    """Test cases for MultiIndexHash class"""
+
+    def test_search_matches_brute_force(self):
+        """Test that threshold queries return exactly the brute-force matches"""
+        rng = random.Random(0)
+        hashes = [rng.getrandbits(64) for _ in range(300)]
+        # Add near copies so that every small distance occurs
+        hashes += [value ^ sum(1 << bit for bit in rng.sample(range(64), rng.randrange(12)))
+                   for value in hashes[:100]]
+
+        for max_distance in (0, 3, 6, 11):
+            lookup = MultiIndexHash(max_distance)
+            for item, value in enumerate(hashes):
+                lookup.add(value, item)
+            self.assertEqual(len(lookup), len(hashes))
+            for query in hashes[:100]:
+                expected = sorted((hamming(query, value), item) for item, value in enumerate(hashes)
+                                  if hamming(query, value) <= max_distance)
+                self.assertEqual(sorted(lookup.search(query)), expected)
+
+    def test_empty_index(self):
+        """Test searching an empty index"""
+        self.assertEqual(MultiIndexHash(5).search(0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
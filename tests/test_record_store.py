@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the columnar file record store
+"""
+
+import unittest
+import os
+import sys
+from types import SimpleNamespace
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from record_store import FileRecordStore, StatKey
+
+
+def fake_stat(size, ino=1):
+    """Helper building a stat identity"""
+    return StatKey(st_dev=7, st_ino=ino, st_size=size, st_mtime_ns=1234567890123456789)
+
+
+class TestFileRecordStore(unittest.TestCase):
+    """Test cases for FileRecordStore class"""
+    
+    def setUp(self):
+        self.store = FileRecordStore()
+    
+    def test_record_view(self):
+        """Test that records read like the old file_info dicts"""
+        path = os.path.join("photos", "2020", "IMG_0001.JPG")
+        index = self.store.add(path, fake_stat(2048), protected=True)
+        record = self.store[index]
+        
+        self.assertEqual(record['path'], path)
+        self.assertEqual(record['size'], 2048)
+        self.assertTrue(record['protected'])
+        self.assertIsNone(record['quality'])
+        
+        record['quality'] = 99
+        self.assertEqual(self.store.quality(index), 99)
+        with self.assertRaises(KeyError):
+            record['size'] = 1
+    
+    def test_protected_bitset(self):
+        """Test protected flags across byte boundaries"""
+        flags = [i % 3 == 0 for i in range(20)]
+        for i, flag in enumerate(flags):
+            self.store.add(f"/d/{i}.jpg", fake_stat(i, ino=i), protected=flag)
+        
+        self.assertEqual([self.store.is_protected(i) for i in range(20)], flags)
+        self.assertEqual(len(self.store.protected), 3)
+    
+    def test_directories_are_interned(self):
+        """Test that files in one folder share a single directory string"""
+        for i in range(100):
+            self.store.add(f"/library/2021/{i}.jpg", fake_stat(i, ino=i))
+        
+        self.assertEqual(self.store.dirs, ["/library/2021"])
+        self.assertEqual(self.store.stat(42), fake_stat(42, ino=42))
+    
+    def test_inode_and_links(self):
+        """Test that multi-link files are tracked sparsely"""
+        single = self.store.add("/d/a.jpg", fake_stat(1, ino=5))
+        linked = self.store.add("/d/b.jpg", SimpleNamespace(st_dev=7, st_ino=6, st_size=1,
+                                                              st_mtime_ns=1, st_nlink=3))
+        self.assertEqual(self.store.links, {linked: 3})
+        self.assertEqual(self.store[linked]['links'], 3)
+        self.assertEqual(self.store[single]['links'], 1)
+        self.assertEqual(self.store[linked]['inode'], (7, 6))
+        self.assertIsNone(self.store.inode(self.store.add("/d/c.jpg", fake_stat(1, ino=0))))
+
+    def test_wide_inodes(self):
+        """Test that 128-bit file IDs (Windows ReFS) are kept exactly"""
+        wide = 2 ** 100 + 17
+        index = self.store.add("/d/refs.jpg", fake_stat(1, ino=wide))
+        self.store.add("/d/ntfs.jpg", fake_stat(1, ino=2 ** 63))
+        self.assertEqual(self.store.stat(index), fake_stat(1, ino=wide))
+        self.assertEqual(self.store.inode(index), (7, wide))
+        self.assertEqual(self.store.inode(index + 1), (7, 2 ** 63))
+        self.assertEqual(list(self.store.wide_inodes), [index])
+
+    def test_memory_usage_below_dicts(self):
+        """Test that the store is smaller than one dict per file"""
+        dicts = []
+        for i in range(10000):
+            path = f"/library/{i // 100}/IMG_{i:05d}.JPG"
+            self.store.add(path, fake_stat(i * 1000, ino=i))
+            dicts.append({'path': path, 'quality': None, 'size': i * 1000, 'protected': False})
+        
+        dict_bytes = sum(sys.getsizeof(d) + sys.getsizeof(d['path']) for d in dicts)
+        self.assertLess(self.store.memory_usage(), dict_bytes / 2)
+        self.assertGreater(self.store.bytes_per_million(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the persistent scan cache
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scan_cache import ScanCache
+from duplicate_finder import DuplicateFinder
+
+
+class TestScanCache(unittest.TestCase):
+    """Test cases for ScanCache class"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.test_dir, "cache", "cache.sqlite")
+        
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.test_dir)
+    
+    def create_test_file(self, filename, content):
+        """Helper to create test files"""
+        filepath = os.path.join(self.test_dir, filename)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        return filepath
+    
+    def test_roundtrip(self):
+        """Test that flushed entries are loaded by a new cache"""
+        filepath = self.create_test_file("photos/a.jpg", b"data")
+        st = os.stat(filepath)
+        
+        cache = ScanCache(self.cache_path)
+        cache.update(filepath, st, digest="abc", quality=42)
+        cache.close()
+        
+        cache = ScanCache(self.cache_path)
+        self.assertEqual(cache.load(), 1)
+        self.assertEqual(cache.get(filepath, st, 'digest'), "abc")
+        self.assertEqual(cache.get(filepath, st, 'quality'), 42)
+        self.assertIsNone(cache.get(filepath, st, 'partial'))
+        cache.close()
+    
+    def test_stale_entry_is_ignored(self):
+        """Test that a changed file does not reuse old results"""
+        filepath = self.create_test_file("photos/a.jpg", b"data")
+        cache = ScanCache(self.cache_path)
+        cache.update(filepath, os.stat(filepath), digest="abc")
+        
+        with open(filepath, 'ab') as f:
+            f.write(b"more")
+        
+        self.assertIsNone(cache.get(filepath, os.stat(filepath), 'digest'))
+        cache.close()
+    
+    def test_compact_removes_missing_paths(self):
+        """Test eviction of entries for deleted files"""
+        kept = self.create_test_file("photos/a.jpg", b"data")
+        gone = self.create_test_file("photos/b.jpg", b"other")
+        cache = ScanCache(self.cache_path)
+        cache.update(kept, os.stat(kept), digest="a")
+        cache.update(gone, os.stat(gone), digest="b")
+        os.remove(gone)
+        
+        self.assertEqual(cache.compact(), 1)
+        cache.close()
+        
+        cache = ScanCache(self.cache_path)
+        self.assertEqual(cache.load(), 1)
+        cache.close()
+    
+    def test_rescan_uses_cache(self):
+        """Test that a second scan of unchanged files reads nothing"""
+        self.create_test_file("scan/a/one.jpg", b"same content")
+        self.create_test_file("scan/b/two.jpg", b"same content")
+        scan_root = os.path.join(self.test_dir, "scan")
+        
+        results = []
+        for _ in range(2):
+            finder = DuplicateFinder(cache_path=self.cache_path)
+            finder.SCAN_ROOT = scan_root
+            finder.scan_files()
+            finder.cache.close()
+            results.append(finder)
+        
+        self.assertEqual(results[0].stats['files_hashed'], 2)
+        self.assertEqual(results[1].stats['files_hashed'], 0)
+        self.assertEqual(results[1].stats['partial_hashed'], 0)
+        self.assertEqual(list(results[0].file_hashes), list(results[1].file_hashes))
+
+
+if __name__ == '__main__':
+    unittest.main()
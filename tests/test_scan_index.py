@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Unit tests for incremental rescans driven by the scan index
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from duplicate_finder import DuplicateFinder
+from instrumentation import Instrumentation
+from scan_index import ScanIndex
+
+
+class TestIncrementalScan(unittest.TestCase):
+    """Test cases for DuplicateFinder with a scan index"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.test_dir, "photos")
+        self.index_path = os.path.join(self.test_dir, "index.sqlite")
+        for relative_path, content in [("a/one.jpg", b"same content"), ("b/one.jpg", b"same content"),
+                                       ("b/two.jpg", b"unique size!!"), ("c/three.png", b"other")]:
+            self.write(relative_path, content)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, relative_path, content, mtime=None):
+        filepath = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(filepath, ns=(mtime, mtime))
+        return filepath
+
+    def scan(self, **options):
+        finder = DuplicateFinder(index_path=self.index_path, events=Instrumentation(), **options)
+        finder.SCAN_ROOT = self.root
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        finder.scan_files()
+        if finder.index:
+            finder.index.close()
+        return finder
+
+    def test_unchanged_rescan_reuses_everything(self):
+        """Test that a second scan of an unchanged tree reads no file"""
+        self.scan()
+        finder = self.scan()
+        self.assertEqual(finder.stats['index_reused'], 4)
+        self.assertEqual(finder.stats['index_changed'], 0)
+        self.assertEqual(finder.stats['files_hashed'], 0)
+        self.assertEqual(finder.stats['partial_hashed'], 0)
+        self.assertEqual(finder.verify_against_full_scan(), [])
+
+    def test_changes_match_full_scan(self):
+        """Test added, modified and deleted files against a full rescan"""
+        self.scan()
+        self.write("c/three.png", b"same content", mtime=1)  # Modified, joins the pair
+        self.write("d/new.jpg", b"unique size!!")  # New, twin of two.jpg
+        os.remove(os.path.join(self.root, "a/one.jpg"))  # Deleted
+
+        finder = self.scan()
+        self.assertEqual(finder.stats['index_changed'], 2)
+        self.assertEqual(finder.stats['index_deleted'], 1)
+        self.assertEqual(finder.verify_against_full_scan(), [])
+
+        groups = finder._path_groups(finder.file_hashes)
+        self.assertIn(frozenset([os.path.join(self.root, "b/two.jpg"),
+                                 os.path.join(self.root, "d/new.jpg")]), groups)
+        self.assertIn(frozenset([os.path.join(self.root, "b/one.jpg"),
+                                 os.path.join(self.root, "c/three.png")]), groups)
+
+    def test_settings_change_discards_index(self):
+        """Test that an index built with another digest engine is not used"""
+        self.scan()
+        finder = self.scan(hash_algorithm='sha256')
+        self.assertEqual(finder.stats['index_reused'], 0)
+        self.assertEqual(finder.stats['files_hashed'], 2)
+
+    def test_verification_reports_differences(self):
+        """Test that a stale index is caught by the verification mode"""
+        self.scan()
+        # Change content behind the index's back, keeping size and mtime
+        filepath = os.path.join(self.root, "b/one.jpg")
+        st = os.stat(filepath)
+        self.write("b/one.jpg", b"SAME CONTENT", mtime=st.st_mtime_ns)
+
+        finder = self.scan()
+        differences = finder.verify_against_full_scan()
+        self.assertIn(('content', 'extra', sorted([os.path.join(self.root, "a/one.jpg"), filepath])),
+                      differences)
+
+
+class TestScanIndex(unittest.TestCase):
+    """Test cases for ScanIndex class"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "index.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_round_trip(self):
+        """Test that listings and hash outcomes survive a reload"""
+        index = ScanIndex(self.path)
+        self.assertFalse(index.load({'root': 'x'}))
+        listings = {'/x': (5, ['a.jpg', 'b.jpg', 'c.jpg'], ['sub'])}
+        changed = {'/x/a.jpg': ((1, 2, 3, 4), 'abc'), '/x/b.jpg': ((1, 3, 3, 4), True),
+                   '/x/c.jpg': ((1, 4, 3, 4), None)}
+        index.save({'root': 'x'}, listings, changed, [])
+        index.close()
+
+        index = ScanIndex(self.path)
+        self.assertTrue(index.load({'root': 'x'}))
+        self.assertEqual(index.listings, listings)
+        self.assertEqual(index.files, changed)
+        self.assertFalse(index.load({'root': 'y'}))
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
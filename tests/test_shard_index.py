@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Unit tests for shard indexes and multi-node merges
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+from unittest import mock
+
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from duplicate_finder import DuplicateFinder
+from instrumentation import Instrumentation
+from shard_index import PlanWriter, ShardReader, merge_groups, open_shards
+
+
+class TestShardMerge(unittest.TestCase):
+    """Test cases for export_shard and merge_shards"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.nas1 = os.path.join(self.test_dir, "nas1")
+        self.nas2 = os.path.join(self.test_dir, "nas2")
+        # Unique size on each node - only a cross-shard merge can pair them
+        self.write(self.nas1, "2020/trip.bin", b"cross-shard twin")
+        self.write(self.nas2, "backup/trip_copy.bin", b"cross-shard twin")
+        # Protected high-resolution original on nas1, small copy on nas2
+        self.write_image(self.nas1, "protected/beach.png", (64, 48))
+        self.write_image(self.nas2, "phone/beach.png", (16, 12))
+        # Local pair on nas2
+        self.write(self.nas2, "a/local.bin", b"local pair")
+        self.write(self.nas2, "b/local2.bin", b"local pair")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, root, relative_path, content):
+        filepath = os.path.join(root, relative_path)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        return filepath
+
+    def write_image(self, root, relative_path, size):
+        filepath = os.path.join(root, relative_path)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        Image.new('RGB', size, (120, 30, 200)).save(filepath)
+        return filepath
+
+    def export(self, root, shard, **options):
+        finder = DuplicateFinder(events=Instrumentation(), **options)
+        finder.SUPPORTED_EXTENSIONS = {'.bin', '.png'}
+        finder.SCAN_ROOT = root
+        finder.PROTECTED_FOLDER = os.path.join(self.nas1, "protected")
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        finder.scan_files()
+        path = os.path.join(self.test_dir, f"{shard}.shard")
+        finder.export_shard(path, shard)
+        return path
+
+    def test_shard_is_self_contained(self):
+        """Test that every file gets a digest, signature and quality"""
+        reader = ShardReader(self.export(self.nas2, "nas2"))
+        records = list(reader.records('digest'))
+        reader.close()
+        self.assertEqual(len(records), 4)
+        for record in records:
+            self.assertTrue(record['digest'])
+            self.assertTrue(record['partial'])
+            self.assertIsNotNone(record['quality'])
+            self.assertTrue(record['path'].startswith("nas2:"))
+
+    def test_merge_finds_cross_shard_duplicates(self):
+        """Test hash and name groups that span shards, without reading any file"""
+        shards = [self.export(self.nas1, "nas1"), self.export(self.nas2, "nas2")]
+
+        finder = DuplicateFinder(events=Instrumentation())
+        with mock.patch('duplicate_finder.hash_file', side_effect=AssertionError("file read")):
+            files_to_move = finder.merge_shards(shards)
+
+        moves = {(m['original'], m['duplicate']) for m in files_to_move}
+        nas1 = lambda path: "nas1:" + os.path.join(self.nas1, path)
+        nas2 = lambda path: "nas2:" + os.path.join(self.nas2, path)
+        self.assertIn((nas1("2020/trip.bin"), nas2("backup/trip_copy.bin")), moves)
+        self.assertIn((nas1("protected/beach.png"), nas2("phone/beach.png")), moves)
+        self.assertEqual(len(moves), 3)
+        self.assertEqual(finder.stats['total_scanned'], 6)
+
+    def test_plan_writer_streams_moves(self):
+        """Test that a merge can write its moves straight to a plan file"""
+        shards = [self.export(self.nas1, "nas1"), self.export(self.nas2, "nas2")]
+        plan = PlanWriter(os.path.join(self.test_dir, "plan.jsonl"))
+        DuplicateFinder(events=Instrumentation()).merge_shards(shards, plan)
+        plan.close()
+        with open(plan.path, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 3)
+        self.assertEqual(plan.count, 3)
+
+    def test_merge_groups_is_ordered(self):
+        """Test that the k-way merge yields each digest once, in order"""
+        readers = open_shards([self.export(self.nas1, "nas1"), self.export(self.nas2, "nas2")])
+        groups = list(merge_groups(readers, 'digest'))
+        for reader in readers:
+            reader.close()
+        digests = [digest for digest, _ in groups]
+        self.assertEqual(digests, sorted(set(digests)))
+        self.assertEqual(sum(len(records) for _, records in groups), 6)
+
+    def test_incompatible_shards(self):
+        """Test that shards hashed with different engines are refused"""
+        shards = [self.export(self.nas1, "nas1"), self.export(self.nas2, "nas2", hash_algorithm='sha256')]
+        with self.assertRaises(ValueError):
+            DuplicateFinder(events=Instrumentation()).merge_shards(shards)
+        with self.assertRaises(ValueError):
+            DuplicateFinder(events=Instrumentation()).merge_shards([shards[0], shards[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
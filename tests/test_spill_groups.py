@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Unit tests for disk-spilling duplicate groups
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+from collections import defaultdict
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from duplicate_finder import DuplicateFinder
+from instrumentation import Instrumentation
+from spill_groups import SpillingGroups
+
+
+class TestSpillingGroups(unittest.TestCase):
+    """Test cases for SpillingGroups class"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def fill(self, groups, count=3000):
+        reference = defaultdict(list)
+        for index in range(count):
+            key = f"key-{index % 700}-ż"  # Non-ASCII keys survive the run files
+            groups.add(key, index)
+            reference[key].append(index)
+        return reference
+
+    def test_no_limit_is_a_plain_table(self):
+        """Test that without a limit nothing is written to disk"""
+        groups = SpillingGroups()
+        reference = self.fill(groups)
+        self.assertFalse(groups.spilled)
+        self.assertEqual(dict(groups.items()), reference)
+        groups['new'].append(1)  # Still usable like a defaultdict
+        self.assertIn('new', groups)
+
+    def test_spilled_groups_match(self):
+        """Test that spilled groups come back whole and in insertion order"""
+        groups = SpillingGroups(memory_limit=20000, spill_dir=self.test_dir)
+        reference = self.fill(groups)
+        self.assertTrue(groups.spilled)
+        self.assertGreater(groups.spills, 1)
+        self.assertEqual(dict(groups.items()), reference)
+        self.assertEqual(len(groups), 700)
+        self.assertEqual(groups["key-5-ż"], reference["key-5-ż"])
+        self.assertNotIn("missing", groups)
+
+    def test_oversized_partitions_are_split(self):
+        """Test that a partition larger than the limit is split before loading"""
+        groups = SpillingGroups(memory_limit=2000, spill_dir=self.test_dir, partitions=2)
+        reference = self.fill(groups)
+        for _ in range(2):  # Run files survive a pass over the groups
+            self.assertEqual(dict(groups.items()), reference)
+
+    def test_close_removes_run_files(self):
+        """Test that closing the table deletes its spill directory"""
+        groups = SpillingGroups(memory_limit=1000, spill_dir=self.test_dir)
+        self.fill(groups, 200)
+        self.assertTrue(os.listdir(self.test_dir))
+        groups.close()
+        self.assertEqual(os.listdir(self.test_dir), [])
+
+
+class TestFinderMemoryLimit(unittest.TestCase):
+    """Test cases for DuplicateFinder with a memory limit"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.test_dir, "photos")
+        for folder in range(20):
+            for name, content in [("same.jpg", b"identical"), (f"{folder}.jpg", b"x" * folder),
+                                  (f"pair{folder % 5}.jpg", b"pair %d" % (folder % 5))]:
+                path = os.path.join(self.root, str(folder), name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def find(self, **options):
+        finder = DuplicateFinder(events=Instrumentation(), **options)
+        finder.SCAN_ROOT = self.root
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        finder.QUALITY_BATCH = 7
+        finder.scan_files()
+        return finder, finder.find_duplicates()
+
+    def test_same_moves_as_in_memory(self):
+        """Test that spilling changes nothing but where the groups live"""
+        spilling, spilled_moves = self.find(memory_limit=2000, spill_dir=self.test_dir)
+        in_memory, moves = self.find()
+        self.assertGreater(spilling.stats['groups_spilled_bytes'], 0)
+        # Report group numbers follow the order groups are read back in
+        key = lambda move: (move['duplicate'], move['original'], move['reason'], move['size'], move['digest'])
+        self.assertEqual(sorted(map(key, spilled_moves)), sorted(map(key, moves)))
+        self.assertEqual(spilling.stats['quality_probed'], in_memory.stats['quality_probed'])
+        self.assertEqual(spilling.stats['quality_probes_avoided'], in_memory.stats['quality_probes_avoided'])
+
+
+if __name__ == '__main__':
+    unittest.main()
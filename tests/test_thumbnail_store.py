@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the thumbnail store and pixel matching
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+import io
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from unittest import mock
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import duplicate_finder
+from duplicate_finder import DuplicateFinder
+from instrumentation import Instrumentation
+import thumbnail_store
+from thumbnail_store import PixelIndex, ThumbnailStore, decode_thumbnail, pixel_distance, same_aspect
+
+
+def fractal(size, box=(-2, -1.2, 1, 1.2)):
+    return Image.effect_mandelbrot(size, box, 100).convert('RGB')
+
+
+class TestThumbnailStore(unittest.TestCase):
+    """Test cases for ThumbnailStore"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "thumbnails.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_slots_survive_reopening(self):
+        """Test that slots are read back after reopening, and a torn slot is dropped"""
+        picture = os.path.join(self.test_dir, "picture.png")
+        fractal((640, 480)).save(picture)
+        data, error = decode_thumbnail(picture)
+        self.assertIsNone(error)
+
+        store = ThumbnailStore(self.path)
+        self.assertEqual([store.add(data), store.add(data)], [0, 1])
+        store_id = store.id
+        store.close()
+        with open(self.path, 'ab') as f:
+            f.write(data[:100])  # Crash halfway through a third slot
+
+        store = ThumbnailStore(self.path)
+        self.assertEqual((store.id, len(store)), (store_id, 2))
+        dimensions, pixels = store.get(1)
+        self.assertTrue(same_aspect(dimensions, (640, 480)))
+        self.assertEqual(pixels, data[-store.size * store.size:])
+        self.assertIsNone(store.get(2))
+        self.assertEqual(store.add(data), 2)
+        self.assertEqual(store.image(2).size, (store.size, store.size))
+        store.close()
+
+    def test_other_thumbnail_size_starts_over(self):
+        """Test that a store of another thumbnail size is not reused"""
+        store = ThumbnailStore(self.path)
+        store.add(bytes(store.slot_size))
+        store_id = store.id
+        store.close()
+        store = ThumbnailStore(self.path, size=16)
+        self.assertNotEqual(store.id, store_id)
+        self.assertEqual(len(store), 0)
+        store.close()
+
+    def test_compact_keeps_referenced_slots(self):
+        """Test that compaction renumbers the kept slots under a new store id"""
+        store = ThumbnailStore(self.path)
+        slots = [store.add(bytes([value]) * store.slot_size) for value in range(5)]
+        store_id = store.id
+        self.assertEqual(store.compact([slots[3], slots[1], None, 99]), {1: 0, 3: 1})
+        self.assertNotEqual(store.id, store_id)
+        self.assertEqual(store.get(1)[1], bytes([3]) * store.size * store.size)
+        store.close()
+        
+        store = ThumbnailStore(self.path)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get(0)[1], bytes([1]) * store.size * store.size)
+        self.assertEqual(store.add(bytes(store.slot_size)), 2)
+        store.close()
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_undecodable_file(self):
+        """Test that a broken image is an error, not an exception"""
+        broken = os.path.join(self.test_dir, "broken.jpg")
+        with open(broken, 'wb') as f:
+            f.write(b"not an image")
+        data, error = decode_thumbnail(broken)
+        self.assertIsNone(data)
+        self.assertIsNotNone(error)
+
+    def test_heif_opener_registered_on_first_decode(self):
+        """Test that pillow-heif is registered by decoding, once, not by importing"""
+        opener = mock.Mock()
+        picture = os.path.join(self.test_dir, "picture.png")
+        fractal((64, 48)).save(picture)
+        with mock.patch.dict(sys.modules, {'pillow_heif': SimpleNamespace(register_heif_opener=opener)}), \
+                mock.patch('thumbnail_store._heif', None):
+            opener.assert_not_called()
+            decode_thumbnail(picture)
+            decode_thumbnail(picture)
+            self.assertTrue(thumbnail_store.register_heif())
+        opener.assert_called_once_with()
+
+    def test_pixel_index_finds_every_pair_within_tolerance(self):
+        """Test that the block-mean index never drops a pair pixel_distance would match"""
+        base = fractal((32, 32)).convert('L').tobytes()
+        # Uniform shifts move block means across cell boundaries; noise keeps them in place
+        thumbnails = [bytes(min(255, max(0, value + shift + (i * 7 % 5) - 2)) for i, value in enumerate(base))
+                      for shift in range(-6, 7)] + [bytes(255 - value for value in base)]
+        lookup = PixelIndex(tolerance=3.0)
+        for item, pixels in enumerate(thumbnails):
+            means = lookup.block_means(pixels)
+            candidates = set(lookup.candidates(means))
+            within = {other for other in range(item) if pixel_distance(pixels, thumbnails[other]) <= 3.0}
+            self.assertLessEqual(within, candidates)
+            lookup.add(means, item)
+        self.assertEqual(lookup.candidates(lookup.block_means(thumbnails[-1])), [len(thumbnails) - 1])
+        self.assertAlmostEqual(pixel_distance(bytes([0, 10]), bytes([4, 0])), 7.0)
+
+
+class TestPixelMatch(unittest.TestCase):
+    """Test cases for DuplicateFinder(pixel_match=True)"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.test_dir, "photos")
+        os.makedirs(os.path.join(self.root, "export"))
+        picture = fractal((640, 480))
+        self.original = os.path.join(self.root, "IMG_0001.png")
+        picture.save(self.original)
+        self.export = os.path.join(self.root, "export", "holiday.jpg")
+        picture.save(self.export, quality=80)
+        fractal((640, 480), (-1, -0.5, 0.5, 0.6)).save(os.path.join(self.root, "other.jpg"))
+        fractal((480, 480)).save(os.path.join(self.root, "square.jpg"))  # Same pixels, other shape
+        self.cache = os.path.join(self.test_dir, "review", "cache.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def find(self, **options):
+        finder = DuplicateFinder(events=Instrumentation(), pixel_match=True, **options)
+        finder.SCAN_ROOT = self.root
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        finder.scan_files()
+        moves = finder.find_duplicates()
+        if finder.cache:
+            finder.cache.close()
+        finder.thumbnails.close()
+        return finder, moves
+
+    def test_same_picture_in_another_format(self):
+        """Test that a PNG and its JPEG export are grouped, other pictures are not"""
+        finder, moves = self.find()
+        self.assertEqual([(move['original'], move['duplicate']) for move in moves], [(self.original, self.export)])
+        self.assertTrue(moves[0]['reason'].startswith('same picture'))
+        self.assertEqual(finder.stats['duplicates_same_pixels'], 1)
+        self.assertEqual(finder.stats['duplicates_found'], 0)
+
+    def test_images_are_decoded_once(self):
+        """Test that perceptual hashes reuse the thumbnails, and later runs reuse the store"""
+        first, _ = self.find(similar=True, cache_path=self.cache)
+        self.assertEqual(first.stats['thumbnails_decoded'], 4)
+        self.assertEqual(first.stats['perceptual_hashed'], 4)
+
+        second, moves = self.find(similar=True, cache_path=self.cache)
+        self.assertEqual(second.stats['thumbnails_decoded'], 0)
+        self.assertEqual(second.stats['thumbnails_reused'], 4)
+        self.assertEqual([move['duplicate'] for move in moves if move['reason'].startswith('same picture')],
+                         [self.export])
+
+    def test_only_files_close_to_the_keeper_are_moved(self):
+        """Test that a chain of matches (A~B, B~C) does not move C when it is too far from A"""
+        self.root = os.path.join(self.test_dir, "chain")
+        os.makedirs(self.root)
+        gradient = Image.linear_gradient('L')
+        gradient.resize((512, 512)).save(os.path.join(self.root, "a.png"))  # Largest - kept
+        for name, shift in (("b.png", 2), ("c.png", 4)):
+            gradient.point(lambda value: min(255, value + shift)).save(os.path.join(self.root, name))
+        finder, moves = self.find(pixel_tolerance=3.0)
+        self.assertEqual([(os.path.basename(move['original']), os.path.basename(move['duplicate']))
+                          for move in moves], [("a.png", "b.png")])
+        self.assertEqual(finder.stats['duplicates_same_pixels'], 1)
+
+    def test_compact_cache_drops_thumbnails_of_deleted_files(self):
+        """Test that --compact-cache shrinks the store and later runs still reuse it"""
+        self.find(cache_path=self.cache)
+        os.remove(os.path.join(self.root, "other.jpg"))
+        store_path = os.path.join(os.path.dirname(self.cache), "duplicate_finder_thumbnails.bin")
+        with redirect_stdout(io.StringIO()) as output:
+            duplicate_finder.main(['--compact-cache', '--cache', self.cache])
+        self.assertIn("Dropped 1 unused thumbnails", output.getvalue())
+        store = ThumbnailStore(store_path)
+        self.assertEqual(len(store), 3)
+        store.close()
+
+        finder, moves = self.find(cache_path=self.cache)
+        self.assertEqual((finder.stats['thumbnails_decoded'], finder.stats['thumbnails_reused']), (0, 3))
+        self.assertEqual([move['duplicate'] for move in moves], [self.export])
+
+
+if __name__ == '__main__':
+    unittest.main()
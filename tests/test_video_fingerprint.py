@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Unit tests for sampled-frame video fingerprints
+"""
+
+import unittest
+import tempfile
+import shutil
+import struct
+import os
+import sys
+
+from PIL import Image, ImageDraw
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Local modules - importable only once the path above is set
+import video_fingerprint  # noqa: E402
+from media_probe import probe_mp4  # noqa: E402
+from video_fingerprint import (parse_fingerprint, sample_times, video_distance,  # noqa: E402
+                               video_fingerprint as fingerprint)
+from duplicate_finder import DuplicateFinder  # noqa: E402
+
+
+def box(box_type, payload):
+    """Build an ISO-BMFF box"""
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def mp4(duration, width, height, scene, padding=0):
+    """Build an MP4 header; the fake decoder reads the scene number from 'mdat'"""
+    mvhd = box(b'mvhd', struct.pack('>IIIII', 0, 0, 0, 1000, int(duration * 1000)) + b'\x00' * 80)
+    tkhd = box(b'tkhd', b'\x00' * 76 + struct.pack('>II', width << 16, height << 16))
+    return (box(b'ftyp', b'isom\x00\x00\x02\x00') + box(b'moov', mvhd + box(b'trak', tkhd))
+            + box(b'mdat', bytes([scene]) + b'\x00' * padding))
+
+
+def fake_frames(filepath, times):
+    """Decoder stand-in: draws a frame from the scene number and timestamp"""
+    with open(filepath, 'rb') as f:
+        content = f.read()
+    scene = content[content.index(b'mdat') + 4]
+    info = probe_mp4(filepath)
+    frames = []
+    for seconds in times:
+        img = Image.new('RGB', (320, 180), (scene * 40, 20, 200 - scene * 30))
+        draw = ImageDraw.Draw(img)
+        x = int(seconds * 2 * (scene + 1)) * 4 % 160
+        draw.ellipse([x, 45, x + 100, 135], fill=(250, 250, 0))
+        draw.rectangle([160 + scene * 20, 0, 320, 60], fill=(0, 0, 0))
+        frames.append(img.resize((info['width'], info['height'])))  # Stored resolution
+    return frames
+
+
+class TestVideoFingerprint(unittest.TestCase):
+    """Test cases for video fingerprints"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        video_fingerprint.DECODERS['fake'] = (lambda: True, fake_frames)
+
+    def tearDown(self):
+        del video_fingerprint.DECODERS['fake']
+        shutil.rmtree(self.test_dir)
+
+    def write(self, relative_path, content):
+        filepath = os.path.join(self.test_dir, relative_path)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        return filepath
+
+    def test_sample_times(self):
+        """Test that frames are spread over the clip"""
+        self.assertEqual(sample_times(10, 5), [1.0, 3.0, 5.0, 7.0, 9.0])
+
+    def test_fingerprint_format(self):
+        """Test duration, resolution and one hash per sampled frame"""
+        value, error = fingerprint(self.write("clip.mp4", mp4(12.5, 640, 360, scene=1)), 'fake')
+        self.assertIsNone(error)
+        duration, width, height, hashes = parse_fingerprint(value)
+        self.assertEqual((duration, width, height), (12.5, 640, 360))
+        self.assertEqual(len(hashes), video_fingerprint.FRAME_SAMPLES)
+
+    def test_reencoded_copy_is_close(self):
+        """Test that a smaller re-encode matches and another clip does not"""
+        original = parse_fingerprint(fingerprint(self.write("a.mp4", mp4(20, 1280, 720, 1)), 'fake')[0])
+        smaller = parse_fingerprint(fingerprint(self.write("b.mp4", mp4(20.2, 640, 360, 1)), 'fake')[0])
+        other = parse_fingerprint(fingerprint(self.write("c.mp4", mp4(20, 1280, 720, 4)), 'fake')[0])
+        longer = parse_fingerprint(fingerprint(self.write("d.mp4", mp4(31, 1280, 720, 1)), 'fake')[0])
+
+        self.assertLessEqual(video_distance(original, smaller), 6)
+        self.assertGreater(video_distance(original, other), 6)
+        self.assertIsNone(video_distance(original, longer))
+
+    def test_not_an_mp4(self):
+        """Test that unparsable files return an error instead of raising"""
+        value, error = fingerprint(self.write("bad.mp4", b"garbage"), 'fake')
+        self.assertIsNone(value)
+        self.assertIsNotNone(error)
+
+    def test_finder_groups_similar_videos(self):
+        """Test that the finder keeps the higher-resolution copy of a clip"""
+        original = self.write("a/clip.mp4", mp4(20, 1280, 720, 1, padding=5000))
+        copy = self.write("b/clip_small.mp4", mp4(20.1, 640, 360, 1))
+        self.write("c/other.mp4", mp4(20, 1280, 720, 4))
+
+        finder = DuplicateFinder(similar=True, video_decoder='fake')
+        finder.SCAN_ROOT = self.test_dir
+        finder.REVIEW_FOLDER = os.path.join(self.test_dir, "review")
+        finder.scan_files()
+        files_to_move = finder.find_duplicates()
+
+        self.assertEqual(finder.stats['videos_fingerprinted'], 3)
+        self.assertEqual([(m['original'], m['duplicate']) for m in files_to_move], [(original, copy)])
+        self.assertTrue(files_to_move[0]['reason'].startswith('similar video'))
+
+
+if __name__ == '__main__':
+    unittest.main()
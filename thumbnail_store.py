@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Decoded-thumbnail store and pixel matching for Duplicate Photo Finder.
+
+A HEIC original and its JPEG export, or PNG and JPEG copies of one
+screenshot, share no bytes but show the same picture. Each image is
+decoded once at reduced size (JPEG draft mode, then Image.reduce), turned
+upright (EXIF orientation) and scaled to a THUMBNAIL_SIZE x THUMBNAIL_SIZE
+grayscale thumbnail. Thumbnails live in a file of fixed-size slots read
+through mmap - 1 KB of pixels and the decoded size per slot, with the
+slot numbers kept in the scan cache - so pixel matching and perceptual
+hashes never decode a full-resolution image twice, nor again on later
+runs while the file is unchanged.
+
+Two images show the same picture when their aspect ratios agree and
+their thumbnails differ by at most `tolerance` grey levels on average.
+An exact digest of the thumbnail would only match lossless conversions:
+lossy re-encoding moves pixels by a level or two. PixelIndex finds the
+few thumbnails worth comparing without comparing every pair.
+
+Slots of changed or deleted files are not reused; --compact-cache
+rewrites the store (it sits next to the cache) with only the slots the
+cache still references.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import uuid
+from itertools import product
+from operator import sub
+
+from PIL import Image, ImageChops
+
+from perceptual_hash import RESAMPLE, load_reduced
+
+THUMBNAIL_FILENAME = "duplicate_finder_thumbnails.bin"
+THUMBNAIL_SIZE = 32  # Edge of the normalized grayscale thumbnail
+PIXEL_TOLERANCE = 3.0  # Max mean grey-level difference (of 255) for the same picture
+ASPECT_TOLERANCE = 0.02  # Max relative difference of width/height ratios
+STORE_MAGIC = b'DPFTHUMB'
+STORE_HEADER = struct.Struct('<8sI16s')  # magic, thumbnail edge, store id
+SLOT_HEADER = struct.Struct('<II')  # decoded width, height
+INDEX_GRID = 4  # PixelIndex keys: block means of a GRID x GRID split, one table per grid row
+
+_heif = None  # Whether Pillow can open HEIC/HEIF; None until first asked
+
+
+def register_heif():
+    """Register pillow-heif's opener with Pillow (once); return whether HEIC/HEIF can be decoded"""
+    global _heif
+    if _heif is None:
+        try:
+            from pillow_heif import register_heif_opener
+        except ImportError:
+            _heif = False
+        else:
+            register_heif_opener()
+            _heif = True
+    return _heif
+
+
+def decode_thumbnail(filepath, size=THUMBNAIL_SIZE):
+    """Return (slot bytes: decoded width/height + size x size grey pixels, error) - never raises"""
+    register_heif()  # Here rather than at import: also runs in process-pool workers
+    try:
+        img = load_reduced(filepath, size)
+        pixels = img.resize((size, size), RESAMPLE).tobytes()
+        return SLOT_HEADER.pack(img.width, img.height) + pixels, None
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+        return None, e
+
+
+def pixel_distance(a, b):
+    """Mean absolute grey-level difference of two thumbnails"""
+    size = (len(a), 1)
+    difference = ImageChops.difference(Image.frombytes('L', size, a), Image.frombytes('L', size, b))
+    return sum(difference.tobytes()) / len(a)
+
+
+def same_aspect(a, b, tolerance=ASPECT_TOLERANCE):
+    """Whether two (width, height) pairs have nearly the same ratio"""
+    return abs(a[0] * b[1] - b[0] * a[1]) <= tolerance * a[1] * b[0]
+
+
+class PixelIndex:
+    """Multi-index of thumbnails over quantized block means, for pixel_distance queries.
+
+    A thumbnail is reduced to GRID x GRID block means. Block mean
+    differences of two thumbnails add up to at most GRID * GRID times
+    their pixel_distance, so within `tolerance` one grid row (of GRID
+    rows) differs by at most GRID * tolerance in total (pigeonhole). Each
+    row is quantized into cells that wide (plus 1 for rounding) and has
+    its own table: a query only looks up the cells next to its own in
+    every row, and drops candidates whose block means are too far apart,
+    instead of comparing every thumbnail.
+    """
+
+    def __init__(self, tolerance=PIXEL_TOLERANCE, size=THUMBNAIL_SIZE, grid=INDEX_GRID):
+        self.size = size
+        self.grid = grid
+        self.cell = grid * tolerance + 1
+        self.bound = grid * grid * (tolerance + 1)  # Max block mean difference, rounding included
+        self.tables = [{} for _ in range(grid)]  # cell key -> [item]
+        self.means = {}  # item -> block means
+        base = int(255 // self.cell) + 3  # Cells per block mean, with one spare on each side
+        self._weights = [base ** i for i in range(grid)]
+        # Key offsets of the neighbouring cells (each block mean one cell up or down)
+        self._near = [sum(d * w for d, w in zip(deltas, self._weights))
+                      for deltas in product((-1, 0, 1), repeat=grid)]
+
+    def __len__(self):
+        return len(self.means)
+
+    def block_means(self, pixels):
+        """GRID x GRID block means of a thumbnail, row by row"""
+        grid = self.grid
+        return Image.frombytes('L', (self.size, self.size), pixels).resize((grid, grid), Image.BOX).tobytes()
+
+    def _keys(self, means):
+        grid, cell, weights = self.grid, self.cell, self._weights
+        return [sum((int(mean // cell) + 1) * w for mean, w in zip(means[row * grid:(row + 1) * grid], weights))
+                for row in range(grid)]
+
+    def add(self, means, item):
+        """Index an item by its block means"""
+        self.means[item] = means
+        for table, key in zip(self.tables, self._keys(means)):
+            table.setdefault(key, []).append(item)
+
+    def candidates(self, means):
+        """Items that may lie within tolerance of a thumbnail with these block means"""
+        found = set()
+        for table, key in zip(self.tables, self._keys(means)):
+            for near in self._near:
+                found.update(table.get(key + near, ()))
+        indexed, bound = self.means, self.bound
+        return [item for item in found if sum(map(abs, map(sub, means, indexed[item]))) <= bound]
+
+
+def _open_store(path):
+    # Unbuffered: a slot is on disk once added
+    return os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)), 'r+b', buffering=0)
+
+
+class ThumbnailStore:
+    """Append-only file of fixed-size thumbnail slots, read through mmap (see compact).
+
+    path -- store file, created (or started over, when it holds another
+            thumbnail size or is not a store) as needed; None keeps the
+            thumbnails in a temporary file for this run only
+    """
+
+    def __init__(self, path=None, size=THUMBNAIL_SIZE):
+        self.path = path
+        self.size = size
+        self.slot_size = SLOT_HEADER.size + size * size
+        self._map = None
+        self._mapped = 0  # Slots covered by the current mapping
+        if path is None:
+            self._file = tempfile.TemporaryFile(buffering=0)
+        else:
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._file = _open_store(path)
+        header = self._file.read(STORE_HEADER.size)
+        if len(header) == STORE_HEADER.size and STORE_HEADER.unpack(header)[:2] == (STORE_MAGIC, size):
+            store_id = STORE_HEADER.unpack(header)[2]
+        else:
+            store_id = uuid.uuid4().bytes
+            self._file.truncate(0)
+            self._file.seek(0)
+            self._file.write(STORE_HEADER.pack(STORE_MAGIC, size, store_id))
+        # Slot numbers in the cache are only valid for this very file
+        self.id = store_id.hex()
+        # A slot cut off by a crash does not count
+        self.count = (os.fstat(self._file.fileno()).st_size - STORE_HEADER.size) // self.slot_size
+        self._file.truncate(STORE_HEADER.size + self.count * self.slot_size)
+        self.decoded = 0  # Slots added by this run
+
+    def __len__(self):
+        return self.count
+
+    def add(self, data):
+        """Store one thumbnail (as returned by decode_thumbnail); return its slot"""
+        self._file.seek(STORE_HEADER.size + self.count * self.slot_size)
+        self._file.write(data)
+        self.count += 1
+        self.decoded += 1
+        return self.count - 1
+
+    def get(self, slot):
+        """Return ((width, height), pixels) of a slot, or None if there is no such slot"""
+        if slot is None or not 0 <= slot < self.count:
+            return None
+        if slot >= self._mapped:
+            # The file has grown since it was mapped
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped = self.count
+        start = STORE_HEADER.size + slot * self.slot_size
+        dimensions = SLOT_HEADER.unpack_from(self._map, start)
+        return dimensions, self._map[start + SLOT_HEADER.size:start + self.slot_size]
+
+    def compact(self, slots):
+        """Keep only the given slots, renumbered in order; return {old slot: new slot}.
+
+        The kept slots are written to a new file that then replaces the
+        store, under a new store id: until the cache is pointed at the new
+        numbers, its old entries no longer match and are decoded again.
+        """
+        keep = sorted({slot for slot in slots if slot is not None and 0 <= slot < self.count})
+        if keep:
+            self.get(keep[-1])  # Map every slot to be copied
+        store_id = uuid.uuid4().bytes
+        if self.path is None:
+            compacted = tempfile.TemporaryFile(buffering=0)
+        else:
+            compacted = _open_store(self.path + '.tmp')
+            compacted.truncate(0)
+        compacted.write(STORE_HEADER.pack(STORE_MAGIC, self.size, store_id))
+        for slot in keep:
+            start = STORE_HEADER.size + slot * self.slot_size
+            compacted.write(self._map[start:start + self.slot_size])
+        if self._map is not None:
+            self._map.close()
+            self._map, self._mapped = None, 0
+        self._file.close()
+        if self.path is not None:
+            os.fsync(compacted.fileno())
+            compacted.close()
+            os.replace(self.path + '.tmp', self.path)
+            compacted = _open_store(self.path)
+        self._file = compacted
+        self.id = store_id.hex()
+        self.count = len(keep)
+        return {slot: new for new, slot in enumerate(keep)}
+
+    def image(self, slot):
+        """A slot's thumbnail as a grayscale PIL image"""
+        return Image.frombytes('L', (self.size, self.size), self.get(slot)[1])
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
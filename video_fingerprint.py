@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sampled-frame fingerprints of MP4 videos for Duplicate Photo Finder.
+
+Duration and resolution come from the MP4 boxes (media_probe.probe_mp4).
+A few frames, evenly spread over the duration, are decoded - keyframes
+only where the decoder allows it - and reduced to 64-bit difference
+hashes. Re-muxed or re-encoded copies of a clip get the same duration and
+nearly the same frame hashes without reading the whole file.
+
+Decoding uses whatever is available locally: PyAV, OpenCV or the ffmpeg
+binary, in that order.
+"""
+
+import io
+import shutil
+import subprocess
+
+from PIL import Image
+
+from media_probe import probe_mp4
+from perceptual_hash import dhash_image, hamming
+
+FRAME_SAMPLES = 5  # Frames hashed per video
+FRAME_WIDTH = 64  # Frames are scaled down to this width before hashing (ffmpeg)
+DURATION_TOLERANCE = 0.5  # Seconds two copies of a clip may differ by (re-muxing, edit lists)
+FFMPEG_TIMEOUT = 30  # Seconds allowed to extract one frame
+
+
+def sample_times(duration, samples=FRAME_SAMPLES):
+    """Timestamps evenly spread over the clip, away from its first/last frame"""
+    return [duration * (i + 0.5) / samples for i in range(samples)]
+
+
+def _pyav_frames(filepath, times):
+    import av
+    frames = []
+    with av.open(filepath) as container:
+        stream = container.streams.video[0]
+        stream.codec_context.skip_frame = 'NONKEY'
+        for seconds in times:
+            # Seek lands on the keyframe before the timestamp
+            container.seek(int(seconds / stream.time_base), stream=stream)
+            frame = next(container.decode(stream), None)
+            if frame is None:
+                break
+            frames.append(frame.to_image())
+    return frames
+
+
+def _opencv_frames(filepath, times):
+    import cv2
+    frames = []
+    capture = cv2.VideoCapture(filepath)
+    try:
+        for seconds in times:
+            capture.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000)
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(Image.fromarray(frame[:, :, ::-1]))  # BGR -> RGB
+    finally:
+        capture.release()
+    return frames
+
+
+def _ffmpeg_frames(filepath, times):
+    frames = []
+    for seconds in times:
+        # -ss before -i seeks on the container; -skip_frame nokey decodes keyframes only
+        command = ['ffmpeg', '-v', 'error', '-skip_frame', 'nokey', '-ss', f'{seconds:.3f}',
+                   '-i', filepath, '-frames:v', '1', '-vf', f'scale={FRAME_WIDTH}:-2',
+                   '-f', 'image2pipe', '-vcodec', 'png', '-']
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                timeout=FFMPEG_TIMEOUT, check=False)
+        if result.returncode or not result.stdout:
+            break
+        frames.append(Image.open(io.BytesIO(result.stdout)))
+    return frames
+
+
+def _has_module(name):
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+
+# name -> (is available, frames(filepath, times) -> [PIL images])
+DECODERS = {
+    'pyav': (lambda: _has_module('av'), _pyav_frames),
+    'opencv': (lambda: _has_module('cv2'), _opencv_frames),
+    'ffmpeg': (lambda: shutil.which('ffmpeg') is not None, _ffmpeg_frames),
+}
+
+
+def available_decoder():
+    """Return the name of the first usable decoder, or None"""
+    for name, (available, _) in DECODERS.items():
+        if available():
+            return name
+    return None
+
+
+def video_fingerprint(filepath, decoder, samples=FRAME_SAMPLES):
+    """Return (fingerprint string, error) - never raises, for worker pools.
+
+    The fingerprint is "duration_ms:width:height:hash,hash,..." with one
+    hex dHash per sampled frame.
+    """
+    try:
+        info = probe_mp4(filepath)
+        if not info or not info['duration']:
+            return None, ValueError("no MP4 duration")
+        frames = DECODERS[decoder][1](filepath, sample_times(info['duration'], samples))
+        if len(frames) < samples:
+            return None, ValueError(f"decoded {len(frames)} of {samples} frames")
+        hashes = ','.join(format(dhash_image(frame), '016x') for frame in frames)
+        return f"{round(info['duration'] * 1000)}:{info['width'] or 0}:{info['height'] or 0}:{hashes}", None
+    except Exception as e:  # Decoder libraries raise their own error types
+        return None, e
+
+
+def parse_fingerprint(fingerprint):
+    """Return (duration seconds, width, height, [frame hashes])"""
+    duration_ms, width, height, hashes = fingerprint.split(':')
+    return int(duration_ms) / 1000, int(width), int(height), [int(value, 16) for value in hashes.split(',')]
+
+
+def video_distance(a, b):
+    """Mean frame-hash distance of two parsed fingerprints, None if they cannot match.
+
+    Copies must have the same duration (within DURATION_TOLERANCE) and the
+    same orientation; resolution may differ (re-encoded at another size).
+    """
+    duration_a, width_a, height_a, hashes_a = a
+    duration_b, width_b, height_b, hashes_b = b
+    if abs(duration_a - duration_b) > DURATION_TOLERANCE or len(hashes_a) != len(hashes_b):
+        return None
+    if width_a and width_b and (width_a > height_a) != (width_b > height_b):
+        return None
+    return sum(hamming(x, y) for x, y in zip(hashes_a, hashes_b)) / len(hashes_a)